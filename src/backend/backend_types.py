@@ -4,10 +4,16 @@ class BackendType(str, Enum):
     TGI = "tgi"
     # VLLM = "vllm"
     # LLAMA_CPP = "llama_cpp"
+    # In process OpenAI compatible server with a cost model, to test and benchmark the harness itself
+    SIMULATED = "simulated"
 
 
-def get_backend_types() -> list[str]:
+SIMULATED_BACKEND = BackendType.SIMULATED.value
+
+
+def get_backend_types(include_simulated: bool = False) -> list[str]:
     """
     Get the list of backend types, for example ['vllm', 'tgi']
+    The simulated backend is only benchmarked when asked for.
     """
-    return [backend.value for backend in BackendType]
\ No newline at end of file
+    return [backend.value for backend in BackendType if include_simulated or backend != BackendType.SIMULATED]
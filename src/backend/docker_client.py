@@ -0,0 +1,276 @@
+import http.client
+import json
+import os
+import queue
+import socket
+import struct
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from urllib.parse import quote, urlencode
+
+from backend.docker_command import ContainerSpec
+
+DOCKER_API_VERSION = "v1.41"
+DOCKER_SOCKET = "/var/run/docker.sock"
+POOL_SIZE = 4
+REQUEST_TIMEOUT = 60
+# Seconds given to the container to stop gracefully before it is killed
+STOP_TIMEOUT = 10
+# Requests which can be sent again if the connection drops after they were sent, a create or start must not run twice
+IDEMPOTENT_METHODS = {"GET", "HEAD", "DELETE"}
+
+
+def get_docker_socket() -> str:
+    """
+    Get the path of the docker daemon socket, honouring a unix:// DOCKER_HOST.
+    """
+    docker_host = os.environ.get("DOCKER_HOST", "")
+    if docker_host.startswith("unix://"):
+        return docker_host[len("unix://"):]
+    return DOCKER_SOCKET
+
+
+class DockerError(Exception):
+    """An error returned by the Docker Engine API."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"Docker API error {status_code}: {message}")
+        self.status_code = status_code
+        self.message = message
+
+
+class NotFoundError(DockerError):
+    """The container or image does not exist."""
+
+
+class ConflictError(DockerError):
+    """The request conflicts with the container state, for example a name already in use."""
+
+
+def _raise_for_status(status_code: int, body: bytes):
+    if status_code < 400:
+        return
+
+    try:
+        message = json.loads(body).get("message", "")
+    except ValueError:
+        message = body.decode(errors="replace")
+
+    if status_code == 404:
+        raise NotFoundError(status_code, message)
+    if status_code == 409:
+        raise ConflictError(status_code, message)
+    raise DockerError(status_code, message)
+
+
+def split_image(image: str) -> tuple[str, str]:
+    """
+    Split an image reference into repository and tag, for example "vllm/vllm-openai:latest" -> ("vllm/vllm-openai", "latest").
+    Digest references keep the digest as tag.
+    """
+    if "@" in image:
+        repository, digest = image.split("@", 1)
+        return repository, digest
+    repository, _, tag = image.rpartition(":")
+    # A colon before the last slash belongs to a registry port, not a tag
+    if not repository or "/" in tag:
+        return image, "latest"
+    return repository, tag
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """An HTTP connection over a unix socket."""
+
+    def __init__(self, socket_path: str, timeout: Optional[float] = REQUEST_TIMEOUT):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class DockerClient:
+    """
+    A minimal Docker Engine API client over the daemon unix socket.
+
+    Short requests reuse a pool of keep-alive connections, long lived streams (logs, wait, pull)
+    get a dedicated connection which is closed once the stream ends.
+    """
+
+    def __init__(
+        self,
+        socket_path: Optional[str] = None,
+        api_version: str = DOCKER_API_VERSION,
+        pool_size: int = POOL_SIZE,
+        timeout: float = REQUEST_TIMEOUT,
+    ):
+        self.socket_path = socket_path or get_docker_socket()
+        self.api_version = api_version
+        self.timeout = timeout
+        self._pool: queue.LifoQueue[UnixHTTPConnection] = queue.LifoQueue(maxsize=pool_size)
+
+    def _url(self, path: str, params: Optional[dict] = None) -> str:
+        url = f"/{self.api_version}{path}"
+        if params:
+            url += "?" + urlencode({key: value for key, value in params.items() if value is not None})
+        return url
+
+    @contextmanager
+    def _connection(self) -> Iterator[UnixHTTPConnection]:
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            connection = UnixHTTPConnection(self.socket_path, self.timeout)
+
+        try:
+            yield connection
+        except Exception:
+            connection.close()
+            raise
+
+        try:
+            self._pool.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def _request(self, method: str, path: str, params: Optional[dict] = None, body: Optional[dict] = None):
+        """Send a request on a pooled connection and return the decoded JSON response, if any."""
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload is not None else {}
+
+        # A pooled connection may have been closed by the daemon, retry once on a fresh one if the daemon cannot
+        # have acted on the request: it was not sent (a unix socket closed by the daemon fails the send) or it is idempotent
+        for attempt in range(2):
+            sent = False
+            try:
+                with self._connection() as connection:
+                    connection.request(method, self._url(path, params), body=payload, headers=headers)
+                    sent = True
+                    response = connection.getresponse()
+                    data = response.read()
+                break
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                if attempt == 1 or (sent and method not in IDEMPOTENT_METHODS):
+                    raise
+
+        _raise_for_status(response.status, data)
+        if data and response.getheader("Content-Type", "").startswith("application/json"):
+            return json.loads(data)
+        return None
+
+    @contextmanager
+    def _stream(self, method: str, path: str, params: Optional[dict] = None, timeout: Optional[float] = None):
+        """Open a dedicated connection for a long lived response."""
+        connection = UnixHTTPConnection(self.socket_path, timeout)
+        try:
+            connection.request(method, self._url(path, params))
+            response = connection.getresponse()
+            if response.status >= 400:
+                _raise_for_status(response.status, response.read())
+            yield response
+        finally:
+            connection.close()
+
+    def close(self):
+        """Close every pooled connection."""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def ping(self) -> bool:
+        try:
+            self._request("GET", "/_ping")
+            return True
+        except (OSError, DockerError):
+            return False
+
+    def create_container(self, spec: ContainerSpec) -> str:
+        """
+        Create a container from the spec, pulling the image if it is not present.
+        Returns the container id.
+        """
+        params = {"name": spec.name, "platform": spec.platform}
+        try:
+            response = self._request("POST", "/containers/create", params, spec.to_create_body())
+        except NotFoundError:
+            # Unlike the CLI, the API does not pull missing images on create
+            self.pull_image(spec.image, platform=spec.platform)
+            response = self._request("POST", "/containers/create", params, spec.to_create_body())
+        return response["Id"]
+
+    def start_container(self, container: str):
+        self._request("POST", f"/containers/{quote(container)}/start")
+
+    def inspect_container(self, container: str) -> dict:
+        return self._request("GET", f"/containers/{quote(container)}/json")
+
+    def stop_container(self, container: str, timeout: int = STOP_TIMEOUT):
+        self._request("POST", f"/containers/{quote(container)}/stop", {"t": timeout})
+
+    def remove_container(self, container: str, force: bool = True):
+        self._request("DELETE", f"/containers/{quote(container)}", {"force": int(force)})
+
+    def list_containers(self, filters: Optional[dict[str, list[str]]] = None) -> list[dict]:
+        params = {"filters": json.dumps(filters)} if filters else None
+        return self._request("GET", "/containers/json", params)
+
+    def wait_container(self, container: str) -> int:
+        """
+        Block until the container stops and return its exit code.
+        """
+        with self._stream("POST", f"/containers/{quote(container)}/wait") as response:
+            return json.loads(response.read())["StatusCode"]
+
+    def logs(self, container: str, follow: bool = True, tail: str = "all") -> Iterator[tuple[str, str]]:
+        """
+        Iterate over the container log lines as (stream, line) with stream "stdout" or "stderr".
+        With follow, the iterator ends when the container stops.
+        """
+        params = {"follow": int(follow), "stdout": 1, "stderr": 1, "tail": tail}
+        with self._stream("GET", f"/containers/{quote(container)}/logs", params) as response:
+            buffers = {"stdout": "", "stderr": ""}
+            # Containers without a TTY multiplex stdout and stderr in frames with an 8 bytes header
+            while True:
+                header = response.read(8)
+                if len(header) < 8:
+                    break
+                stream_type, size = struct.unpack(">BxxxL", header)
+                stream = "stderr" if stream_type == 2 else "stdout"
+                buffers[stream] += response.read(size).decode(errors="replace")
+                *lines, buffers[stream] = buffers[stream].split("\n")
+                for line in lines:
+                    yield stream, line
+            for stream, rest in buffers.items():
+                if rest:
+                    yield stream, rest
+
+    def pull_image(self, image: str, platform: Optional[str] = None):
+        """
+        Pull an image, blocking until the pull is complete.
+        """
+        repository, tag = split_image(image)
+        params = {"fromImage": repository, "tag": tag, "platform": platform}
+        with self._stream("POST", "/images/create", params) as response:
+            # Pull errors are reported in the progress stream with a 200 status
+            for line in response:
+                if not line.strip():
+                    continue
+                progress = json.loads(line)
+                if "error" in progress:
+                    raise DockerError(500, progress["error"])
+
+    def inspect_image(self, image: str) -> dict:
+        return self._request("GET", f"/images/{quote(image, safe='/:@')}/json")
+
+    def inspect_distribution(self, image: str) -> dict:
+        """
+        Get the manifest descriptor of an image from its registry, without pulling it.
+        """
+        return self._request("GET", f"/distribution/{quote(image, safe='/:@')}/json")
+
+    def remove_image(self, image: str, force: bool = False):
+        self._request("DELETE", f"/images/{quote(image, safe='/:@')}", {"force": int(force)})
@@ -0,0 +1,187 @@
+import shlex
+from typing import Optional
+from pydantic import BaseModel, Field
+
+# docker run flags which do not take a value
+BOOLEAN_FLAGS = {"--privileged", "--rm", "-d", "--detach", "-i", "--interactive", "-t", "--tty", "-it", "-ti"}
+SIZE_UNITS = {"b": 1, "k": 1024, "m": 1024**2, "g": 1024**3, "t": 1024**4}
+
+
+class ContainerSpec(BaseModel):
+    """
+    The subset of `docker run` options used by the backend templates, converted to the Engine API format.
+    """
+    image: str
+    command: list[str] = Field(default_factory=list)
+    name: Optional[str] = None
+    env: list[str] = Field(default_factory=list)
+    # container port ("80/tcp") -> host port
+    port_bindings: dict[str, str] = Field(default_factory=dict)
+    binds: list[str] = Field(default_factory=list)
+    devices: list[dict] = Field(default_factory=list)
+    device_requests: list[dict] = Field(default_factory=list)
+    runtime: Optional[str] = None
+    shm_size: Optional[int] = None
+    ipc_mode: Optional[str] = None
+    network_mode: Optional[str] = None
+    cap_add: list[str] = Field(default_factory=list)
+    security_opt: list[str] = Field(default_factory=list)
+    group_add: list[str] = Field(default_factory=list)
+    privileged: bool = False
+    platform: Optional[str] = None
+    cpuset_cpus: Optional[str] = None
+    cpuset_mems: Optional[str] = None
+
+    def to_create_body(self) -> dict:
+        """
+        Get the body of the Engine API `POST /containers/create` request.
+        """
+        host_config: dict = {
+            "PortBindings": {port: [{"HostIp": "", "HostPort": host_port}] for port, host_port in self.port_bindings.items()},
+            "Binds": self.binds,
+            "Devices": self.devices,
+            "DeviceRequests": self.device_requests,
+            "CapAdd": self.cap_add,
+            "SecurityOpt": self.security_opt,
+            "GroupAdd": self.group_add,
+            "Privileged": self.privileged,
+        }
+        optional_host_config = {
+            "Runtime": self.runtime,
+            "ShmSize": self.shm_size,
+            "IpcMode": self.ipc_mode,
+            "NetworkMode": self.network_mode,
+            "CpusetCpus": self.cpuset_cpus,
+            "CpusetMems": self.cpuset_mems,
+        }
+        host_config.update({key: value for key, value in optional_host_config.items() if value is not None})
+
+        body: dict = {
+            "Image": self.image,
+            "Env": self.env,
+            "ExposedPorts": {port: {} for port in self.port_bindings},
+            "HostConfig": host_config,
+        }
+        if self.command:
+            body["Cmd"] = self.command
+        return body
+
+
+def parse_size(size: str) -> int:
+    """
+    Parse a docker size such as "64g" or "512m" to bytes.
+    """
+    size = size.strip().lower()
+    if size and size[-1] in SIZE_UNITS:
+        return int(float(size[:-1]) * SIZE_UNITS[size[-1]])
+    return int(size)
+
+
+def parse_gpus(gpus: str) -> dict:
+    """
+    Parse the value of --gpus ("all", a count or "device=0,1") to an Engine API device request.
+    """
+    gpus = gpus.strip("'\"")
+    request: dict = {"Driver": "", "Capabilities": [["gpu"]]}
+    if gpus == "all":
+        request["Count"] = -1
+    elif gpus.startswith("device="):
+        request["DeviceIDs"] = gpus[len("device="):].split(",")
+    else:
+        request["Count"] = int(gpus)
+    return request
+
+
+def parse_device(device: str) -> dict:
+    """
+    Parse the value of --device ("/dev/kfd" or "/dev/dri:/dev/dri:rwm") to an Engine API device mapping.
+    """
+    parts = device.split(":")
+    return {
+        "PathOnHost": parts[0],
+        "PathInContainer": parts[1] if len(parts) > 1 else parts[0],
+        "CgroupPermissions": parts[2] if len(parts) > 2 else "rwm",
+    }
+
+
+def parse_docker_run(docker_command: str) -> ContainerSpec:
+    """
+    Parse a rendered `docker run ...` command line into a ContainerSpec.
+
+    Args:
+        docker_command (str): The command rendered from the backend template
+
+    Returns:
+        ContainerSpec: The container configuration, with the backend arguments as command
+
+    Raises:
+        ValueError: If the command is not a docker run command or uses an unsupported option
+    """
+    tokens = shlex.split(docker_command.replace("\\\n", " "))
+    if tokens[:2] != ["docker", "run"]:
+        raise ValueError(f"Not a docker run command: {docker_command}")
+
+    options: dict = {
+        "env": [], "port_bindings": {}, "binds": [], "devices": [], "device_requests": [],
+        "cap_add": [], "security_opt": [], "group_add": [],
+    }
+    index = 2
+    while index < len(tokens) and tokens[index].startswith("-"):
+        token = tokens[index]
+        index += 1
+
+        if token in BOOLEAN_FLAGS:
+            if token == "--privileged":
+                options["privileged"] = True
+            continue
+
+        if "=" in token and token.startswith("--"):
+            flag, value = token.split("=", 1)
+        else:
+            if index >= len(tokens):
+                raise ValueError(f"Missing value for docker option {token}")
+            flag, value = token, tokens[index]
+            index += 1
+
+        if flag in ("-e", "--env"):
+            options["env"].append(value)
+        elif flag in ("-p", "--publish"):
+            host_port, _, container_port = value.rpartition(":")
+            if "/" not in container_port:
+                container_port += "/tcp"
+            options["port_bindings"][container_port] = host_port.split(":")[-1]
+        elif flag in ("-v", "--volume"):
+            options["binds"].append(value)
+        elif flag == "--device":
+            options["devices"].append(parse_device(value))
+        elif flag == "--gpus":
+            options["device_requests"].append(parse_gpus(value))
+        elif flag == "--name":
+            options["name"] = value
+        elif flag == "--runtime":
+            options["runtime"] = value
+        elif flag == "--shm-size":
+            options["shm_size"] = parse_size(value)
+        elif flag == "--ipc":
+            options["ipc_mode"] = value
+        elif flag in ("--network", "--net"):
+            options["network_mode"] = value
+        elif flag == "--cap-add":
+            options["cap_add"].append(value)
+        elif flag == "--security-opt":
+            options["security_opt"].append(value)
+        elif flag == "--group-add":
+            options["group_add"].append(value)
+        elif flag == "--platform":
+            options["platform"] = value
+        elif flag == "--cpuset-cpus":
+            options["cpuset_cpus"] = value
+        elif flag == "--cpuset-mems":
+            options["cpuset_mems"] = value
+        else:
+            raise ValueError(f"Unsupported docker run option: {flag}")
+
+    if index >= len(tokens):
+        raise ValueError(f"No image in docker command: {docker_command}")
+
+    return ContainerSpec(image=tokens[index], command=tokens[index + 1:], **options)
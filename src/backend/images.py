@@ -0,0 +1,131 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+from loguru import logger
+from pydantic import BaseModel
+
+from backend.backend_types import get_backend_types
+from backend.docker_client import DockerClient, DockerError, split_image
+from backend.docker_command import parse_docker_run
+from backend.run_backend import render_docker_command
+from hardware.hardware_info import get_hardware_info
+
+# Images are pulled one after the other so the pulls do not compete for bandwidth with each other
+MAX_PARALLEL_PULLS = 1
+
+
+class PulledImage(BaseModel):
+    image: str
+    # The image pinned to the digest it resolved to, for example "vllm/vllm-openai@sha256:..."
+    pinned_image: Optional[str] = None
+    digest: Optional[str] = None
+    pull_time_s: Optional[float] = None
+    error: Optional[str] = None
+
+
+def get_backend_image(backend_type: str, hardware_type: str) -> str:
+    """
+    Get the image a backend runs with on a hardware type, as rendered from its template.
+    """
+    docker_command = render_docker_command("placeholder/model", backend_type, hardware_type)
+    return parse_docker_run(docker_command).image
+
+
+def collect_images(hardware_type: str, backend_types: Optional[list[str]] = None) -> list[str]:
+    """
+    Get every image needed to benchmark a hardware type, from hardware_info.yaml and the backend templates.
+    """
+    if backend_types is None:
+        backend_types = get_backend_types()
+
+    hardware_info = get_hardware_info(hardware_type)
+    images: list[str] = []
+    for backend_type in backend_types:
+        if backend_type not in hardware_info.backends:
+            continue
+        image = get_backend_image(backend_type, hardware_type)
+        if image not in images:
+            images.append(image)
+    return images
+
+
+def get_repo_digest(image_info: dict, image: str) -> Optional[str]:
+    """
+    Get the repository digest of an inspected image matching the image repository, for example "vllm/vllm-openai@sha256:...".
+    """
+    repository, _ = split_image(image)
+    repo_digests = image_info.get("RepoDigests") or []
+    for repo_digest in repo_digests:
+        if repo_digest.split("@")[0] == repository:
+            return repo_digest
+    return repo_digests[0] if repo_digests else None
+
+
+class ImagePrefetcher:
+    """
+    Pull images in the background, in the order the jobs need them, so pulls overlap with running benchmarks.
+    Each image is pulled once, its resolved digest is pinned and its pull time recorded.
+    """
+
+    def __init__(self, docker_client: Optional[DockerClient] = None, max_parallel_pulls: int = MAX_PARALLEL_PULLS):
+        self.docker_client = docker_client or DockerClient()
+        self._executor = ThreadPoolExecutor(max_workers=max_parallel_pulls, thread_name_prefix="image-pull")
+        self._pulls: dict[str, Future] = {}
+        self._digests: dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+
+    def _pull(self, image: str) -> PulledImage:
+        logger.info(f"Pulling image {image}")
+        start_time = time.monotonic()
+        try:
+            self.docker_client.pull_image(image)
+            pull_time = time.monotonic() - start_time
+            pinned_image = get_repo_digest(self.docker_client.inspect_image(image), image)
+        except (OSError, DockerError) as e:
+            logger.error(f"Failed to pull image {image}: {str(e)}")
+            return PulledImage(image=image, error=str(e))
+
+        logger.info(f"Pulled image {image} in {pull_time:.1f}s ({pinned_image})")
+        return PulledImage(
+            image=image,
+            pinned_image=pinned_image,
+            digest=pinned_image.split("@", 1)[1] if pinned_image else None,
+            pull_time_s=pull_time,
+        )
+
+    def prefetch(self, images: list[str]):
+        """
+        Queue images for pulling, images already queued are ignored.
+        """
+        with self._lock:
+            for image in images:
+                if image not in self._pulls:
+                    self._pulls[image] = self._executor.submit(self._pull, image)
+
+    def resolve_digest(self, image: str) -> Optional[str]:
+        """
+        Get the digest an image tag currently resolves to in its registry, without pulling it,
+        None if the registry cannot be reached. Each image is resolved once.
+        """
+        with self._lock:
+            if image in self._digests:
+                return self._digests[image]
+        try:
+            digest = self.docker_client.inspect_distribution(image)["Descriptor"]["digest"]
+        except (OSError, DockerError, KeyError, TypeError) as e:
+            logger.warning(f"Could not resolve the digest of {image}: {str(e)}")
+            digest = None
+        with self._lock:
+            self._digests[image] = digest
+        return digest
+
+    def wait(self, image: str) -> PulledImage:
+        """
+        Block until an image is pulled, queueing it first if needed.
+        """
+        self.prefetch([image])
+        return self._pulls[image].result()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
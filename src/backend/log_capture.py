@@ -0,0 +1,77 @@
+import gzip
+import os
+import threading
+from collections import deque
+from typing import Optional
+from loguru import logger
+
+from backend.log_events import KV_CACHE_ALLOCATED, LogEvent, classify_failure, match_log_events
+
+# Lines kept in memory per container, older lines are only in the spill file
+LOG_BUFFER_LINES = 2000
+
+
+class LogCapture:
+    """
+    Capture the output of a container without flooding the terminal: the last lines are kept in a
+    bounded ring buffer, every line is spilled to a gzip file and only the backend events are logged.
+    """
+
+    def __init__(
+        self,
+        backend_type: Optional[str],
+        container_name: str,
+        spill_path: Optional[str] = None,
+        max_lines: int = LOG_BUFFER_LINES,
+    ):
+        self.backend_type = backend_type
+        self.container_name = container_name
+        self.spill_path = spill_path
+        self.lines: deque[str] = deque(maxlen=max_lines)
+        self.events: set[str] = set()
+        self.event_values: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._spill_file = None
+        if spill_path is not None:
+            os.makedirs(os.path.dirname(spill_path) or ".", exist_ok=True)
+            # Appending adds a gzip member per run, which gzip readers concatenate transparently
+            self._spill_file = gzip.open(spill_path, "at", compresslevel=6)
+
+    def feed(self, stream: str, line: str) -> list[LogEvent]:
+        """
+        Record a container log line and return the events it marks.
+        """
+        line = line.rstrip()
+        events = match_log_events(self.backend_type, line) if self.backend_type else []
+        with self._lock:
+            self.lines.append(line)
+            if self._spill_file is not None:
+                self._spill_file.write(f"{stream}: {line}\n")
+            for event in events:
+                if event.name not in self.events:
+                    self.events.add(event.name)
+                    logger.info(f"[{self.container_name}] {event.name}: {line}")
+                if event.value is not None:
+                    self.event_values.setdefault(event.name, event.value)
+        return events
+
+    def tail(self, lines: int = 200) -> list[str]:
+        with self._lock:
+            return list(self.lines)[-lines:]
+
+    @property
+    def failure(self) -> Optional[str]:
+        """The failure cause logged by the container, if any."""
+        return classify_failure(self.events)
+
+    @property
+    def kv_cache_tokens(self) -> Optional[int]:
+        """The KV cache size in tokens logged by the backend, if any."""
+        value = self.event_values.get(KV_CACHE_ALLOCATED)
+        return int(value.replace(",", "")) if value else None
+
+    def close(self):
+        with self._lock:
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
@@ -0,0 +1,77 @@
+import re
+from typing import Optional
+from pydantic import BaseModel
+
+# Startup milestones found in the backend logs, in the order they happen
+WEIGHTS_LOADING = "weights_loading"
+WEIGHTS_LOADED = "weights_loaded"
+WARMUP_STARTED = "warmup_started"
+WARMUP_DONE = "warmup_done"
+# Carries the KV cache size in tokens when the backend logs it
+KV_CACHE_ALLOCATED = "kv_cache_allocated"
+SERVER_LISTENING = "server_listening"
+
+# Failure causes, in priority order: a run which logged several of them is classified with the first one
+OUT_OF_MEMORY = "out_of_memory"
+GATED_MODEL = "gated_model"
+MODEL_NOT_FOUND = "model_not_found"
+UNSUPPORTED_MODEL = "unsupported_model"
+
+LOG_EVENT_PATTERNS: dict[str, list[tuple[str, re.Pattern]]] = {
+    "tgi": [
+        (WEIGHTS_LOADING, re.compile(r"Starting shard|Starting download process")),
+        (WEIGHTS_LOADED, re.compile(r"Shard ready in|Shard \d+ ready")),
+        (WARMUP_STARTED, re.compile(r"Warming up model")),
+        (WARMUP_DONE, re.compile(r"Setting max batch total tokens|Connected")),
+        (KV_CACHE_ALLOCATED, re.compile(r"Setting max batch total tokens to (?P<value>\d+)")),
+        (SERVER_LISTENING, re.compile(r"Starting HTTP server|Invalid hostname, defaulting to")),
+    ],
+    "vllm": [
+        (WEIGHTS_LOADING, re.compile(r"Starting to load model")),
+        (WEIGHTS_LOADED, re.compile(r"Loading model weights took|Model loading took")),
+        (WARMUP_STARTED, re.compile(r"Capturing (cudagraphs|CUDA graphs)|# (GPU|CPU) blocks")),
+        (WARMUP_DONE, re.compile(r"Graph capturing finished|init engine .* took")),
+        (KV_CACHE_ALLOCATED, re.compile(r"KV cache size: (?P<value>[\d,]+) tokens|# (GPU|CPU) blocks")),
+        (SERVER_LISTENING, re.compile(r"Uvicorn running on|Application startup complete")),
+    ],
+    "llama_cpp": [
+        (WEIGHTS_LOADING, re.compile(r"llama_model_load|loading model")),
+        (WEIGHTS_LOADED, re.compile(r"model loaded")),
+        (WARMUP_STARTED, re.compile(r"warming up the model")),
+        (WARMUP_DONE, re.compile(r"all slots are idle|server is listening")),
+        (KV_CACHE_ALLOCATED, re.compile(r"llama_kv_cache.*size = |n_ctx\s*=\s*(?P<value>\d+)")),
+        (SERVER_LISTENING, re.compile(r"server is listening|HTTP server listening")),
+    ],
+}
+
+FAILURE_PATTERNS: list[tuple[str, re.Pattern]] = [
+    (OUT_OF_MEMORY, re.compile(r"out of memory|OutOfMemoryError|Cannot allocate memory|failed to allocate", re.IGNORECASE)),
+    (GATED_MODEL, re.compile(r"401 Client Error|gated repo|Access to model .* is restricted")),
+    (MODEL_NOT_FOUND, re.compile(r"404 Client Error|Repository Not Found")),
+    (UNSUPPORTED_MODEL, re.compile(r"(architecture|model type) .* (is )?not supported|Unsupported model|unknown model architecture", re.IGNORECASE)),
+]
+FAILURE_PRIORITY = [failure for failure, _ in FAILURE_PATTERNS]
+
+
+class LogEvent(BaseModel):
+    name: str
+    value: Optional[str] = None
+
+
+def match_log_events(backend_type: str, line: str) -> list[LogEvent]:
+    """
+    Get the startup milestones and failures a backend log line marks, a line can mark several of them.
+    """
+    events: list[LogEvent] = []
+    for name, pattern in LOG_EVENT_PATTERNS.get(backend_type, []) + FAILURE_PATTERNS:
+        match = pattern.search(line)
+        if match:
+            events.append(LogEvent(name=name, value=match.groupdict().get("value")))
+    return events
+
+
+def classify_failure(events: set[str]) -> Optional[str]:
+    """
+    Get the most likely failure cause among the events logged by a run, None if no failure was logged.
+    """
+    return next((failure for failure in FAILURE_PRIORITY if failure in events), None)
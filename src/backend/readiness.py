@@ -0,0 +1,111 @@
+import threading
+import time
+from typing import Optional
+from loguru import logger
+from pydantic import BaseModel
+import requests
+
+from backend.docker_client import DockerClient, DockerError
+
+MIN_CHECK_INTERVAL = 0.1
+MAX_CHECK_INTERVAL = 2.0
+BACKOFF_FACTOR = 1.5
+HEALTH_REQUEST_TIMEOUT = 2
+
+
+class ReadinessResult(BaseModel):
+    ready: bool
+    # "healthy", "container_exited" or "timeout"
+    reason: str
+    time_to_ready_s: Optional[float] = None
+    exit_code: Optional[int] = None
+
+
+class ReadinessWatcher:
+    """
+    Wait for a backend container to be ready, returning as soon as the health endpoint answers
+    or the container dies instead of polling on a fixed interval.
+
+    Container death is detected by a background Engine API wait on the container, which returns
+    the moment the container stops, while the health endpoint is polled with an adaptive backoff
+    starting at MIN_CHECK_INTERVAL.
+    """
+
+    def __init__(
+        self,
+        container_name: str,
+        health_url: str,
+        docker_client: Optional[DockerClient] = None,
+        min_interval: float = MIN_CHECK_INTERVAL,
+        max_interval: float = MAX_CHECK_INTERVAL,
+    ):
+        self.container_name = container_name
+        self.health_url = health_url
+        self.docker_client = docker_client or DockerClient()
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._container_exited = threading.Event()
+        self._stopped = threading.Event()
+        self._exit_code: Optional[int] = None
+
+    def _watch_container(self):
+        """
+        Block on the container wait endpoint until the container stops.
+        Only an exit code means the container exited, if the wait itself fails the health endpoint
+        is still polled until the timeout.
+        """
+        try:
+            self._exit_code = self.docker_client.wait_container(self.container_name)
+        except (OSError, DockerError) as e:
+            if not self._stopped.is_set():
+                logger.warning(f"Cannot watch container {self.container_name}, only polling its health endpoint: {str(e)}")
+            return
+        self._container_exited.set()
+
+    def _is_healthy(self) -> bool:
+        try:
+            response = requests.get(self.health_url, timeout=HEALTH_REQUEST_TIMEOUT)
+            return response.status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    def wait(self, timeout: float, started_at: Optional[float] = None) -> ReadinessResult:
+        """
+        Wait until the server is healthy, the container exits or the timeout is reached.
+
+        Args:
+            timeout (float): Maximum time to wait in seconds
+            started_at (float, optional): time.monotonic() of the container launch, used for time_to_ready_s.
+                Defaults to the start of the wait.
+
+        Returns:
+            ReadinessResult: Whether the server is ready, why, and how long it took
+        """
+        if started_at is None:
+            started_at = time.monotonic()
+        deadline = time.monotonic() + timeout
+
+        watcher_thread = threading.Thread(target=self._watch_container, daemon=True)
+        watcher_thread.start()
+
+        interval = self.min_interval
+        last_log = time.monotonic()
+        try:
+            while time.monotonic() < deadline:
+                if self._is_healthy():
+                    return ReadinessResult(ready=True, reason="healthy", time_to_ready_s=time.monotonic() - started_at)
+                if self._container_exited.is_set():
+                    return ReadinessResult(ready=False, reason="container_exited", exit_code=self._exit_code)
+
+                if time.monotonic() - last_log > 30:
+                    logger.info(f"Waiting for server to be ready... ({int(time.monotonic() - started_at)}s)")
+                    last_log = time.monotonic()
+
+                # Wakes up immediately if the container exits
+                self._container_exited.wait(min(interval, max(deadline - time.monotonic(), 0)))
+                interval = min(interval * BACKOFF_FACTOR, self.max_interval)
+        finally:
+            # The wait thread returns once the container is removed
+            self._stopped.set()
+
+        return ReadinessResult(ready=False, reason="timeout")
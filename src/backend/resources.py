@@ -0,0 +1,271 @@
+import os
+import socket
+import subprocess
+import threading
+from typing import Optional
+from loguru import logger
+from pydantic import BaseModel
+
+from backend.docker_command import ContainerSpec
+from hardware.hardware_inventory import get_hardware_profile, parse_cpu_list
+
+CPU_HARDWARE_TYPES = {"cpu", "intel_cpu", "amd_cpu", "default_settings"}
+# Environment variable restricting the visible devices for accelerators which are not exposed with --gpus
+VISIBLE_DEVICES_ENV = {
+    "habana": "HABANA_VISIBLE_DEVICES",
+    "rocm": "HIP_VISIBLE_DEVICES",
+    "inferentia": "NEURON_RT_VISIBLE_CORES",
+}
+# Environment variables setting the number of compute threads, on top of OMP_NUM_THREADS
+THREADS_ENV = {
+    "llama_cpp": "LLAMA_ARG_THREADS",
+}
+# Share of the cpus kept out of the CPU backend slices for the load generator, at least one and at most MAX_CLIENT_CPUS
+CLIENT_CPU_SHARE = 1 / 16
+MAX_CLIENT_CPUS = 8
+
+
+class ResourceSlice(BaseModel):
+    """
+    The devices and cpus given to a single benchmark job.
+    """
+    device_ids: Optional[list[str]] = None
+    cpuset_cpus: Optional[str] = None
+    # NUMA nodes the memory is allocated on, the nodes of the cpus
+    cpuset_mems: Optional[str] = None
+    # Compute threads, one per physical core of the cpus
+    threads: Optional[int] = None
+
+
+def get_device_ids(hardware_type: str) -> Optional[list[str]]:
+    """
+    Get the ids of the accelerator devices of the machine, None if the devices cannot be enumerated.
+    """
+    if hardware_type == "cuda":
+        try:
+            output = subprocess.check_output(
+                ["nvidia-smi", "--query-gpu=index", "--format=csv,noheader"], stderr=subprocess.DEVNULL
+            ).decode("utf-8")
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        return [line.strip() for line in output.splitlines() if line.strip()]
+    return None
+
+
+def format_cpuset(cpus: list[int]) -> str:
+    """
+    Format cpu ids as a docker cpuset, for example [0, 1, 2, 5] -> "0-2,5".
+    """
+    ranges: list[str] = []
+    start = previous = None
+    for cpu in sorted(cpus):
+        if start is None:
+            start = previous = cpu
+        elif cpu == previous + 1:
+            previous = cpu
+        else:
+            ranges.append(f"{start}-{previous}" if start != previous else str(start))
+            start = previous = cpu
+    if start is not None:
+        ranges.append(f"{start}-{previous}" if start != previous else str(start))
+    return ",".join(ranges)
+
+
+def split_evenly(items: list, parts: int) -> list[list]:
+    """
+    Split items in `parts` contiguous groups whose sizes differ by at most one.
+    """
+    size, remainder = divmod(len(items), parts)
+    groups = []
+    start = 0
+    for index in range(parts):
+        end = start + size + (1 if index < remainder else 0)
+        groups.append(items[start:end])
+        start = end
+    return groups
+
+
+def get_allowed_cpus() -> list[int]:
+    return sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+
+
+def get_client_cpus(cpus: list[int]) -> list[int]:
+    """
+    Get the cpus reserved for the load generator out of the cpus of the CPU backend slices, taken from the end
+    of the last NUMA node so the slices stay aligned on the nodes. None are reserved on a single cpu.
+    """
+    count = min(max(int(len(cpus) * CLIENT_CPU_SHARE), 1), MAX_CLIENT_CPUS)
+    if count >= len(cpus):
+        return []
+    return sorted(cpus)[-count:]
+
+
+def get_load_generator_cpus(resources: Optional[ResourceSlice], hardware_type: str) -> list[int]:
+    """
+    Get the cpus the load generator processes of a job are pinned to.
+    A CPU backend gets the cpus reserved for the client outside of every slice, so the client neither steals cycles
+    from its backend nor from the backends of the other jobs, an empty list if none could be reserved.
+    Accelerator backends leave their host cpus mostly idle and share them with the client.
+    """
+    allowed_cpus = get_allowed_cpus()
+    if resources is None or resources.cpuset_cpus is None:
+        return [] if hardware_type in CPU_HARDWARE_TYPES else allowed_cpus
+    slice_cpus = set(parse_cpu_list(resources.cpuset_cpus))
+    if hardware_type in CPU_HARDWARE_TYPES:
+        return [cpu for cpu in get_client_cpus(allowed_cpus) if cpu not in slice_cpus]
+    return [cpu for cpu in allowed_cpus if cpu in slice_cpus]
+
+
+def get_numa_cpus(cpus: list[int]) -> list[tuple[Optional[int], list[int]]]:
+    """
+    Group cpus by NUMA node as (node id, cpus), a single group with no node id if the topology is unknown.
+    """
+    groups = [
+        (node.node_id, [cpu for cpu in node.cpus if cpu in cpus]) for node in get_hardware_profile().numa_nodes
+    ]
+    groups = [(node_id, node_cpus) for node_id, node_cpus in groups if node_cpus]
+    return groups or [(None, sorted(cpus))]
+
+
+def make_cpu_slice(cpus: list[int], node_ids: list[Optional[int]]) -> ResourceSlice:
+    """
+    Create the slice of a group of cpus, with its memory on their NUMA nodes and one thread per physical core.
+    """
+    cpu_info = get_hardware_profile().cpu
+    threads_per_core = max(cpu_info.logical_cpus // cpu_info.physical_cores, 1)
+    node_ids = [node_id for node_id in node_ids if node_id is not None]
+    return ResourceSlice(
+        cpuset_cpus=format_cpuset(cpus),
+        cpuset_mems=format_cpuset(node_ids) if node_ids else None,
+        threads=max(len(cpus) // threads_per_core, 1),
+    )
+
+
+def get_cpu_slices(parts: int, cpus: Optional[list[int]] = None) -> list[ResourceSlice]:
+    """
+    Split cpus in `parts` slices following the NUMA topology, so a slice never spans more nodes than needed:
+    whole nodes are shared out when there are at least as many nodes as parts, otherwise each node is split.
+
+    Args:
+        parts (int): Number of slices
+        cpus (list[int], optional): The cpus to split. Defaults to the cpus this process may run on.
+    """
+    if cpus is None:
+        cpus = get_allowed_cpus()
+    nodes = get_numa_cpus(cpus)
+
+    if parts <= len(nodes):
+        node_groups = split_evenly(nodes, parts)
+        return [
+            make_cpu_slice(
+                [cpu for _, node_cpus in node_group for cpu in node_cpus],
+                [node_id for node_id, _ in node_group],
+            )
+            for node_group in node_groups
+        ]
+
+    slices: list[ResourceSlice] = []
+    parts_per_node = split_evenly(list(range(parts)), len(nodes))
+    for (node_id, node_cpus), node_parts in zip(nodes, parts_per_node):
+        for cpu_group in split_evenly(node_cpus, min(len(node_parts), len(node_cpus))):
+            slices.append(make_cpu_slice(cpu_group, [node_id]))
+    return slices
+
+
+def split_by_numa_node(resources: ResourceSlice) -> list[ResourceSlice]:
+    """
+    Split a slice into one slice per NUMA node it spans, to run one backend instance per node.
+    """
+    cpus = parse_cpu_list(resources.cpuset_cpus) if resources.cpuset_cpus else get_allowed_cpus()
+    return [make_cpu_slice(node_cpus, [node_id]) for node_id, node_cpus in get_numa_cpus(cpus)]
+
+
+def get_resource_slices(hardware_type: str, workers: int) -> list[ResourceSlice]:
+    """
+    Split the machine devices and cpus into one slice per worker.
+    Accelerators which cannot be enumerated are not sliced, so only a single worker can use them.
+    CPU backends are always pinned, even with a single worker, so they do not float across sockets,
+    and leave the cpus of the load generator free.
+
+    Returns:
+        list[ResourceSlice]: One slice per worker, fewer than `workers` if there are not enough devices
+    """
+    if hardware_type in CPU_HARDWARE_TYPES:
+        cpus = get_allowed_cpus()
+        client_cpus = set(get_client_cpus(cpus))
+        return get_cpu_slices(max(workers, 1), [cpu for cpu in cpus if cpu not in client_cpus])
+    if workers <= 1:
+        return [ResourceSlice()]
+
+    device_ids = get_device_ids(hardware_type)
+    if not device_ids:
+        logger.warning(f"Cannot split {hardware_type} devices between jobs, running a single job at a time")
+        return [ResourceSlice()]
+    if len(device_ids) < workers:
+        logger.warning(f"Only {len(device_ids)} devices for {workers} workers, running {len(device_ids)} jobs at a time")
+        workers = len(device_ids)
+    device_groups = split_evenly(device_ids, workers)
+
+    cpus = get_allowed_cpus()
+    cpu_slices = get_cpu_slices(min(workers, len(cpus)), cpus)
+    for index, cpu_slice in enumerate(cpu_slices):
+        cpu_slice.device_ids = device_groups[index]
+    return cpu_slices
+
+
+def set_env(spec: ContainerSpec, variable: str, value: str):
+    spec.env = [env for env in spec.env if not env.startswith(f"{variable}=")]
+    spec.env.append(f"{variable}={value}")
+
+
+def apply_resource_slice(
+    spec: ContainerSpec, resources: ResourceSlice, hardware_type: str, backend_type: Optional[str] = None
+):
+    """
+    Restrict a container to a resource slice, in place.
+    """
+    if resources.cpuset_cpus is not None:
+        spec.cpuset_cpus = resources.cpuset_cpus
+    if resources.cpuset_mems is not None:
+        spec.cpuset_mems = resources.cpuset_mems
+    # Accelerator backends keep their own threading, their slice only bounds the host cpus
+    if resources.threads is not None and hardware_type in CPU_HARDWARE_TYPES:
+        set_env(spec, "OMP_NUM_THREADS", str(resources.threads))
+        if backend_type in THREADS_ENV:
+            set_env(spec, THREADS_ENV[backend_type], str(resources.threads))
+        if backend_type == "vllm" and resources.cpuset_cpus is not None:
+            # The vLLM CPU backend binds its OpenMP threads to these cpus
+            set_env(spec, "VLLM_CPU_OMP_THREADS_BIND", resources.cpuset_cpus)
+
+    if resources.device_ids is None:
+        return
+    if spec.device_requests:
+        for device_request in spec.device_requests:
+            device_request.pop("Count", None)
+            device_request["DeviceIDs"] = resources.device_ids
+    elif hardware_type in VISIBLE_DEVICES_ENV:
+        set_env(spec, VISIBLE_DEVICES_ENV[hardware_type], ",".join(resources.device_ids))
+
+
+class PortAllocator:
+    """
+    Hand out free host ports, never giving the same port to two running jobs.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._allocated: set[int] = set()
+
+    def allocate(self) -> int:
+        with self._lock:
+            while True:
+                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                    sock.bind(("", 0))
+                    port = sock.getsockname()[1]
+                if port not in self._allocated:
+                    self._allocated.add(port)
+                    return port
+
+    def release(self, port: int):
+        with self._lock:
+            self._allocated.discard(port)
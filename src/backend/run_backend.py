@@ -1,85 +1,196 @@
 from jinja2 import Template
-import subprocess
 import time
 import threading
+import contextvars
+import errno
 from typing import Optional
-from model.weights import NO_WEIGHTS_CACHE_DIR
+from model.weights import CONTAINER_MODEL_DIR, get_no_weights_model_path
 from huggingface_hub.utils._auth import get_token
 from hardware.hardware_info import get_hardware_info
-from backend.backend_types import get_backend_types
+from backend.backend_types import SIMULATED_BACKEND, get_backend_types
+from backend.readiness import ReadinessWatcher
+from backend.docker_client import DockerClient, DockerError, NotFoundError
+from backend.docker_command import parse_docker_run
+from backend.log_events import OUT_OF_MEMORY
+from backend.log_capture import LogCapture
+from backend.resources import ResourceSlice, apply_resource_slice
+from backend.simulated_backend import SimulatedBackend, SimulatedStartupError, get_simulated_backend_config
 from loguru import logger
-import requests
 from huggingface_hub.constants import HF_HOME
 import os
 from pathlib import Path
 
 from model.get_models import Model
+from model.model_cache import MODEL_CACHE_DIR
 
 BENCHMARKING_CONTAINER_NAME = "llm-hardware-benchmark"
+DEFAULT_HOST_PORT = 8080
+# Seconds given to the log stream to capture the last lines of an exited container
+LOG_DRAIN_TIMEOUT = 5
+# Failure reason of a simulated backend whose host port is taken
+PORT_IN_USE = "port_in_use"
+
+
+def render_docker_command(
+    model_id: str,
+    backend_type: str,
+    hardware_type: str,
+    container_name: str = BENCHMARKING_CONTAINER_NAME,
+    host_port: int = DEFAULT_HOST_PORT,
+    no_weights: Optional[bool] = False,
+) -> str:
+    """
+    Render the docker run command of a backend from its template and the hardware settings.
+
+    Args:
+        model_id (str): The model id passed to the backend
+        backend_type (str): Type of backend to run ('vllm' or 'tgi')
+        hardware_type (str): The hardware type in hardware_info.yaml
+        container_name (str): Name of the container
+        host_port (int): Host port the server is published on
+        no_weights (bool): Whether the model is loaded without weights
+
+    Returns:
+        str: The docker run command
+    """
+    hardware_info = get_hardware_info(hardware_type)
+    
+    # Read the appropriate template file
+    template_path = f"src/backend/{backend_type}/{backend_type}.jinja2"
+    with open(template_path, "r") as f:
+        template_content = f.read()
+                
+    if hardware_info.hardware_type == "default_settings":
+        logger.warning("No hardware type specified, using default settings, this could lead to errors as some backends require to specify the hardware type")
+        
+    backend_info = hardware_info.backends[backend_type].model_dump(exclude_none=True)
+    
+    # Create template and render with parameters
+    template = Template(template_content)
+    
+    extra_docker_args = {
+        "hf_token": f"--env HF_TOKEN={get_token()}",
+        "container_name": f"--name {container_name}",
+    }
+    
+    if no_weights:
+        # The backend loads the no weights checkpoint from a mounted directory, without any download
+        extra_docker_args["no_weights_model"] = (
+            f"-v {get_no_weights_model_path(model_id)}:{CONTAINER_MODEL_DIR}:ro --env HF_HUB_OFFLINE=1"
+        )
+    
+    backend_info["benchmark_docker_args"] = f"{backend_info.get('docker_args', '')} {' '.join(extra_docker_args.values())}"
+    backend_info.pop("docker_args", None)
+
+    template_args = {
+        **backend_info
+    }
+    template_args["model"] = CONTAINER_MODEL_DIR if no_weights else model_id
+    # Keep serving the model under its repository id when it is loaded from a directory
+    template_args["served_model_name"] = model_id if no_weights else None
+    template_args["home_dir"] = str(Path.home())
+    # Mounted as the hub cache of the container, so the snapshots downloaded by the model cache are found
+    template_args["hub_cache_dir"] = MODEL_CACHE_DIR
+    template_args["host_port"] = host_port
+    return template.render(**template_args)
 
 
 class BackendRunner:
 
-    def __init__(self):
-        self.process = None
+    def __init__(
+        self,
+        docker_client: Optional[DockerClient] = None,
+        container_name: str = BENCHMARKING_CONTAINER_NAME,
+        host_port: int = DEFAULT_HOST_PORT,
+        resources: Optional[ResourceSlice] = None,
+        log_path: Optional[str] = None,
+    ):
+        self.docker_client = docker_client or DockerClient()
+        self.container_name = container_name
+        self.host_port = host_port
+        self.resources = resources
+        # gzip file every container log line is spilled to, only the last lines are kept in memory otherwise
+        self.log_path = log_path
+        self.log_capture: Optional[LogCapture] = None
+        self._log_thread: Optional[threading.Thread] = None
+        self.failure_reason: Optional[str] = None
+        self.container_id: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.time_to_ready_s: Optional[float] = None
+        self.backend_type: Optional[str] = None
+        # Monotonic time of the first occurrence of each startup milestone of the last run
+        self.startup_times: dict[str, float] = {}
+        # Served in process instead of a container for the simulated backend
+        self.simulated_backend: Optional[SimulatedBackend] = None
+
+    @property
+    def health_url(self) -> str:
+        return f"http://localhost:{self.host_port}/health"
+
+    def _mark(self, milestone: str):
+        """Record the time a startup milestone is reached, only its first occurrence is kept."""
+        self.startup_times.setdefault(milestone, time.monotonic())
 
-    @staticmethod
-    def _log_stream(stream):
-        """Log output from a stream line by line with a prefix."""
-        for line in iter(stream.readline, ''):
-            if line:
-                print(line.strip())
+    def _log_stream(self, container_id: str, log_capture: LogCapture):
+        """Capture the container output line by line until the container stops, recording the startup milestones."""
+        try:
+            for stream, line in self.docker_client.logs(container_id, follow=True):
+                self._mark("first_log")
+                for event in log_capture.feed(stream, line):
+                    self._mark(event.name)
+        except (OSError, DockerError):
+            # The container was removed while streaming
+            pass
+        finally:
+            log_capture.close()
+
+    def _print_logs(self, tail: int = 200):
+        """Print the last captured container log lines to help with debugging."""
+        if self.log_capture is None:
+            return
+        for line in self.log_capture.tail(tail):
+            logger.info(f"[{self.container_name}] {line}")
+        if self.log_path is not None:
+            logger.info(f"Full container logs in {self.log_path}")
 
-    def wait_for_server(self, backend_type, timeout=3000, check_interval=10):
+    def _classify_failure(self, reason: str) -> str:
+        """Get the cause of a failed startup from the container logs and state, falling back to the readiness reason."""
+        if self._log_thread is not None:
+            # Let the log stream drain the last lines of an exited container
+            self._log_thread.join(timeout=LOG_DRAIN_TIMEOUT)
+        if self.log_capture is not None and self.log_capture.failure is not None:
+            return self.log_capture.failure
+        try:
+            state = self.docker_client.inspect_container(self.container_name)["State"]
+            if state.get("OOMKilled"):
+                return OUT_OF_MEMORY
+        except (OSError, DockerError):
+            pass
+        return reason
+
+    def wait_for_server(self, backend_type, timeout=3000) -> bool:
         """
-        Wait for the server to be ready by checking the health endpoint and container status.
+        Wait for the server to be ready by watching the container state and the health endpoint.
+        Returns as soon as the server is healthy or the container exits.
         
         Args:
             timeout (int): Maximum time to wait in seconds
-            check_interval (int): Time between checks in seconds
         
         Returns:
             bool: True if server is ready, False otherwise
         """   
-        start_time = time.time()
-        attempts = 0
-        while time.time() - start_time < timeout:
-            try:
-                # Check if container is still running
-                result = subprocess.run(
-                    f"docker inspect -f '{{{{.State.Status}}}}' {BENCHMARKING_CONTAINER_NAME}",
-                    shell=True,
-                    capture_output=True,
-                    text=True
-                )
-                
-                if result.returncode == 0:
-                    status = result.stdout.strip()
-                    if status == 'exited':
-                        # Get container logs to help with debugging
-                        subprocess.run(f"docker logs {BENCHMARKING_CONTAINER_NAME}", shell=True)
-                        raise RuntimeError("Container exited before becoming ready")
-                    elif status != 'running':
-                        raise RuntimeError(f"Container is in unexpected state: {status}")
-                
-                # Check if server is responding
-                url = "http://localhost:8080/health"
-                response = requests.get(url)
-                if response.status_code == 200:
-                    return True
-            except requests.exceptions.RequestException:
-                pass
-            except RuntimeError as e:
-                logger.error(f"Container failed: {str(e)}")
-                return False
-            
-            time.sleep(check_interval)
-            attempts += 1
-            if attempts % 1 == 0:
-                logger.info(f"Waiting for server to be ready... ({int(time.time() - start_time)}s)")
+        watcher = ReadinessWatcher(self.container_name, self.health_url, docker_client=self.docker_client)
+        readiness = watcher.wait(timeout, started_at=self.started_at)
+        
+        if readiness.ready:
+            self._mark("healthy")
+            self.time_to_ready_s = readiness.time_to_ready_s
+            logger.info(f"Server ready in {readiness.time_to_ready_s:.1f}s")
+            return True
         
-        # If we timeout, get container logs to help with debugging
-        subprocess.run(f"docker logs {BENCHMARKING_CONTAINER_NAME}", shell=True)
+        self.failure_reason = self._classify_failure(readiness.reason)
+        logger.error(f"Server not ready: {self.failure_reason} (exit code {readiness.exit_code})")
+        self._print_logs()
         return False
 
     def run(
@@ -87,7 +198,8 @@ class BackendRunner:
         model: Model, 
         backend_type: str, 
         hardware_type: str,
-        no_weights: Optional[bool] = True
+        no_weights: Optional[bool] = True,
+        image: Optional[str] = None,
     ) -> tuple[bool, Optional[str]]:
         """
         Run the backend docker container based on model and HuggingFace token parameters.
@@ -96,66 +208,36 @@ class BackendRunner:
             model (str): The model identifier to use
             backend_type (str): Type of backend to run ('vllm' or 'tgi')
             no_weights (bool): Whether to download the model without weights. Defaults to True
+            image (str, optional): Image reference to run instead of the template one, for example pinned to a digest
 
         Returns:
             bool: True if the backend is working, False otherwise
         """
+        self.failure_reason = None
+        if backend_type == SIMULATED_BACKEND:
+            return self._run_simulated(model)
         try:
             # Validate backend type
             if backend_type not in get_backend_types():
                 raise ValueError("backend_type must be either 'vllm' or 'tgi'")
             
-            # Stop any existing containers
-            try:
-                subprocess.run("docker ps | grep vllm/vllm-openai | awk '{print $1}' | xargs -r docker stop", 
-                            shell=True, check=True)
-            except subprocess.CalledProcessError:
-                pass  # Ignore errors if no containers are running
-            
-            hardware_info = get_hardware_info(hardware_type)
-            
-            # Read the appropriate template file
-            template_path = f"src/backend/{backend_type}/{backend_type}.jinja2"
-            with open(template_path, "r") as f:
-                template_content = f.read()
-                        
-            if hardware_info.hardware_type == "default_settings":
-                logger.warning("No hardware type specified, using default settings, this could lead to errors as some backends require to specify the hardware type")
-                
-            backend_info = hardware_info.backends[backend_type].model_dump(exclude_none=True)
-            
-            # Create template and render with parameters
-            template = Template(template_content)
-            
-            extra_docker_args = {
-                "hf_token": f"--env HF_TOKEN={get_token()}",
-                "container_name": f"--name {BENCHMARKING_CONTAINER_NAME}",
-            }
-            
-            if no_weights:
-                extra_docker_args["hf_cache"] = f"--env HF_HUB_CACHE={NO_WEIGHTS_CACHE_DIR}"
-            
-            backend_info["benchmark_docker_args"] = f"{backend_info['docker_args']} {' '.join(extra_docker_args.values())}"
-            del backend_info["docker_args"]
-
-            template_args = {
-                **backend_info
-            }
+            # Remove any leftover container with the same name
+            self._remove_container()
             
             if backend_type == "llama_cpp":
-                template_args["model"] = model.gguf_hf_model_id
+                model_id = model.gguf_hf_model_id
                 print("HF_HOME value:", HF_HOME)
                 llama_cpp_cache_dir = os.path.join(HF_HOME, "llama.cpp")
                 print("llama_cpp_cache_dir", llama_cpp_cache_dir)
                 os.makedirs(llama_cpp_cache_dir, exist_ok=True)
-                # Add home directory to template args
             elif backend_type == "tgi" or backend_type == "vllm":
-                template_args["model"] = model.hf_model_id
+                model_id = model.hf_model_id
             else:
                 raise ValueError(f"Invalid backend type: {backend_type}")
             
-            template_args["home_dir"] = str(Path.home())
-            docker_command = template.render(**template_args)
+            docker_command = render_docker_command(
+                model_id, backend_type, hardware_type, self.container_name, self.host_port, no_weights
+            )
 
             # Log the docker command (without sensitive info)
             token = get_token()
@@ -164,40 +246,32 @@ class BackendRunner:
             else:
                 logger.info(f"Running docker command: {docker_command}")
 
-            env = {}
-            if no_weights:
-                env["HUGGING_FACE_HUB_TOKEN"] = get_token()
-                env["HF_HUB_CACHE"] = NO_WEIGHTS_CACHE_DIR
-
-            # Execute the docker command in the background
-            self.process = subprocess.Popen(
-                docker_command, 
-                shell=True, 
-                env=env,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                universal_newlines=True
-            )
-            
-            # Start threads to log stdout and stderr
-            stdout_thread = threading.Thread(target=self._log_stream, args=(self.process.stdout,))
-            stderr_thread = threading.Thread(target=self._log_stream, args=(self.process.stderr,))
-            stdout_thread.daemon = True
-            stderr_thread.daemon = True
-            stdout_thread.start()
-            stderr_thread.start()
+            # The rendered command is kept as the reproducible command, the container is created through the Engine API
+            container_spec = parse_docker_run(docker_command)
+            if self.resources is not None:
+                apply_resource_slice(container_spec, self.resources, hardware_type, backend_type)
+            if image is not None:
+                container_spec.image = image
+
+            self.backend_type = backend_type
+            self.startup_times = {}
+            self.log_capture = LogCapture(backend_type, self.container_name, self.log_path)
+            self.started_at = time.monotonic()
+            self._mark("create")
+            self.container_id = self.docker_client.create_container(container_spec)
+            self._mark("created")
+            self.docker_client.start_container(self.container_id)
+            self._mark("started")
             
-            # Check if process failed immediately
-            time.sleep(2)  # Give it a moment to potentially fail
-            if self.process.poll() is not None:
-                # Process has already exited
-                exit_code = self.process.poll()
-                stderr_output = self.process.stderr.read()
-                raise RuntimeError(f"Docker container failed to start (exit code {exit_code}): {stderr_output}")
+            # Start a thread to capture the container output
+            # Run it in a copy of the current context so the lines keep the job logging context
+            self._log_thread = threading.Thread(
+                target=contextvars.copy_context().run, args=(self._log_stream, self.container_id, self.log_capture)
+            )
+            self._log_thread.daemon = True
+            self._log_thread.start()
             
-            # Wait for server to be ready
+            # Wait for server to be ready, this also returns early if the container exits
             logger.info("Starting server and waiting for it to be ready...")
             if not self.wait_for_server(backend_type):
                 raise RuntimeError("Server failed to start within timeout period or container exited")
@@ -206,6 +280,7 @@ class BackendRunner:
             
         except Exception as e:
             logger.error(f"Failed to run docker container: {str(e)}")
+            self.failure_reason = self.failure_reason or "run_error"
             self.stop()  # Ensure cleanup on failure
             return False, None
         
@@ -224,8 +299,9 @@ class BackendRunner:
             home_dir = str(Path.home())
             docker_command = docker_command.replace(home_dir, "~")
             
-            # Remove --name llm-hardware-benchmark
-            docker_command = docker_command.replace("--name llm-hardware-benchmark", "")
+            # Remove the container name and use the default port, both are specific to this benchmark job
+            docker_command = docker_command.replace(f"--name {self.container_name}", "")
+            docker_command = docker_command.replace(f"-p {self.host_port}:", f"-p {DEFAULT_HOST_PORT}:")
             
             return docker_command.strip()
         
@@ -233,16 +309,50 @@ class BackendRunner:
         
         return True, cleaned_docker_command
 
-    def stop(self):
-        """Stop the running container and the associated process if they exist."""
+    def _run_simulated(self, model: Model) -> tuple[bool, Optional[str]]:
+        """Start the simulated backend in process on the host port, there is no docker command to record."""
+        self.backend_type = SIMULATED_BACKEND
+        self.startup_times = {}
+        self.started_at = time.monotonic()
+        self._mark("create")
+        self.simulated_backend = SimulatedBackend(
+            get_simulated_backend_config(), served_model_name=model.hf_model_id, port=self.host_port
+        )
         try:
-            if self.process:
-                self.process.kill()
-                self.process = None
-        except Exception as e:
-            logger.error(f"Failed to kill process: {str(e)}")
-        
+            self.simulated_backend.start()
+        except SimulatedStartupError as e:
+            logger.error(str(e))
+            self.failure_reason = e.reason
+            self.simulated_backend = None
+            return False, None
+        except OSError as e:
+            logger.error(f"Simulated backend failed to serve on port {self.host_port}: {str(e)}")
+            self.failure_reason = PORT_IN_USE if e.errno == errno.EADDRINUSE else "run_error"
+            self.simulated_backend = None
+            return False, None
+        self._mark("started")
+        self.simulated_backend.wait_ready()
+        self._mark("healthy")
+        self.time_to_ready_s = time.monotonic() - self.started_at
+        logger.info(f"Simulated server ready in {self.time_to_ready_s:.1f}s")
+        return True, None
+
+    def _remove_container(self):
+        """Remove the benchmarking container if it exists."""
+        try:
+            self.docker_client.remove_container(self.container_name, force=True)
+        except NotFoundError:
+            pass
+
+    def stop(self):
+        """Stop and remove the running container if it exists."""
+        if self.backend_type == SIMULATED_BACKEND:
+            if self.simulated_backend is not None:
+                self.simulated_backend.stop()
+                self.simulated_backend = None
+            return
         try:
-            subprocess.run(f"docker rm -f {BENCHMARKING_CONTAINER_NAME}", shell=True, check=True)
-        except subprocess.CalledProcessError as e:
+            self._remove_container()
+            self.container_id = None
+        except (OSError, DockerError) as e:
             logger.error(f"Failed to kill container: {str(e)}")
@@ -0,0 +1,448 @@
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Queue
+from typing import Optional
+from loguru import logger
+from pydantic import BaseModel
+
+from backend.log_events import OUT_OF_MEMORY
+
+# JSON SimulatedBackendConfig used by the benchmarks, the defaults otherwise
+SIMULATED_BACKEND_CONFIG_ENV = "SIMULATED_BACKEND_CONFIG"
+# Words the generated text cycles through, one per token
+VOCABULARY = "Deep learning is a subset of machine learning based on neural networks with many layers .".split()
+LATENCY_BUCKETS = [0.001, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+
+
+class SimulatedBackendConfig(BaseModel):
+    """
+    The cost model and behaviour of the simulated backend. Every step of the engine runs the prefill of the
+    newly admitted requests and one decode token of every running request, and takes
+    step_s + prefill_tokens * prefill_s_per_token + decode_sequences * decode_s_per_sequence seconds.
+    """
+    step_s: float = 0.01
+    prefill_s_per_token: float = 0.0001
+    decode_s_per_sequence: float = 0.0002
+    # Continuous batching limits, requests wait in the queue above them
+    max_batch_size: int = 64
+    kv_cache_tokens: int = 65536
+    # Tokens generated when the request does not set max_tokens or ignore_eos
+    output_tokens: int = 64
+    # Seconds /health answers 503 after the start
+    startup_s: float = 0.0
+    # Share of the requests answered with a 500 error, drawn from a seeded generator
+    failure_rate: float = 0.0
+    seed: int = 0
+    # Failure reason of an injected failed start, for example "out_of_memory"
+    start_failure: Optional[str] = None
+    # The server crashes out of memory once this many requests were admitted
+    oom_after_requests: Optional[int] = None
+
+    def step_time_s(self, prefill_tokens: int, decode_sequences: int) -> float:
+        return self.step_s + prefill_tokens * self.prefill_s_per_token + decode_sequences * self.decode_s_per_sequence
+
+    def expected_output_tokens_per_second(self, concurrency: int, prompt_tokens: int, output_tokens: int) -> float:
+        """
+        Get the throughput of a closed loop at a concurrency level, when the batch runs in lockstep:
+        one step prefills the whole batch and emits the first tokens, the next ones each decode one token.
+        Staggered arrivals mix prefills into the decode steps, so measured throughputs are slightly lower.
+        """
+        batch_size = min(concurrency, self.max_batch_size, self.kv_cache_tokens // (prompt_tokens + output_tokens))
+        cycle_s = self.step_time_s(batch_size * prompt_tokens, 0) + (output_tokens - 1) * self.step_time_s(0, batch_size)
+        return batch_size * output_tokens / cycle_s
+
+
+def get_simulated_backend_config() -> SimulatedBackendConfig:
+    config = os.environ.get(SIMULATED_BACKEND_CONFIG_ENV)
+    return SimulatedBackendConfig.model_validate_json(config) if config else SimulatedBackendConfig()
+
+
+class SimulatedStartupError(Exception):
+    def __init__(self, reason: str):
+        super().__init__(f"Simulated backend failed to start: {reason}")
+        self.reason = reason
+
+
+class Histogram:
+    def __init__(self, buckets: list[float] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def render(self, name: str) -> list[str]:
+        lines = [f"# TYPE {name} histogram"]
+        lines += [f'{name}_bucket{{le="{bound}"}} {count}' for bound, count in zip(self.buckets, self.counts)]
+        lines += [f'{name}_bucket{{le="+Inf"}} {self.count}', f"{name}_sum {self.sum}", f"{name}_count {self.count}"]
+        return lines
+
+
+class SimulatedRequest:
+    def __init__(self, prompt_tokens: int, max_tokens: int):
+        self.prompt_tokens = prompt_tokens
+        self.max_tokens = max_tokens
+        self.generated = 0
+        self.arrived_at = time.monotonic()
+        self.admitted_at: Optional[float] = None
+        self.first_token_at: Optional[float] = None
+        # Generated words, then None once done, or an error message
+        self.tokens: Queue = Queue()
+
+    @property
+    def kv_tokens(self) -> int:
+        return self.prompt_tokens + self.max_tokens
+
+
+class SimulatedEngine:
+    """
+    A continuous batching engine running the cost model in real time on its own thread.
+    """
+
+    def __init__(self, config: SimulatedBackendConfig):
+        self.config = config
+        self._condition = threading.Condition()
+        self._waiting: list[SimulatedRequest] = []
+        self._running: list[SimulatedRequest] = []
+        self._stopped = False
+        self.crashed = False
+        self._admitted = 0
+        self._random = random.Random(config.seed)
+        self.prompt_tokens_total = 0
+        self.generation_tokens_total = 0
+        self.request_success_total = 0
+        self.request_failure_total = 0
+        self.queue_time = Histogram()
+        self.ttft = Histogram()
+        self.tpot = Histogram()
+        self._thread = threading.Thread(target=self._run, name="simulated-engine", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    @property
+    def kv_cache_usage(self) -> float:
+        return sum(request.kv_tokens for request in self._running) / self.config.kv_cache_tokens
+
+    def submit(self, request: SimulatedRequest) -> Optional[str]:
+        """Queue a request, returning the error of a rejected one."""
+        with self._condition:
+            if self.crashed:
+                return "The server crashed"
+            if request.kv_tokens > self.config.kv_cache_tokens:
+                return f"The request needs {request.kv_tokens} tokens, more than the KV cache holds"
+            if self._random.random() < self.config.failure_rate:
+                self.request_failure_total += 1
+                return "Injected failure"
+            self._waiting.append(request)
+            self._condition.notify_all()
+        return None
+
+    def _crash(self):
+        """Fail every request, like a backend killed out of memory. Called with the lock held."""
+        logger.error("Simulated backend crashed: out of memory")
+        self.crashed = True
+        for request in self._waiting + self._running:
+            request.tokens.put(OUT_OF_MEMORY)
+            self.request_failure_total += 1
+        self._waiting.clear()
+        self._running.clear()
+
+    def _admit(self):
+        """Move waiting requests into the batch in arrival order while they fit. Called with the lock held."""
+        kv_tokens = sum(request.kv_tokens for request in self._running)
+        while self._waiting and len(self._running) < self.config.max_batch_size:
+            request = self._waiting[0]
+            if kv_tokens + request.kv_tokens > self.config.kv_cache_tokens:
+                break
+            self._waiting.pop(0)
+            request.admitted_at = time.monotonic()
+            self.queue_time.observe(request.admitted_at - request.arrived_at)
+            self._running.append(request)
+            kv_tokens += request.kv_tokens
+            self._admitted += 1
+            if self.config.oom_after_requests is not None and self._admitted > self.config.oom_after_requests:
+                self._crash()
+                return
+
+    def _run(self):
+        next_step_at = time.monotonic()
+        while True:
+            with self._condition:
+                while not self._stopped and not self._waiting and not self._running:
+                    self._condition.wait()
+                    # The engine idled, the next step starts now rather than catching up
+                    next_step_at = time.monotonic()
+                if self._stopped:
+                    return
+                self._admit()
+                batch = list(self._running)
+                prefill_tokens = sum(request.prompt_tokens for request in batch if request.generated == 0)
+                decode_sequences = sum(1 for request in batch if request.generated > 0)
+
+            # Steps are scheduled on an absolute clock so sleep overshoots do not add up over a run
+            next_step_at += self.config.step_time_s(prefill_tokens, decode_sequences)
+            time.sleep(max(next_step_at - time.monotonic(), 0))
+
+            with self._condition:
+                now = time.monotonic()
+                for request in batch:
+                    if request not in self._running:
+                        # Failed by a crash during the step
+                        continue
+                    if request.generated == 0:
+                        request.first_token_at = now
+                        self.ttft.observe(now - request.arrived_at)
+                        self.prompt_tokens_total += request.prompt_tokens
+                    request.tokens.put(VOCABULARY[request.generated % len(VOCABULARY)])
+                    request.generated += 1
+                    self.generation_tokens_total += 1
+                    if request.generated >= request.max_tokens:
+                        if request.generated > 1:
+                            self.tpot.observe((now - request.first_token_at) / (request.generated - 1))
+                        request.tokens.put(None)
+                        self.request_success_total += 1
+                        self._running.remove(request)
+
+    def render_metrics(self) -> str:
+        with self._condition:
+            lines = [
+                "# TYPE simulated_num_requests_running gauge",
+                f"simulated_num_requests_running {len(self._running)}",
+                "# TYPE simulated_num_requests_waiting gauge",
+                f"simulated_num_requests_waiting {len(self._waiting)}",
+                "# TYPE simulated_kv_cache_usage_ratio gauge",
+                f"simulated_kv_cache_usage_ratio {self.kv_cache_usage}",
+                "# TYPE simulated_prompt_tokens_total counter",
+                f"simulated_prompt_tokens_total {self.prompt_tokens_total}",
+                "# TYPE simulated_generation_tokens_total counter",
+                f"simulated_generation_tokens_total {self.generation_tokens_total}",
+                "# TYPE simulated_request_success_total counter",
+                f"simulated_request_success_total {self.request_success_total}",
+                "# TYPE simulated_request_failure_total counter",
+                f"simulated_request_failure_total {self.request_failure_total}",
+            ]
+            lines += self.queue_time.render("simulated_request_queue_time_seconds")
+            lines += self.ttft.render("simulated_time_to_first_token_seconds")
+            lines += self.tpot.render("simulated_time_per_output_token_seconds")
+        return "\n".join(lines) + "\n"
+
+
+def count_prompt_tokens(messages: list[dict]) -> int:
+    """Count one token per word of the messages, the simulated backend has no tokenizer."""
+    return max(sum(len(str(message.get("content", "")).split()) for message in messages), 1)
+
+
+class SimulatedRequestHandler(BaseHTTPRequestHandler):
+    # Keep the connections of the load generator clients alive, like the real servers
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, Nagle's algorithm would delay every response by a delayed ACK
+    disable_nagle_algorithm = True
+    server: "SimulatedHTTPServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_error(self, status: int, message: str):
+        self._send_json(status, {"error": {"message": message, "type": "server_error", "code": status}})
+
+    def _write_chunk(self, data: str):
+        payload = data.encode("utf-8")
+        self.wfile.write(f"{len(payload):x}\r\n".encode("ascii") + payload + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        backend = self.server.backend
+        if self.path == "/health":
+            if backend.engine.crashed or not backend.ready:
+                self._send_error(503, "Not ready")
+            else:
+                self._send_json(200, {})
+        elif self.path == "/metrics":
+            payload = backend.engine.render_metrics().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        elif self.path == "/v1/models":
+            self._send_json(200, {"object": "list", "data": [{"id": backend.served_model_name, "object": "model"}]})
+        else:
+            self._send_error(404, "Not found")
+
+    def do_POST(self):
+        if self.path != "/v1/chat/completions":
+            self._send_error(404, "Not found")
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            messages = body["messages"]
+        except (ValueError, KeyError):
+            self._send_error(400, "Invalid request")
+            return
+
+        config = self.server.backend.config
+        max_tokens = body.get("max_completion_tokens") or body.get("max_tokens")
+        # Without ignore_eos the simulated model stops after its usual answer length
+        if max_tokens is None or not body.get("ignore_eos"):
+            max_tokens = min(max_tokens or config.output_tokens, config.output_tokens)
+        request = SimulatedRequest(count_prompt_tokens(messages), max_tokens)
+        error = self.server.backend.engine.submit(request)
+        if error is not None:
+            self._send_error(500, error)
+            return
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = body.get("model", self.server.backend.served_model_name)
+        if body.get("stream"):
+            self._stream(request, completion_id, model, bool((body.get("stream_options") or {}).get("include_usage")))
+        else:
+            self._complete(request, completion_id, model)
+
+    def _usage(self, request: SimulatedRequest) -> dict:
+        return {
+            "prompt_tokens": request.prompt_tokens,
+            "completion_tokens": request.generated,
+            "total_tokens": request.prompt_tokens + request.generated,
+        }
+
+    def _complete(self, request: SimulatedRequest, completion_id: str, model: str):
+        words = []
+        while (token := request.tokens.get()) is not None:
+            if token == OUT_OF_MEMORY:
+                self._send_error(500, "The server ran out of memory")
+                return
+            words.append(token)
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "length"}],
+            "usage": self._usage(request),
+        })
+
+    def _stream(self, request: SimulatedRequest, completion_id: str, model: str, include_usage: bool):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(choices: list, usage: Optional[dict] = None):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model, "choices": choices}
+            if usage is not None:
+                chunk["usage"] = usage
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+
+        first = True
+        while (token := request.tokens.get()) is not None:
+            if token == OUT_OF_MEMORY:
+                # The stream is cut like a crashed server would, without the final chunk
+                self.wfile.write(b"0\r\n\r\n")
+                self.close_connection = True
+                return
+            event([{"index": 0, "delta": {"role": "assistant", "content": token if first else f" {token}"}, "finish_reason": None}])
+            first = False
+        event([{"index": 0, "delta": {}, "finish_reason": "length"}])
+        if include_usage:
+            event([], self._usage(request))
+        self._write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class SimulatedHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The load generator opens hundreds of connections at once at high concurrency
+    request_queue_size = 1024
+
+    def __init__(self, address: tuple[str, int], backend: "SimulatedBackend"):
+        self.backend = backend
+        super().__init__(address, SimulatedRequestHandler)
+
+
+class SimulatedBackend:
+    """
+    An OpenAI compatible server answering /health, /metrics and /v1/chat/completions from a cost model,
+    so the harness can be benchmarked against a known throughput without any container or accelerator.
+
+    Usage:
+        backend = SimulatedBackend(SimulatedBackendConfig(step_s=0.02), port=8080)
+        backend.start()
+        ...
+        backend.stop()
+    """
+
+    def __init__(
+        self,
+        config: Optional[SimulatedBackendConfig] = None,
+        served_model_name: str = "simulated",
+        host: str = "127.0.0.1",
+        port: int = 8080,
+    ):
+        self.config = config or SimulatedBackendConfig()
+        self.served_model_name = served_model_name
+        self.host = host
+        self.port = port
+        self.engine = SimulatedEngine(self.config)
+        self._server: Optional[SimulatedHTTPServer] = None
+        self._started_at: Optional[float] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://localhost:{self.port}/v1"
+
+    @property
+    def ready(self) -> bool:
+        return self._started_at is not None and time.monotonic() - self._started_at >= self.config.startup_s
+
+    def start(self):
+        """
+        Start serving in background threads.
+
+        Raises:
+            SimulatedStartupError: If a failed start is injected
+        """
+        if self.config.start_failure is not None:
+            raise SimulatedStartupError(self.config.start_failure)
+        self._server = SimulatedHTTPServer((self.host, self.port), self)
+        self.engine.start()
+        self._started_at = time.monotonic()
+        threading.Thread(target=self._server.serve_forever, name="simulated-backend", daemon=True).start()
+        logger.info(f"Simulated backend serving on {self.base_url}")
+
+    def wait_ready(self):
+        """Block until the simulated startup time has passed."""
+        if self._started_at is not None:
+            time.sleep(max(self._started_at + self.config.startup_s - time.monotonic(), 0))
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            self.engine.stop()
@@ -0,0 +1,20 @@
+from typing import Optional
+from pydantic import BaseModel, Field
+
+from benchmark.slo_search import LatencySLO
+
+
+class BenchmarkOptions(BaseModel):
+    """
+    The performance benchmarks to run once a backend answers a single request.
+    """
+    concurrency_levels: Optional[list[int]] = None
+    # The open loop benchmark is skipped if no request rate is set
+    request_rates: Optional[list[float]] = None
+    # Load generator processes of the closed loop benchmarks, one per spare cpu if not set
+    load_workers: Optional[int] = None
+    slo: LatencySLO = Field(default_factory=LatencySLO)
+    workload_matrix: bool = False
+    # The startup benchmark is skipped if both are 0
+    cold_start_trials: int = 0
+    warm_start_trials: int = 0
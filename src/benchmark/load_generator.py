@@ -0,0 +1,381 @@
+import asyncio
+import time
+from typing import TYPE_CHECKING, Callable, Optional, Union
+from loguru import logger
+from openai import AsyncOpenAI
+from pydantic import BaseModel, Field
+
+from benchmark.stats import mean, percentile
+from benchmark.test_backend_working import BASE_URL, QUESTION, check_answer
+from telemetry.sampler import ServerMetrics
+
+if TYPE_CHECKING:
+    from benchmark.load_workers import LoadWorkerPool
+
+DEFAULT_CONCURRENCY_LEVELS = [1, 8, 32, 128]
+# Number of requests each virtual user sends at a given concurrency level
+REQUESTS_PER_USER = 4
+REQUEST_TIMEOUT = 600
+# A load generator process busier than this share of a core, or whose event loop lags more than this at p95,
+# may have delayed requests or token timestamps, the numbers then measure the client rather than the backend
+CLIENT_CPU_SATURATION = 0.9
+CLIENT_LOOP_LAG_P95_S = 0.02
+LOOP_LAG_INTERVAL = 0.01
+
+
+class RequestResult(BaseModel):
+    success: bool
+    latency_s: float
+    output_tokens: int = 0
+    error: Optional[str] = None
+    # Only set for streamed requests
+    prompt_tokens: Optional[int] = None
+    ttft_s: Optional[float] = None
+    inter_token_latencies_s: list[float] = Field(default_factory=list)
+
+    @property
+    def prefill_tokens_per_second(self) -> Optional[float]:
+        if not self.prompt_tokens or not self.ttft_s:
+            return None
+        return self.prompt_tokens / self.ttft_s
+
+    @property
+    def decode_tokens_per_second(self) -> Optional[float]:
+        if self.ttft_s is None or self.output_tokens < 2 or self.latency_s <= self.ttft_s:
+            return None
+        # the first token is produced by the prefill, the remaining ones by the decode
+        return (self.output_tokens - 1) / (self.latency_s - self.ttft_s)
+
+
+class StreamingMetrics(BaseModel):
+    ttft_p50_s: Optional[float] = None
+    ttft_p95_s: Optional[float] = None
+    ttft_p99_s: Optional[float] = None
+    itl_p50_s: Optional[float] = None
+    itl_p95_s: Optional[float] = None
+    itl_p99_s: Optional[float] = None
+    prefill_tokens_per_second: Optional[float] = None
+    decode_tokens_per_second: Optional[float] = None
+
+
+class ConcurrencyResult(BaseModel):
+    concurrency: int
+    num_requests: int
+    num_failed: int
+    duration_s: float
+    mean_latency_s: Optional[float]
+    p50_latency_s: Optional[float]
+    p95_latency_s: Optional[float]
+    output_tokens: int
+    requests_per_second: float
+    output_tokens_per_second: float
+    streaming: Optional[StreamingMetrics] = None
+    # Scraped from the backend metrics endpoint over the level
+    server: Optional[ServerMetrics] = None
+    # Client self-check, the busiest load generator process
+    load_workers: int = 1
+    client_cpu_utilization: Optional[float] = None
+    client_loop_lag_p95_s: Optional[float] = None
+    client_saturated: bool = False
+    # Monotonic time window of the level, to match it with the telemetry samples
+    started_at: Optional[float] = Field(default=None, exclude=True)
+    ended_at: Optional[float] = Field(default=None, exclude=True)
+    # Raw per request results, kept in memory to aggregate over a whole run but never uploaded
+    requests: list[RequestResult] = Field(default_factory=list, exclude=True)
+
+
+class LoopLagMonitor:
+    """
+    Measure how late the event loop wakes up a task sleeping at a fixed interval, a saturated loop wakes up late.
+    """
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL):
+        self.interval = interval
+        self.lags: list[float] = []
+
+    async def run(self):
+        while True:
+            scheduled = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(time.perf_counter() - scheduled, 0.0))
+
+
+def is_client_saturated(cpu_utilization: Optional[float], loop_lag_p95_s: Optional[float]) -> bool:
+    return (cpu_utilization or 0.0) >= CLIENT_CPU_SATURATION or (loop_lag_p95_s or 0.0) >= CLIENT_LOOP_LAG_P95_S
+
+
+def get_base_urls(base_url: Union[str, list[str]]) -> list[str]:
+    """
+    Get the base urls of the backend instances the load is spread over.
+    """
+    return [base_url] if isinstance(base_url, str) else base_url
+
+
+def create_client(base_url: str = BASE_URL) -> AsyncOpenAI:
+    """
+    Create an async OpenAI client for load generation, retries are disabled so failures are measured.
+    """
+    return AsyncOpenAI(
+        base_url=base_url,
+        api_key="-",
+        timeout=REQUEST_TIMEOUT,
+        max_retries=0,
+    )
+
+
+async def send_chat_request(
+    client: AsyncOpenAI,
+    model_id: str,
+    max_tokens: Optional[int] = None,
+    stream: bool = False,
+    prompt: str = QUESTION,
+    extra_body: Optional[dict] = None,
+) -> RequestResult:
+    """
+    Send a single chat request and time it end to end.
+    When streaming, every chunk is timestamped to measure time to first token and inter token latency.
+    """
+    start_time = time.perf_counter()
+    try:
+        if stream:
+            return await _send_streaming_chat_request(client, model_id, max_tokens, prompt, extra_body, start_time)
+
+        completion = await client.chat.completions.create(
+            model=model_id,
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=max_tokens,
+            extra_body=extra_body,
+        )
+        latency = time.perf_counter() - start_time
+
+        answer = completion.choices[0].message.content
+        check_answer(answer)
+
+        output_tokens = completion.usage.completion_tokens if completion.usage else 0
+        return RequestResult(success=True, latency_s=latency, output_tokens=output_tokens)
+    except Exception as e:
+        return RequestResult(
+            success=False,
+            latency_s=time.perf_counter() - start_time,
+            error=str(e),
+        )
+
+
+async def _send_streaming_chat_request(
+    client: AsyncOpenAI,
+    model_id: str,
+    max_tokens: Optional[int],
+    prompt: str,
+    extra_body: Optional[dict],
+    start_time: float,
+) -> RequestResult:
+    response = await client.chat.completions.create(
+        model=model_id,
+        messages=[
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=max_tokens,
+        stream=True,
+        stream_options={"include_usage": True},
+        extra_body=extra_body,
+    )
+
+    token_times: list[float] = []
+    answer_parts: list[str] = []
+    usage = None
+    async for chunk in response:
+        now = time.perf_counter()
+        if chunk.usage is not None:
+            usage = chunk.usage
+        if chunk.choices and chunk.choices[0].delta.content:
+            token_times.append(now)
+            answer_parts.append(chunk.choices[0].delta.content)
+    latency = time.perf_counter() - start_time
+
+    check_answer("".join(answer_parts))
+
+    # Backends that do not report usage stream one token per chunk
+    output_tokens = usage.completion_tokens if usage else len(token_times)
+    return RequestResult(
+        success=True,
+        latency_s=latency,
+        output_tokens=output_tokens,
+        prompt_tokens=usage.prompt_tokens if usage else None,
+        ttft_s=token_times[0] - start_time,
+        inter_token_latencies_s=[later - earlier for earlier, later in zip(token_times, token_times[1:])],
+    )
+
+
+def summarize_streaming(request_results: list[RequestResult]) -> Optional[StreamingMetrics]:
+    """
+    Aggregate the token level latencies of streamed requests, None if no request was streamed.
+    """
+    streamed = [result for result in request_results if result.success and result.ttft_s is not None]
+    if not streamed:
+        return None
+
+    ttfts = [result.ttft_s for result in streamed]
+    itls = [itl for result in streamed for itl in result.inter_token_latencies_s]
+    prefill_rates = [r.prefill_tokens_per_second for r in streamed if r.prefill_tokens_per_second is not None]
+    decode_rates = [r.decode_tokens_per_second for r in streamed if r.decode_tokens_per_second is not None]
+
+    return StreamingMetrics(
+        ttft_p50_s=percentile(ttfts, 50),
+        ttft_p95_s=percentile(ttfts, 95),
+        ttft_p99_s=percentile(ttfts, 99),
+        itl_p50_s=percentile(itls, 50),
+        itl_p95_s=percentile(itls, 95),
+        itl_p99_s=percentile(itls, 99),
+        prefill_tokens_per_second=mean(prefill_rates),
+        decode_tokens_per_second=mean(decode_rates),
+    )
+
+
+def summarize_requests(
+    concurrency: int,
+    request_results: list[RequestResult],
+    duration_s: float,
+) -> ConcurrencyResult:
+    """
+    Aggregate the per-request results of one load level.
+    """
+    successful = [result for result in request_results if result.success]
+    latencies = [result.latency_s for result in successful]
+    output_tokens = sum(result.output_tokens for result in successful)
+
+    return ConcurrencyResult(
+        concurrency=concurrency,
+        num_requests=len(request_results),
+        num_failed=len(request_results) - len(successful),
+        duration_s=duration_s,
+        mean_latency_s=mean(latencies),
+        p50_latency_s=percentile(latencies, 50),
+        p95_latency_s=percentile(latencies, 95),
+        output_tokens=output_tokens,
+        requests_per_second=len(successful) / duration_s if duration_s > 0 else 0.0,
+        output_tokens_per_second=output_tokens / duration_s if duration_s > 0 else 0.0,
+        streaming=summarize_streaming(request_results),
+        requests=request_results,
+    )
+
+
+async def run_load(
+    model_id: str,
+    concurrency: int,
+    num_requests: Optional[int] = None,
+    base_url: Union[str, list[str]] = BASE_URL,
+    max_tokens: Optional[int] = None,
+    stream: bool = False,
+    prompts: Optional[list[str]] = None,
+    extra_body: Optional[dict] = None,
+    on_result: Optional[Callable[[RequestResult], None]] = None,
+) -> ConcurrencyResult:
+    """
+    Drive the backend with `concurrency` virtual users, each sending its next request as soon
+    as the previous one completes (closed loop), until `num_requests` requests have been sent.
+    The cpu time and event loop lag of the process are measured to flag a saturated client.
+
+    Args:
+        model_id (str): The model id served by the backend
+        concurrency (int): Number of in-flight requests
+        num_requests (int, optional): Total number of requests. Defaults to REQUESTS_PER_USER per user.
+        base_url (str | list[str]): Base url of the OpenAI compatible server, the virtual users are spread over several urls
+        max_tokens (int, optional): Maximum number of tokens to generate per request
+        stream (bool): Whether to stream the responses to measure token level latencies
+        prompts (list[str], optional): Prompts sent in turn by the requests. Defaults to QUESTION.
+        extra_body (dict, optional): Backend specific request parameters such as ignore_eos
+        on_result (Callable, optional): Called with each request result as soon as it completes
+
+    Returns:
+        ConcurrencyResult: The aggregated latency and throughput for this concurrency level
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    if num_requests is None:
+        num_requests = concurrency * REQUESTS_PER_USER
+    if not prompts:
+        prompts = [QUESTION]
+
+    clients = [create_client(url) for url in get_base_urls(base_url)]
+    request_results: list[RequestResult] = []
+    remaining = num_requests
+
+    async def virtual_user(client: AsyncOpenAI):
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            prompt = prompts[remaining % len(prompts)]
+            request_result = await send_chat_request(client, model_id, max_tokens, stream, prompt, extra_body)
+            request_results.append(request_result)
+            if on_result is not None:
+                on_result(request_result)
+
+    lag_monitor = LoopLagMonitor()
+    lag_task = asyncio.create_task(lag_monitor.run())
+    started_at = time.monotonic()
+    start_time = time.perf_counter()
+    # The cpu time of the event loop thread only, the telemetry and download threads of the harness share the process
+    start_cpu_time = time.thread_time()
+    try:
+        await asyncio.gather(
+            *(virtual_user(clients[index % len(clients)]) for index in range(min(concurrency, num_requests)))
+        )
+    finally:
+        lag_task.cancel()
+        for client in clients:
+            await client.close()
+    duration = time.perf_counter() - start_time
+
+    result = summarize_requests(concurrency, request_results, duration)
+    result.started_at = started_at
+    result.ended_at = time.monotonic()
+    result.client_cpu_utilization = (time.thread_time() - start_cpu_time) / duration if duration > 0 else None
+    result.client_loop_lag_p95_s = percentile(lag_monitor.lags, 95)
+    result.client_saturated = is_client_saturated(result.client_cpu_utilization, result.client_loop_lag_p95_s)
+    return result
+
+
+def run_concurrency_sweep(
+    model_id: str,
+    concurrency_levels: Optional[list[int]] = None,
+    base_url: Union[str, list[str]] = BASE_URL,
+    max_tokens: Optional[int] = None,
+    stream: bool = True,
+    pool: Optional["LoadWorkerPool"] = None,
+) -> list[ConcurrencyResult]:
+    """
+    Run the closed loop load at each concurrency level, for example [1, 8, 32, 128].
+    The load runs in this process unless a pool of load generator processes is given.
+    """
+    if concurrency_levels is None:
+        concurrency_levels = DEFAULT_CONCURRENCY_LEVELS
+
+    results: list[ConcurrencyResult] = []
+    for concurrency in concurrency_levels:
+        logger.info(f"Running load with {concurrency} concurrent requests")
+        if pool is not None:
+            result = pool.run_load(model_id, concurrency, base_url=base_url, max_tokens=max_tokens, stream=stream)
+        else:
+            result = asyncio.run(run_load(model_id, concurrency, base_url=base_url, max_tokens=max_tokens, stream=stream))
+        if result.client_saturated:
+            logger.warning(
+                f"Concurrency {concurrency}: the load generator is saturated (cpu {result.client_cpu_utilization or 0:.0%}, "
+                f"loop lag p95 {result.client_loop_lag_p95_s or 0:.3f}s), the results may be capped by the client, "
+                f"consider more --load-workers"
+            )
+        logger.info(
+            f"Concurrency {concurrency}: {result.output_tokens_per_second:.1f} tok/s, "
+            f"{result.requests_per_second:.2f} req/s, p50 latency {result.p50_latency_s or 0:.2f}s, "
+            f"{result.num_failed}/{result.num_requests} failed"
+        )
+        if result.streaming:
+            logger.info(
+                f"Concurrency {concurrency}: p50 TTFT {result.streaming.ttft_p50_s or 0:.3f}s, "
+                f"p50 ITL {result.streaming.itl_p50_s or 0:.4f}s, "
+                f"decode {result.streaming.decode_tokens_per_second or 0:.1f} tok/s per request"
+            )
+        results.append(result)
+
+    return results
@@ -0,0 +1,278 @@
+import asyncio
+import math
+import multiprocessing
+import os
+import struct
+import time
+import traceback
+from array import array
+from multiprocessing.connection import Connection, wait
+from typing import Optional, Union
+from loguru import logger
+
+from benchmark.load_generator import (
+    REQUESTS_PER_USER,
+    ConcurrencyResult,
+    RequestResult,
+    get_base_urls,
+    is_client_saturated,
+    run_load,
+    summarize_requests,
+)
+from benchmark.test_backend_working import BASE_URL
+from backend.resources import split_evenly
+
+# Load generator processes are never more than this, a handful of cores drives any single backend
+MAX_LOAD_WORKERS = 8
+# Messages of the workers: a request result, the end of a level, or the traceback of a failed level
+RESULT_MESSAGE = b"R"
+DONE_MESSAGE = b"D"
+ERROR_MESSAGE = b"E"
+# success, latency, output tokens, prompt tokens (-1 if unknown), ttft (nan if unknown), inter token latencies, error length
+RESULT_HEADER = struct.Struct("<?diidII")
+# started_at, ended_at, cpu utilization and loop lag p95 of the worker, nan if unknown
+DONE_FORMAT = struct.Struct("<dddd")
+
+
+def encode_request_result(result: RequestResult) -> bytes:
+    """
+    Encode a request result as a fixed header followed by the raw inter token latencies and the error message,
+    a streamed request carries hundreds of latencies which would be slow to pickle one float at a time.
+    """
+    error = result.error.encode("utf-8") if result.error else b""
+    header = RESULT_HEADER.pack(
+        result.success,
+        result.latency_s,
+        result.output_tokens,
+        -1 if result.prompt_tokens is None else result.prompt_tokens,
+        math.nan if result.ttft_s is None else result.ttft_s,
+        len(result.inter_token_latencies_s),
+        len(error),
+    )
+    return header + array("d", result.inter_token_latencies_s).tobytes() + error
+
+
+def decode_request_result(data: Union[bytes, memoryview]) -> RequestResult:
+    success, latency, output_tokens, prompt_tokens, ttft, num_latencies, error_length = RESULT_HEADER.unpack_from(data)
+    offset = RESULT_HEADER.size
+    latencies = array("d")
+    latencies.frombytes(data[offset : offset + num_latencies * latencies.itemsize])
+    offset += num_latencies * latencies.itemsize
+    error = bytes(data[offset : offset + error_length]).decode("utf-8") if error_length else None
+    return RequestResult(
+        success=success,
+        latency_s=latency,
+        output_tokens=output_tokens,
+        error=error,
+        prompt_tokens=None if prompt_tokens < 0 else prompt_tokens,
+        ttft_s=None if math.isnan(ttft) else ttft,
+        inter_token_latencies_s=latencies.tolist(),
+    )
+
+
+def optional_float(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+def run_worker(connection: Connection, cpu: Optional[int]):
+    """
+    Entry point of a load generator process, runs the levels sent by the parent until it sends None,
+    streaming each request result back as soon as it completes.
+    """
+    if cpu is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {cpu})
+
+    def send_result(result: RequestResult):
+        connection.send_bytes(RESULT_MESSAGE + encode_request_result(result))
+
+    while True:
+        load = connection.recv()
+        if load is None:
+            break
+        try:
+            result = asyncio.run(run_load(**load, on_result=send_result))
+        except Exception:
+            connection.send_bytes(ERROR_MESSAGE + traceback.format_exc().encode("utf-8"))
+            continue
+        connection.send_bytes(
+            DONE_MESSAGE
+            + DONE_FORMAT.pack(
+                result.started_at,
+                result.ended_at,
+                math.nan if result.client_cpu_utilization is None else result.client_cpu_utilization,
+                math.nan if result.client_loop_lag_p95_s is None else result.client_loop_lag_p95_s,
+            )
+        )
+    connection.close()
+
+
+def get_load_workers(cpus: list[int]) -> int:
+    """Get the default number of load generator processes, one per spare cpu."""
+    return max(min(len(cpus), MAX_LOAD_WORKERS), 1)
+
+
+class LoadWorkerPool:
+    """
+    Processes generating the closed loop load together, so the client never caps the measured throughput:
+    a single Python event loop parsing streamed tokens saturates one core long before a large backend does.
+    The virtual users and requests of a level are split between the processes, each pinned to its own cpu,
+    and their request results are merged into a single level result. The processes are reused across levels.
+    With a single worker the load runs in this process.
+
+    Usage:
+        with LoadWorkerPool(4, cpus=[4, 5, 6, 7]) as pool:
+            result = pool.run_load(model_id, 128, base_url=base_urls, stream=True)
+    """
+
+    def __init__(self, workers: int = 1, cpus: Optional[list[int]] = None):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.workers = workers
+        # The workers are not pinned without spare cpus
+        self.cpus = cpus or []
+        self._processes: list[multiprocessing.Process] = []
+        self._connections: list[Connection] = []
+
+    def __enter__(self) -> "LoadWorkerPool":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _start(self):
+        if self._processes:
+            return
+        # Spawned rather than forked, the harness has telemetry and download threads running
+        context = multiprocessing.get_context("spawn")
+        for index in range(self.workers):
+            parent_connection, child_connection = context.Pipe()
+            cpu = self.cpus[index % len(self.cpus)] if self.cpus else None
+            process = context.Process(
+                target=run_worker, args=(child_connection, cpu), name=f"load-worker-{index}", daemon=True
+            )
+            process.start()
+            child_connection.close()
+            self._processes.append(process)
+            self._connections.append(parent_connection)
+        logger.info(f"Started {self.workers} load generator processes" + (f" on cpus {self.cpus}" if self.cpus else ""))
+
+    def close(self):
+        for connection in self._connections:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.kill()
+        for connection in self._connections:
+            connection.close()
+        self._processes = []
+        self._connections = []
+
+    def run_load(
+        self,
+        model_id: str,
+        concurrency: int,
+        num_requests: Optional[int] = None,
+        base_url: Union[str, list[str]] = BASE_URL,
+        max_tokens: Optional[int] = None,
+        stream: bool = False,
+        prompts: Optional[list[str]] = None,
+        extra_body: Optional[dict] = None,
+        timeout: Optional[float] = None,
+    ) -> ConcurrencyResult:
+        """
+        Run a closed loop level over the workers, with the same arguments and result as load_generator.run_load.
+        The level is flagged as client saturated if any worker was. The requests of a worker which fails are counted
+        as failed and the processes are restarted for the next level.
+
+        Raises:
+            TimeoutError: If the level takes longer than `timeout` seconds, the workers are then stopped
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        load = dict(model_id=model_id, max_tokens=max_tokens, stream=stream, prompts=prompts, extra_body=extra_body)
+        if num_requests is None:
+            num_requests = concurrency * REQUESTS_PER_USER
+        workers = min(self.workers, concurrency, num_requests)
+        if workers <= 1:
+            return asyncio.run(
+                asyncio.wait_for(run_load(concurrency=concurrency, num_requests=num_requests, base_url=base_url, **load), timeout)
+            )
+
+        self._start()
+        base_urls = get_base_urls(base_url)
+        users = split_evenly(list(range(concurrency)), workers)
+        requests = split_evenly(list(range(num_requests)), workers)
+        level_started_at = time.monotonic()
+        # Requests each worker still has to complete, counted as failed if it dies
+        expected: dict[Connection, int] = {}
+        errors: dict[Connection, str] = {}
+        for connection, worker_users, worker_requests in zip(self._connections, users, requests):
+            expected[connection] = len(worker_requests)
+            # Rotated so the users of all the workers are spread over the urls like in a single process
+            offset = worker_users[0] % len(base_urls)
+            try:
+                connection.send(
+                    dict(
+                        load,
+                        concurrency=len(worker_users),
+                        num_requests=len(worker_requests),
+                        base_url=base_urls[offset:] + base_urls[:offset],
+                    )
+                )
+            except OSError:
+                errors[connection] = "load generator process exited"
+
+        request_results: list[RequestResult] = []
+        done: list[tuple[float, ...]] = []
+        pending = set(expected) - set(errors)
+        deadline = None if timeout is None else level_started_at + timeout
+        while pending:
+            ready = wait(list(pending), None if deadline is None else max(deadline - time.monotonic(), 0))
+            if not ready:
+                # The workers are in the middle of the level, they are killed and started again for the next one
+                for process in self._processes:
+                    process.kill()
+                self.close()
+                raise TimeoutError(f"The load level did not finish within {timeout:.0f}s")
+            for connection in ready:
+                try:
+                    message = connection.recv_bytes()
+                except EOFError:
+                    errors[connection] = "load generator process exited"
+                    pending.discard(connection)
+                    continue
+                kind, data = message[:1], memoryview(message)[1:]
+                if kind == RESULT_MESSAGE:
+                    request_results.append(decode_request_result(data))
+                    expected[connection] -= 1
+                elif kind == DONE_MESSAGE:
+                    done.append(DONE_FORMAT.unpack(data))
+                    pending.discard(connection)
+                else:
+                    errors[connection] = bytes(data).decode("utf-8")
+                    pending.discard(connection)
+        if errors:
+            logger.error(f"Load generator process failed, its remaining requests are counted as failed:\n{next(iter(errors.values()))}")
+            # The requests a failed worker never completed fail the level, like the requests failing in a single process
+            for connection, error in errors.items():
+                failed = RequestResult(success=False, latency_s=0.0, error=error.strip().splitlines()[-1])
+                request_results.extend(failed.model_copy() for _ in range(expected[connection]))
+            # The processes are started again for the next level
+            self.close()
+
+        started_at = min((worker_done[0] for worker_done in done), default=level_started_at)
+        ended_at = max((worker_done[1] for worker_done in done), default=time.monotonic())
+        result = summarize_requests(concurrency, request_results, ended_at - started_at)
+        result.started_at = started_at
+        result.ended_at = ended_at
+        result.load_workers = workers
+        cpu_utilizations = [value for value in (optional_float(worker_done[2]) for worker_done in done) if value is not None]
+        loop_lags = [value for value in (optional_float(worker_done[3]) for worker_done in done) if value is not None]
+        result.client_cpu_utilization = max(cpu_utilizations, default=None)
+        result.client_loop_lag_p95_s = max(loop_lags, default=None)
+        result.client_saturated = is_client_saturated(result.client_cpu_utilization, result.client_loop_lag_p95_s)
+        return result
@@ -0,0 +1,187 @@
+import asyncio
+import random
+import time
+from typing import Literal, Optional, Union
+from loguru import logger
+from pydantic import BaseModel
+
+from benchmark.load_generator import RequestResult, create_client, get_base_urls, send_chat_request
+from benchmark.stats import percentile
+from benchmark.test_backend_working import BASE_URL
+
+DEFAULT_REQUEST_RATES = [1.0, 2.0, 4.0, 8.0, 16.0, 32.0]
+# Seconds of arrivals generated at each request rate
+DURATION_PER_RATE = 30
+MIN_REQUESTS_PER_RATE = 10
+# The server keeps up if it completes at least this fraction of the offered rate
+KEEP_UP_RATIO = 0.9
+
+ArrivalProcess = Literal["poisson", "constant"]
+
+
+class RatePoint(BaseModel):
+    request_rate: float
+    arrival_process: str
+    num_requests: int
+    num_failed: int
+    duration_s: float
+    achieved_request_rate: float
+    output_tokens_per_second: float
+    ttft_p50_s: Optional[float]
+    ttft_p95_s: Optional[float]
+    ttft_p99_s: Optional[float]
+    latency_p50_s: Optional[float]
+    latency_p95_s: Optional[float]
+    latency_p99_s: Optional[float]
+    # Worst delay between the scheduled and actual send time, should stay close to zero
+    max_send_lag_s: float
+    keeping_up: bool
+
+
+class RateSweepResult(BaseModel):
+    points: list[RatePoint]
+    # First request rate at which the server stopped keeping up, None if it kept up with every rate
+    saturation_request_rate: Optional[float] = None
+
+
+def get_arrival_times(
+    request_rate: float,
+    num_requests: int,
+    arrival_process: ArrivalProcess = "poisson",
+    seed: Optional[int] = 0,
+) -> list[float]:
+    """
+    Get the send time of each request in seconds from the start of the run.
+    Poisson arrivals have exponentially distributed gaps, constant arrivals are evenly spaced.
+    """
+    if request_rate <= 0:
+        raise ValueError("request_rate must be positive")
+
+    rng = random.Random(seed)
+    arrival_times: list[float] = []
+    current = 0.0
+    for _ in range(num_requests):
+        arrival_times.append(current)
+        if arrival_process == "poisson":
+            current += rng.expovariate(request_rate)
+        elif arrival_process == "constant":
+            current += 1 / request_rate
+        else:
+            raise ValueError(f"Invalid arrival process: {arrival_process}")
+
+    return arrival_times
+
+
+async def run_open_loop(
+    model_id: str,
+    request_rate: float,
+    num_requests: Optional[int] = None,
+    arrival_process: ArrivalProcess = "poisson",
+    base_url: Union[str, list[str]] = BASE_URL,
+    max_tokens: Optional[int] = None,
+    seed: Optional[int] = 0,
+) -> RatePoint:
+    """
+    Send requests on a fixed schedule, independently of when earlier requests complete (open loop).
+
+    Args:
+        model_id (str): The model id served by the backend
+        request_rate (float): Mean number of requests sent per second
+        num_requests (int, optional): Number of requests to send. Defaults to DURATION_PER_RATE seconds of arrivals.
+        arrival_process (str): "poisson" or "constant" inter arrival times
+        base_url (str | list[str]): Base url of the OpenAI compatible server, arrivals are sent in turn to several urls
+        max_tokens (int, optional): Maximum number of tokens to generate per request
+        seed (int, optional): Seed of the arrival times so runs are reproducible
+
+    Returns:
+        RatePoint: Latency percentiles and achieved throughput at this request rate
+    """
+    if num_requests is None:
+        num_requests = max(int(request_rate * DURATION_PER_RATE), MIN_REQUESTS_PER_RATE)
+
+    arrival_times = get_arrival_times(request_rate, num_requests, arrival_process, seed)
+    clients = [create_client(url) for url in get_base_urls(base_url)]
+    tasks: list[asyncio.Task[RequestResult]] = []
+    max_send_lag = 0.0
+
+    start_time = time.perf_counter()
+    try:
+        for index, arrival_time in enumerate(arrival_times):
+            delay = start_time + arrival_time - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            max_send_lag = max(max_send_lag, time.perf_counter() - start_time - arrival_time)
+            # Never await the request here, a slow response must not delay the next arrival
+            client = clients[index % len(clients)]
+            tasks.append(asyncio.create_task(send_chat_request(client, model_id, max_tokens, stream=True)))
+
+        request_results = await asyncio.gather(*tasks)
+    finally:
+        for client in clients:
+            await client.close()
+    duration = time.perf_counter() - start_time
+
+    successful = [result for result in request_results if result.success]
+    ttfts = [result.ttft_s for result in successful if result.ttft_s is not None]
+    latencies = [result.latency_s for result in successful]
+    achieved_request_rate = len(successful) / duration if duration > 0 else 0.0
+    # The offered rate is measured over the arrivals actually generated, not the nominal one
+    offered_request_rate = num_requests / (arrival_times[-1] + 1 / request_rate)
+
+    return RatePoint(
+        request_rate=request_rate,
+        arrival_process=arrival_process,
+        num_requests=num_requests,
+        num_failed=num_requests - len(successful),
+        duration_s=duration,
+        achieved_request_rate=achieved_request_rate,
+        output_tokens_per_second=sum(r.output_tokens for r in successful) / duration if duration > 0 else 0.0,
+        ttft_p50_s=percentile(ttfts, 50),
+        ttft_p95_s=percentile(ttfts, 95),
+        ttft_p99_s=percentile(ttfts, 99),
+        latency_p50_s=percentile(latencies, 50),
+        latency_p95_s=percentile(latencies, 95),
+        latency_p99_s=percentile(latencies, 99),
+        max_send_lag_s=max_send_lag,
+        keeping_up=len(successful) == num_requests and achieved_request_rate >= KEEP_UP_RATIO * offered_request_rate,
+    )
+
+
+def run_rate_sweep(
+    model_id: str,
+    request_rates: Optional[list[float]] = None,
+    arrival_process: ArrivalProcess = "poisson",
+    base_url: Union[str, list[str]] = BASE_URL,
+    max_tokens: Optional[int] = None,
+    stop_on_saturation: bool = True,
+) -> RateSweepResult:
+    """
+    Run the open loop benchmark at increasing request rates to get the latency vs load curve.
+    The sweep stops at the first rate the server cannot keep up with unless stop_on_saturation is False.
+    """
+    if request_rates is None:
+        request_rates = DEFAULT_REQUEST_RATES
+
+    points: list[RatePoint] = []
+    saturation_request_rate = None
+    for request_rate in sorted(request_rates):
+        logger.info(f"Running open loop load at {request_rate} requests/s ({arrival_process} arrivals)")
+        point = asyncio.run(
+            run_open_loop(model_id, request_rate, arrival_process=arrival_process, base_url=base_url, max_tokens=max_tokens)
+        )
+        logger.info(
+            f"Rate {request_rate}/s: achieved {point.achieved_request_rate:.2f} req/s, "
+            f"p50/p95/p99 TTFT {point.ttft_p50_s or 0:.3f}/{point.ttft_p95_s or 0:.3f}/{point.ttft_p99_s or 0:.3f}s, "
+            f"p50/p95/p99 latency {point.latency_p50_s or 0:.2f}/{point.latency_p95_s or 0:.2f}/{point.latency_p99_s or 0:.2f}s"
+        )
+        if point.max_send_lag_s > 1 / request_rate:
+            logger.warning(f"Requests were sent up to {point.max_send_lag_s:.3f}s late, the client may be the bottleneck")
+        points.append(point)
+
+        if not point.keeping_up:
+            saturation_request_rate = request_rate
+            logger.info(f"Server stopped keeping up at {request_rate} requests/s")
+            if stop_on_saturation:
+                break
+
+    return RateSweepResult(points=points, saturation_request_rate=saturation_request_rate)
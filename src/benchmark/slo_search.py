@@ -0,0 +1,156 @@
+import asyncio
+import time
+from typing import TYPE_CHECKING, Optional, Union
+from loguru import logger
+from pydantic import BaseModel
+
+from benchmark.load_generator import ConcurrencyResult, run_load
+from benchmark.test_backend_working import BASE_URL
+
+if TYPE_CHECKING:
+    from benchmark.load_workers import LoadWorkerPool
+
+DEFAULT_TTFT_P95_S = 0.5
+DEFAULT_ITL_P95_S = 0.05
+MAX_CONCURRENCY = 512
+# Upper bound on the time spent searching for a single model/backend/hardware combination
+SEARCH_TIME_BUDGET_S = 600
+# Stop bisecting once the interval is within this fraction of the best passing concurrency
+SEARCH_RELATIVE_TOLERANCE = 0.1
+
+
+class LatencySLO(BaseModel):
+    ttft_p95_s: Optional[float] = DEFAULT_TTFT_P95_S
+    itl_p95_s: Optional[float] = DEFAULT_ITL_P95_S
+    max_failure_rate: float = 0.0
+
+    def is_met(self, result: ConcurrencyResult) -> bool:
+        """
+        Check if a load level satisfies every latency objective.
+        """
+        if result.num_requests == 0 or result.num_failed / result.num_requests > self.max_failure_rate:
+            return False
+        if result.streaming is None:
+            return False
+        if self.ttft_p95_s is not None and (result.streaming.ttft_p95_s is None or result.streaming.ttft_p95_s > self.ttft_p95_s):
+            return False
+        if self.itl_p95_s is not None and (result.streaming.itl_p95_s is None or result.streaming.itl_p95_s > self.itl_p95_s):
+            return False
+        return True
+
+
+class SLOProbe(BaseModel):
+    concurrency: int
+    slo_met: bool
+    output_tokens_per_second: float
+    ttft_p95_s: Optional[float]
+    itl_p95_s: Optional[float]
+
+
+class GoodputResult(BaseModel):
+    slo: LatencySLO
+    # Highest concurrency meeting the SLO, None if even a single request misses it
+    goodput_concurrency: Optional[int] = None
+    goodput_output_tokens_per_second: Optional[float] = None
+    goodput_requests_per_second: Optional[float] = None
+    probes: list[SLOProbe]
+
+
+def find_max_goodput(
+    model_id: str,
+    slo: Optional[LatencySLO] = None,
+    base_url: Union[str, list[str]] = BASE_URL,
+    max_tokens: Optional[int] = None,
+    max_concurrency: int = MAX_CONCURRENCY,
+    time_budget_s: float = SEARCH_TIME_BUDGET_S,
+    pool: Optional["LoadWorkerPool"] = None,
+) -> GoodputResult:
+    """
+    Search the highest concurrency at which the backend still meets the latency SLO.
+    The concurrency is doubled until the SLO is missed, then the interval is bisected.
+
+    Args:
+        model_id (str): The model id served by the backend
+        slo (LatencySLO, optional): The latency objectives. Defaults to p95 TTFT < 500 ms and p95 ITL < 50 ms.
+        base_url (str | list[str]): Base url of the OpenAI compatible server, the load is spread over several urls
+        max_tokens (int, optional): Maximum number of tokens to generate per request
+        max_concurrency (int): Largest concurrency to probe
+        time_budget_s (float): No new probe is started once this budget is spent, and a running probe is stopped
+        pool (LoadWorkerPool, optional): Load generator processes running the probes. Defaults to this process.
+
+    Returns:
+        GoodputResult: The best passing load level and every probe that was run
+    """
+    if slo is None:
+        slo = LatencySLO()
+
+    start_time = time.monotonic()
+    probes: dict[int, ConcurrencyResult] = {}
+
+    def probe(concurrency: int) -> bool:
+        # A probe at a high concurrency can take minutes, it is stopped when the budget runs out and counts as missed
+        remaining = max(time_budget_s - (time.monotonic() - start_time), 0)
+        try:
+            if pool is not None:
+                result = pool.run_load(model_id, concurrency, base_url=base_url, max_tokens=max_tokens, stream=True, timeout=remaining)
+            else:
+                result = asyncio.run(
+                    asyncio.wait_for(run_load(model_id, concurrency, base_url=base_url, max_tokens=max_tokens, stream=True), remaining)
+                )
+        except TimeoutError:
+            logger.warning(f"SLO probe at concurrency {concurrency} did not finish within the {time_budget_s}s time budget")
+            return False
+        probes[concurrency] = result
+        slo_met = slo.is_met(result)
+        logger.info(
+            f"SLO probe at concurrency {concurrency}: {'met' if slo_met else 'missed'} "
+            f"({result.output_tokens_per_second:.1f} tok/s)"
+        )
+        return slo_met
+
+    def budget_left() -> bool:
+        if time.monotonic() - start_time < time_budget_s:
+            return True
+        logger.warning(f"SLO search time budget of {time_budget_s}s spent, keeping the best result so far")
+        return False
+
+    best: Optional[int] = None
+    failed: Optional[int] = None
+
+    # Exponential stepping to bracket the highest passing concurrency
+    concurrency = 1
+    while concurrency <= max_concurrency and budget_left():
+        if not probe(concurrency):
+            failed = concurrency
+            break
+        best = concurrency
+        concurrency *= 2
+
+    # Bisection between the best passing and the first failing concurrency
+    if best is not None and failed is not None:
+        low, high = best, failed
+        while high - low > max(1, int(low * SEARCH_RELATIVE_TOLERANCE)) and budget_left():
+            middle = (low + high) // 2
+            if probe(middle):
+                low = middle
+            else:
+                high = middle
+        best = low
+
+    best_result = probes[best] if best is not None else None
+    return GoodputResult(
+        slo=slo,
+        goodput_concurrency=best,
+        goodput_output_tokens_per_second=best_result.output_tokens_per_second if best_result else None,
+        goodput_requests_per_second=best_result.requests_per_second if best_result else None,
+        probes=[
+            SLOProbe(
+                concurrency=concurrency,
+                slo_met=slo.is_met(result),
+                output_tokens_per_second=result.output_tokens_per_second,
+                ttft_p95_s=result.streaming.ttft_p95_s if result.streaming else None,
+                itl_p95_s=result.streaming.itl_p95_s if result.streaming else None,
+            )
+            for concurrency, result in sorted(probes.items())
+        ],
+    )
@@ -0,0 +1,238 @@
+import asyncio
+import time
+from typing import Optional
+from loguru import logger
+from pydantic import BaseModel
+
+from backend.docker_client import DockerClient, DockerError, NotFoundError
+from backend.log_events import WARMUP_DONE, WARMUP_STARTED, WEIGHTS_LOADED, WEIGHTS_LOADING
+from backend.resources import ResourceSlice
+from backend.run_backend import BENCHMARKING_CONTAINER_NAME, DEFAULT_HOST_PORT, BackendRunner
+from benchmark.load_generator import RequestResult, create_client, send_chat_request
+from benchmark.stats import mean, variance
+from benchmark.test_backend_working import get_served_model_id
+from model.get_models import Model
+
+# Phases of a startup, each stored as {kind}_start_{phase}_s_mean and {kind}_start_{phase}_s_var
+STARTUP_PHASES = ["pull", "create", "process_start", "weight_load", "warmup", "healthy", "first_token", "total"]
+DROP_CACHES_PATH = "/proc/sys/vm/drop_caches"
+# Failure reasons of the trials, on top of the backend ones such as "out_of_memory" or "timeout"
+IMAGE_IN_USE = "image_in_use"
+IMAGE_PULL_FAILED = "image_pull_failed"
+REQUEST_FAILED = "request_failed"
+
+
+class StartupTrial(BaseModel):
+    """
+    The phase durations of a single backend startup, phases missing from the backend logs are None.
+    """
+    cold: bool
+    success: bool
+    failure_reason: Optional[str] = None
+    # Image pull, 0 for warm starts as the image is already present
+    pull_s: Optional[float] = None
+    # Container create API call
+    create_s: Optional[float] = None
+    # From the container start to its first log line
+    process_start_s: Optional[float] = None
+    weight_load_s: Optional[float] = None
+    warmup_s: Optional[float] = None
+    # From the container start to the first healthy /health
+    healthy_s: Optional[float] = None
+    # From the first healthy /health to the first streamed token
+    first_token_s: Optional[float] = None
+    # From the start of the trial, pull included, to the first streamed token
+    total_s: Optional[float] = None
+
+
+class StartupBenchmarkResult(BaseModel):
+    trials: list[StartupTrial]
+
+    def to_columns(self) -> dict[str, Optional[float]]:
+        """
+        Get the mean and variance of every phase over the successful trials, for example
+        {"cold_start_weight_load_s_mean": 12.3, "cold_start_weight_load_s_var": 0.4, ...}.
+        """
+        columns: dict[str, Optional[float]] = {}
+        for kind, cold in (("cold", True), ("warm", False)):
+            trials = [trial for trial in self.trials if trial.cold == cold and trial.success]
+            for phase in STARTUP_PHASES:
+                durations = [getattr(trial, f"{phase}_s") for trial in trials]
+                durations = [duration for duration in durations if duration is not None]
+                columns[f"{kind}_start_{phase}_s_mean"] = mean(durations)
+                columns[f"{kind}_start_{phase}_s_var"] = variance(durations)
+        return columns
+
+
+def get_startup_phases(startup_times: dict[str, float]) -> dict[str, Optional[float]]:
+    """
+    Get the phase durations from the monotonic times of the startup milestones recorded by a BackendRunner.
+    Weight loading and warmup start at the previous milestone when the backend does not log their start.
+    """
+    def duration(start: Optional[float], end: Optional[float]) -> Optional[float]:
+        if start is None or end is None:
+            return None
+        return end - start
+
+    weights_loading = startup_times.get(WEIGHTS_LOADING, startup_times.get("first_log"))
+    warmup_started = startup_times.get(WARMUP_STARTED, startup_times.get(WEIGHTS_LOADED))
+    return {
+        "create_s": duration(startup_times.get("create"), startup_times.get("created")),
+        "process_start_s": duration(startup_times.get("started"), startup_times.get("first_log")),
+        "weight_load_s": duration(weights_loading, startup_times.get(WEIGHTS_LOADED)),
+        "warmup_s": duration(warmup_started, startup_times.get(WARMUP_DONE)),
+        "healthy_s": duration(startup_times.get("started"), startup_times.get("healthy")),
+    }
+
+
+def drop_page_cache() -> bool:
+    """
+    Drop the kernel page cache so cold starts read the weights from disk, this needs root.
+    Returns whether the cache was dropped.
+    """
+    try:
+        with open(DROP_CACHES_PATH, "w") as f:
+            f.write("3\n")
+        return True
+    except OSError:
+        return False
+
+
+def remove_image(docker_client: DockerClient, image: str) -> bool:
+    """
+    Remove an image with all its tags so the next start pulls it again.
+    Returns False if the image is used by a running container.
+    """
+    try:
+        image_id = docker_client.inspect_image(image)["Id"]
+        docker_client.remove_image(image_id, force=True)
+    except NotFoundError:
+        pass
+    except DockerError as e:
+        logger.warning(f"Cannot remove image {image} for a cold start: {str(e)}")
+        return False
+    return True
+
+
+async def send_first_request(base_url: str, model_id: str) -> RequestResult:
+    async with create_client(base_url) as client:
+        return await send_chat_request(client, model_id, stream=True)
+
+
+def run_startup_trial(
+    backend_runner: BackendRunner,
+    model: Model,
+    backend_type: str,
+    hardware_type: str,
+    image: str,
+    cold: bool,
+    no_weights: Optional[bool] = False,
+) -> StartupTrial:
+    """
+    Start the backend once, from a removed image for a cold start, and time every phase until the first token.
+    """
+    docker_client = backend_runner.docker_client
+    trial_start = time.monotonic()
+
+    pull_time = 0.0
+    if cold:
+        if not remove_image(docker_client, image):
+            return StartupTrial(cold=cold, success=False, failure_reason=IMAGE_IN_USE)
+        if not drop_page_cache():
+            logger.debug("Cannot drop the page cache, the cold start weights may be read from memory")
+        pull_start = time.monotonic()
+        try:
+            docker_client.pull_image(image)
+        except (OSError, DockerError) as e:
+            logger.error(f"Failed to pull image {image}: {str(e)}")
+            return StartupTrial(cold=cold, success=False, failure_reason=IMAGE_PULL_FAILED)
+        pull_time = time.monotonic() - pull_start
+
+    try:
+        started, _ = backend_runner.run(model, backend_type, hardware_type, no_weights, image)
+        if not started:
+            return StartupTrial(cold=cold, success=False, failure_reason=backend_runner.failure_reason, pull_s=pull_time)
+
+        phases = get_startup_phases(backend_runner.startup_times)
+
+        request_start = time.monotonic()
+        result = asyncio.run(
+            send_first_request(f"http://localhost:{backend_runner.host_port}/v1", get_served_model_id(model, backend_type))
+        )
+        if not result.success or result.ttft_s is None:
+            logger.error(f"First request failed after startup: {result.error}")
+            return StartupTrial(cold=cold, success=False, failure_reason=REQUEST_FAILED, pull_s=pull_time, **phases)
+        first_token_time = request_start + result.ttft_s
+
+        return StartupTrial(
+            cold=cold,
+            success=True,
+            pull_s=pull_time,
+            first_token_s=first_token_time - backend_runner.startup_times["healthy"],
+            total_s=first_token_time - trial_start,
+            **phases,
+        )
+    finally:
+        backend_runner.stop()
+
+
+def run_startup_benchmark(
+    model: Model,
+    backend_type: str,
+    hardware_type: str,
+    image: str,
+    cold_trials: int = 1,
+    warm_trials: int = 3,
+    no_weights: Optional[bool] = False,
+    container_name: str = BENCHMARKING_CONTAINER_NAME,
+    host_port: int = DEFAULT_HOST_PORT,
+    resources: Optional[ResourceSlice] = None,
+    docker_client: Optional[DockerClient] = None,
+    log_path: Optional[str] = None,
+) -> StartupBenchmarkResult:
+    """
+    Time repeated cold and warm starts of a backend, phase by phase.
+    Cold starts remove the image first so the pull is part of the startup, warm starts reuse the image.
+    The model weights stay in the Hugging Face cache for both, so their download is not timed.
+
+    Args:
+        model (Model): The model to serve
+        backend_type (str): The backend type such as "vllm" or "tgi"
+        hardware_type (str): The hardware type in hardware_info.yaml
+        image (str): The backend image, preferably pinned to a digest so every trial runs the same image
+        cold_trials (int): Number of cold starts
+        warm_trials (int): Number of warm starts, run after the cold ones
+        no_weights (bool, optional): Whether the model is loaded without weights
+        container_name (str): Name of the container
+        host_port (int): Host port the server is published on
+        resources (ResourceSlice, optional): The devices and cpus the container is restricted to
+        log_path (str, optional): gzip file the container logs of every trial are appended to
+
+    Returns:
+        StartupBenchmarkResult: Every trial, cold ones first
+    """
+    backend_runner = BackendRunner(docker_client, container_name, host_port, resources, log_path)
+
+    if cold_trials == 0:
+        # Warm starts need the image to be present
+        try:
+            try:
+                backend_runner.docker_client.inspect_image(image)
+            except NotFoundError:
+                backend_runner.docker_client.pull_image(image)
+        except (OSError, DockerError) as e:
+            # Recorded as failed trials, the other jobs of the run go on
+            logger.error(f"Failed to pull image {image} for the warm starts: {str(e)}")
+            return StartupBenchmarkResult(
+                trials=[StartupTrial(cold=False, success=False, failure_reason=IMAGE_PULL_FAILED) for _ in range(warm_trials)]
+            )
+
+    trials: list[StartupTrial] = []
+    for cold in [True] * cold_trials + [False] * warm_trials:
+        logger.info(f"Running a {'cold' if cold else 'warm'} start of {model.name} with {backend_type}")
+        trial = run_startup_trial(backend_runner, model, backend_type, hardware_type, image, cold, no_weights)
+        if trial.success:
+            logger.info(f"Started in {trial.total_s:.1f}s: {trial.model_dump(exclude={'cold', 'success', 'total_s'})}")
+        trials.append(trial)
+
+    return StartupBenchmarkResult(trials=trials)
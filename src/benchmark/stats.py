@@ -0,0 +1,39 @@
+import math
+from typing import Optional, Sequence
+
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """
+    Compute the q-th percentile (0-100) of the values with linear interpolation.
+    Returns None if there are no values.
+    """
+    if not values:
+        return None
+
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    lower = math.floor(rank)
+    upper = math.ceil(rank)
+    if lower == upper:
+        return ordered[lower]
+
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def mean(values: Sequence[float]) -> Optional[float]:
+    """
+    Compute the mean of the values, None if there are no values.
+    """
+    if not values:
+        return None
+    return sum(values) / len(values)
+
+
+def variance(values: Sequence[float]) -> Optional[float]:
+    """
+    Compute the sample variance of the values, None if there are fewer than two values.
+    """
+    if len(values) < 2:
+        return None
+    values_mean = sum(values) / len(values)
+    return sum((value - values_mean) ** 2 for value in values) / (len(values) - 1)
@@ -5,18 +5,30 @@ from openai import OpenAI
 from model.get_models import Model
 
 QUESTION = "What is Deep Learning?"
+BASE_URL = "http://localhost:8080/v1"
 
 def check_answer(answer: str | None):
     assert answer is not None, "Generated text is empty"
     assert len(answer) > 0, "Generated text is empty"
 
-def try_chat_request(model_id: str):
+def get_served_model_id(model: Model, backend_type: str) -> str:
+    """
+    Get the model id the backend serves the model under, for example the gguf repo for llama.cpp.
+    """
+    if backend_type == "llama_cpp":
+        return model.gguf_hf_model_id
+    elif backend_type == "tgi" or backend_type == "vllm" or backend_type == "simulated":
+        return model.hf_model_id
+    else:
+        raise ValueError(f"Invalid backend type: {backend_type}")
+
+def try_chat_request(model_id: str, base_url: str = BASE_URL):
     
     # assert model id is a string
     assert isinstance(model_id, str), "Model id must be a string"
     
     client = OpenAI(
-        base_url="http://localhost:8080/v1",
+        base_url=base_url,
         api_key="-"
     )
 
@@ -36,7 +48,7 @@ def try_chat_request(model_id: str):
     
     check_answer(answer)
 
-def try_single_request(model_id: str) -> bool:
+def try_single_request(model_id: str, base_url: str = BASE_URL) -> bool:
     """
     Try a single request to an openai api to check if it is working.
     First attempts a chat request, and if that fails, falls back to a completion request.
@@ -45,7 +57,7 @@ def try_single_request(model_id: str) -> bool:
     
     # First try chat request
     try: 
-        try_chat_request(model_id)
+        try_chat_request(model_id, base_url)
         logger.info("Chat request succeeded")
         return True
     except Exception as e:
@@ -53,17 +65,12 @@ def try_single_request(model_id: str) -> bool:
         
     return False
 
-def test_backend_working(model: Model, backend_type: str) -> bool:
+def test_backend_working(model: Model, backend_type: str, base_url: str = BASE_URL) -> bool:
     """
     Try a single request 3 times with exponential backoff.
     """
     
-    if backend_type == "llama_cpp":
-        model_id = model.gguf_hf_model_id
-    elif backend_type == "tgi" or backend_type == "vllm":
-        model_id = model.hf_model_id
-    else:
-        raise ValueError(f"Invalid backend type: {backend_type}")
+    model_id = get_served_model_id(model, backend_type)
     
     logger.info(f"Testing if the backend is working with model {model_id}")
     
@@ -71,7 +78,7 @@ def test_backend_working(model: Model, backend_type: str) -> bool:
     base_delay = 5  # Start with 1 second delay
     
     for attempt in range(retries):
-        if try_single_request(model_id):
+        if try_single_request(model_id, base_url):
             return True
         else:
             if attempt == retries - 1:  # Break if last attempt fails
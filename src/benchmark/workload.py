@@ -0,0 +1,184 @@
+import asyncio
+import itertools
+import random
+from typing import Optional
+from loguru import logger
+from pydantic import BaseModel
+from transformers import AutoConfig, AutoTokenizer, PreTrainedTokenizerBase
+
+from benchmark.load_generator import run_load
+from benchmark.stats import mean
+from benchmark.test_backend_working import BASE_URL
+
+DEFAULT_INPUT_LENGTHS = [128, 1024, 4096, 16384]
+DEFAULT_OUTPUT_LENGTHS = [64, 256, 1024]
+# Requests sent for each (input, output) cell of the matrix, one at a time so prefill and decode are not mixed with queueing
+REQUESTS_PER_CELL = 4
+CELL_CONCURRENCY = 1
+# Backends whose OpenAI route accepts ignore_eos, so the output length is exactly max_tokens
+IGNORE_EOS_BACKENDS = {"vllm", "llama_cpp"}
+# Decoding and re-encoding can merge tokens, the prompt is trimmed or padded at most this many times to get the exact length
+MAX_PROMPT_ADJUSTMENTS = 16
+
+WORDS = (
+    "the of and to in is was for on that with as by at from his her are an were which this be or "
+    "had not but they have it one all their has been would there new more can when its first who into "
+    "time other some two also after over these many only most such about years may most well where city "
+    "system model data hardware memory token server request latency throughput language network power"
+).split()
+
+
+class WorkloadCellResult(BaseModel):
+    input_tokens: int
+    output_tokens: int
+    num_requests: int
+    num_failed: int
+    # Measured from the usage returned by the backend
+    mean_prompt_tokens: Optional[float] = None
+    mean_output_tokens: Optional[float] = None
+    ttft_p50_s: Optional[float] = None
+    itl_p50_s: Optional[float] = None
+    p50_latency_s: Optional[float] = None
+    prefill_tokens_per_second: Optional[float] = None
+    decode_tokens_per_second: Optional[float] = None
+    output_tokens_per_second: float
+
+
+def get_max_context_length(model_id: str) -> Optional[int]:
+    """
+    Get the maximum number of positions of the model from its config, None if it is not set.
+    """
+    config = AutoConfig.from_pretrained(model_id)
+    return getattr(config, "max_position_embeddings", None)
+
+
+def generate_prompt(tokenizer: PreTrainedTokenizerBase, num_tokens: int, seed: int = 0) -> str:
+    """
+    Generate a synthetic prompt which tokenizes to `num_tokens` tokens once the chat template is applied.
+    The prompt starts with the seed, so prompts with different seeds never share a prefix the backend could reuse from its cache.
+    """
+    template_tokens = 0
+    if tokenizer.chat_template is not None:
+        template_tokens = len(tokenizer.apply_chat_template([{"role": "user", "content": ""}], add_generation_prompt=True))
+    content_tokens = max(num_tokens - template_tokens, 1)
+
+    rng = random.Random(seed)
+    # Words are at least one token each, so this is always long enough
+    text = " ".join([str(seed)] + [rng.choice(WORDS) for _ in range(content_tokens)])
+    token_ids = tokenizer.encode(text, add_special_tokens=False)[:content_tokens]
+
+    for _ in range(MAX_PROMPT_ADJUSTMENTS):
+        prompt = tokenizer.decode(token_ids)
+        token_ids = tokenizer.encode(prompt, add_special_tokens=False)
+        if len(token_ids) == content_tokens:
+            return prompt
+        if len(token_ids) > content_tokens:
+            token_ids = token_ids[:content_tokens]
+        else:
+            token_ids = token_ids + tokenizer.encode(" " + rng.choice(WORDS), add_special_tokens=False)
+
+    logger.warning(f"The prompt for seed {seed} is not exactly {content_tokens} tokens after {MAX_PROMPT_ADJUSTMENTS} adjustments")
+    return prompt
+
+
+def run_workload_matrix(
+    model_id: str,
+    served_model_id: str,
+    backend_type: str,
+    input_lengths: Optional[list[int]] = None,
+    output_lengths: Optional[list[int]] = None,
+    base_url: str = BASE_URL,
+    requests_per_cell: int = REQUESTS_PER_CELL,
+) -> list[WorkloadCellResult]:
+    """
+    Benchmark every (input length, output length) cell of the workload matrix.
+
+    Args:
+        model_id (str): The Hugging Face model id, used to load the tokenizer and config
+        served_model_id (str): The model id served by the backend
+        backend_type (str): The backend type, used to know if ignore_eos is supported
+        input_lengths (list[int], optional): Prompt lengths in tokens. Defaults to 128, 1k, 4k and 16k.
+        output_lengths (list[int], optional): Output lengths in tokens. Defaults to 64, 256 and 1k.
+        base_url (str): Base url of the OpenAI compatible server
+        requests_per_cell (int): Number of requests sent for each cell
+
+    Returns:
+        list[WorkloadCellResult]: One result per cell that fits in the model context
+    """
+    if input_lengths is None:
+        input_lengths = DEFAULT_INPUT_LENGTHS
+    if output_lengths is None:
+        output_lengths = DEFAULT_OUTPUT_LENGTHS
+
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    max_context_length = get_max_context_length(model_id)
+    extra_body = {"ignore_eos": True} if backend_type in IGNORE_EOS_BACKENDS else None
+    if extra_body is None:
+        logger.warning(f"{backend_type} does not support ignore_eos, the output length is only an upper bound")
+
+    results: list[WorkloadCellResult] = []
+    # Every request of every cell gets its own seed, so no prompt is served from the prefix cache of an earlier one
+    seeds = itertools.count()
+    for input_length in input_lengths:
+        for output_length in output_lengths:
+            if max_context_length is not None and input_length + output_length > max_context_length:
+                logger.info(f"Skipping {input_length} in x {output_length} out, longer than the {max_context_length} tokens context")
+                continue
+
+            prompts = [generate_prompt(tokenizer, input_length, next(seeds)) for _ in range(requests_per_cell)]
+
+            load_result = asyncio.run(
+                run_load(
+                    served_model_id,
+                    CELL_CONCURRENCY,
+                    num_requests=requests_per_cell,
+                    base_url=base_url,
+                    max_tokens=output_length,
+                    stream=True,
+                    prompts=prompts,
+                    extra_body=extra_body,
+                )
+            )
+            successful = [request for request in load_result.requests if request.success]
+            streaming = load_result.streaming
+            cell = WorkloadCellResult(
+                input_tokens=input_length,
+                output_tokens=output_length,
+                num_requests=load_result.num_requests,
+                num_failed=load_result.num_failed,
+                mean_prompt_tokens=mean([r.prompt_tokens for r in successful if r.prompt_tokens is not None]),
+                mean_output_tokens=mean([r.output_tokens for r in successful]),
+                ttft_p50_s=streaming.ttft_p50_s if streaming else None,
+                itl_p50_s=streaming.itl_p50_s if streaming else None,
+                p50_latency_s=load_result.p50_latency_s,
+                prefill_tokens_per_second=streaming.prefill_tokens_per_second if streaming else None,
+                decode_tokens_per_second=streaming.decode_tokens_per_second if streaming else None,
+                output_tokens_per_second=load_result.output_tokens_per_second,
+            )
+            logger.info(
+                f"{input_length} in x {output_length} out: TTFT {cell.ttft_p50_s or 0:.3f}s, "
+                f"prefill {cell.prefill_tokens_per_second or 0:.0f} tok/s, decode {cell.decode_tokens_per_second or 0:.1f} tok/s"
+            )
+            results.append(cell)
+
+    return results
+
+
+def format_workload_matrix(results: list[WorkloadCellResult], metric: str = "decode_tokens_per_second") -> str:
+    """
+    Format one metric of the workload matrix as a table with input lengths as rows and output lengths as columns.
+    """
+    input_lengths = sorted({cell.input_tokens for cell in results})
+    output_lengths = sorted({cell.output_tokens for cell in results})
+    cells = {(cell.input_tokens, cell.output_tokens): getattr(cell, metric) for cell in results}
+
+    lines = [f"{metric} (rows: input tokens, columns: output tokens)"]
+    lines.append("in \\ out".rjust(10) + "".join(str(output_length).rjust(12) for output_length in output_lengths))
+    for input_length in input_lengths:
+        row = str(input_length).rjust(10)
+        for output_length in output_lengths:
+            value = cells.get((input_length, output_length))
+            row += (f"{value:.3f}" if value is not None else "-").rjust(12)
+        lines.append(row)
+
+    return "\n".join(lines)
@@ -0,0 +1,207 @@
+from functools import lru_cache
+from typing import Optional
+import pandas as pd
+from loguru import logger
+
+from dataset.result_publisher import KEY_COLUMNS, TIME_COLUMN, Publisher, get_latest_view, read_results
+
+# Summaries rebuilt from the whole history by a single scheduled job, read by the frontend.
+# The machines publishing results never write them, so they never overwrite each other's summaries
+AGGREGATE_DIR = "aggregates"
+AGGREGATES = ["latest", "hardware", "backend", "model"]
+THROUGHPUT_COLUMN = "max_output_tokens_per_second"
+WORKING_COLUMN = "can_serve_single_request"
+# The trend of a combination is its latest throughput relative to the median of its runs over this many days before
+TREND_WINDOW_DAYS = 28
+QUERY_CACHE_SIZE = 256
+# Per level and per cell results, only needed by the full result view
+NESTED_COLUMNS = ["concurrency_results", "rate_results", "workload_matrix", "server_metrics_series"]
+
+
+def get_aggregate_path(name: str) -> str:
+    return f"{AGGREGATE_DIR}/{name}.parquet"
+
+
+def get_throughput_trends(history: pd.DataFrame, window_days: float = TREND_WINDOW_DAYS) -> pd.Series:
+    """
+    Get the relative throughput change of the latest run of each combination over the median of its working runs
+    in the window before, indexed by the combination key, NaN without earlier runs.
+    """
+    # Reused results published by older runs are copies sharing the time of the run they reuse
+    history = history[[*KEY_COLUMNS, TIME_COLUMN, WORKING_COLUMN, THROUGHPUT_COLUMN]]
+    history = history.drop_duplicates(subset=[*KEY_COLUMNS, TIME_COLUMN]).copy()
+    history[TIME_COLUMN] = pd.to_datetime(history[TIME_COLUMN])
+    history[THROUGHPUT_COLUMN] = pd.to_numeric(history[THROUGHPUT_COLUMN], errors="coerce")
+    current_time = history.groupby(KEY_COLUMNS)[TIME_COLUMN].max().rename("current_time")
+    history = history.join(current_time, on=KEY_COLUMNS)
+    earlier = history[
+        (history[TIME_COLUMN] < history["current_time"])
+        & (history[TIME_COLUMN] >= history["current_time"] - pd.Timedelta(days=window_days))
+        & history[WORKING_COLUMN].fillna(False).astype(bool)
+    ]
+    baseline = earlier.groupby(KEY_COLUMNS)[THROUGHPUT_COLUMN].median()
+    latest = history[history[TIME_COLUMN] == history["current_time"]].groupby(KEY_COLUMNS)[THROUGHPUT_COLUMN].last()
+    return (latest / baseline - 1).rename("throughput_trend")
+
+
+def build_aggregates(history: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """
+    Materialize the leaderboard summaries from the result history.
+
+    Returns:
+        dict[str, pd.DataFrame]: The summaries by name
+            latest: the latest result of each (model, backend, hardware, machine) with its throughput trend
+            hardware: per hardware type, the combinations, how many work and the best throughput
+            backend: per hardware type and backend, the same plus the latency percentiles over the working models
+            model: per hardware type and model, the working backends and the fastest one
+    """
+    if history.empty or THROUGHPUT_COLUMN not in history.columns:
+        return {name: pd.DataFrame() for name in AGGREGATES}
+    latest = get_latest_view(history.drop(columns=NESTED_COLUMNS, errors="ignore"))
+    latest = latest.join(get_throughput_trends(history), on=KEY_COLUMNS)
+    latest[WORKING_COLUMN] = latest[WORKING_COLUMN].fillna(False).astype(bool)
+    for column in [THROUGHPUT_COLUMN, "ttft_p50_s", "ttft_p95_s", "itl_p50_s", "itl_p95_s"]:
+        if column not in latest.columns:
+            latest[column] = float("nan")
+        latest[column] = pd.to_numeric(latest[column], errors="coerce")
+
+    hardware = latest.groupby("hardware_type").agg(
+        machines=("machine", "nunique"),
+        combinations=(WORKING_COLUMN, "size"),
+        working=(WORKING_COLUMN, "sum"),
+        best_output_tokens_per_second=(THROUGHPUT_COLUMN, "max"),
+        median_throughput_trend=("throughput_trend", "median"),
+        last_benchmark_time=(TIME_COLUMN, "max"),
+    )
+    hardware["compatibility_rate"] = hardware["working"] / hardware["combinations"]
+
+    working = latest[latest[WORKING_COLUMN]]
+    backend = latest.groupby(["hardware_type", "backend_type"]).agg(
+        combinations=(WORKING_COLUMN, "size"),
+        working=(WORKING_COLUMN, "sum"),
+        best_output_tokens_per_second=(THROUGHPUT_COLUMN, "max"),
+        median_throughput_trend=("throughput_trend", "median"),
+        last_benchmark_time=(TIME_COLUMN, "max"),
+    )
+    backend["compatibility_rate"] = backend["working"] / backend["combinations"]
+    latencies = working.groupby(["hardware_type", "backend_type"]).agg(
+        ttft_p50_s=("ttft_p50_s", "median"),
+        ttft_p95_s=("ttft_p95_s", "median"),
+        itl_p50_s=("itl_p50_s", "median"),
+        itl_p95_s=("itl_p95_s", "median"),
+    )
+    backend = backend.join(latencies)
+
+    model = latest.groupby(["hardware_type", "model_id"]).agg(
+        backends=("backend_type", "nunique"),
+        working_backends=(WORKING_COLUMN, "sum"),
+        best_output_tokens_per_second=(THROUGHPUT_COLUMN, "max"),
+        last_benchmark_time=(TIME_COLUMN, "max"),
+    )
+    # The backend of the fastest working result, one sort instead of an idxmax per group
+    fastest = (
+        working.dropna(subset=[THROUGHPUT_COLUMN])
+        .sort_values(THROUGHPUT_COLUMN, ascending=False)
+        .drop_duplicates(subset=["hardware_type", "model_id"])
+        .set_index(["hardware_type", "model_id"])["backend_type"]
+        .rename("best_backend_type")
+    )
+    model = model.join(fastest)
+
+    return {
+        "latest": latest.reset_index(drop=True),
+        "hardware": hardware.reset_index(),
+        "backend": backend.reset_index(),
+        "model": model.reset_index(),
+    }
+
+
+def publish_aggregates(publisher: Publisher, history: Optional[pd.DataFrame] = None) -> dict[str, pd.DataFrame]:
+    """
+    Rebuild the summaries from the published results and write them next to the shards.
+    Reads the whole history, so it runs once after the machines published, not in each run.
+
+    Args:
+        publisher (Publisher): Where the results are published
+        history (pd.DataFrame, optional): The published results, read from the publisher if not given
+    """
+    if history is None:
+        history = read_results(publisher)
+    aggregates = build_aggregates(history)
+    for name, df in aggregates.items():
+        if not df.empty:
+            publisher.write_parquet(get_aggregate_path(name), df, f"Updated the {name} leaderboard summary")
+    return aggregates
+
+
+class LeaderboardQuery:
+    """
+    Query the published summaries for the frontend. Each summary is read once, and the answers of the queries
+    are kept in an LRU cache, so a page view never reads or groups the result history.
+    Call refresh() once new results are published.
+
+    Usage:
+        query = LeaderboardQuery(HubPublisher(DATASET_NAME))
+        query.hardware()
+        query.compatibility("cuda")
+    """
+
+    def __init__(self, publisher: Publisher, cache_size: int = QUERY_CACHE_SIZE):
+        self.publisher = publisher
+        # Cached per instance, a cache on the methods would be shared by every instance and keep them alive
+        self._read = lru_cache(maxsize=len(AGGREGATES))(self._read_aggregate)
+        self._query = lru_cache(maxsize=cache_size)(self._run_query)
+
+    def _read_aggregate(self, name: str) -> pd.DataFrame:
+        try:
+            return self.publisher.read_parquet(get_aggregate_path(name))
+        except Exception as e:
+            logger.warning(f"Could not read the {name} leaderboard summary: {str(e)}")
+            return pd.DataFrame()
+
+    def _run_query(self, name: str, filters: tuple[tuple[str, str], ...], pivot: bool) -> pd.DataFrame:
+        df = self._read(name)
+        for column, value in filters:
+            if column in df.columns:
+                df = df[df[column] == value]
+        if pivot:
+            # Model x backend status of the latest results, for the compatibility boxes
+            if df.empty:
+                return df
+            return df.pivot_table(index="model_id", columns="backend_type", values=WORKING_COLUMN, aggfunc="max").astype("boolean")
+        return df.reset_index(drop=True)
+
+    def _get(self, name: str, pivot: bool = False, **filters: Optional[str]) -> pd.DataFrame:
+        key = tuple(sorted((column, value) for column, value in filters.items() if value is not None))
+        # A copy, so the caller cannot change the cached answer
+        return self._query(name, key, pivot).copy()
+
+    def refresh(self):
+        self._read.cache_clear()
+        self._query.cache_clear()
+
+    def hardware(self) -> pd.DataFrame:
+        """The summary of each hardware type."""
+        return self._get("hardware")
+
+    def backends(self, hardware_type: Optional[str] = None) -> pd.DataFrame:
+        """The summary of each backend, of every hardware type or of one."""
+        return self._get("backend", hardware_type=hardware_type)
+
+    def models(self, hardware_type: Optional[str] = None, model_id: Optional[str] = None) -> pd.DataFrame:
+        """The summary of each model, of every hardware type or of one."""
+        return self._get("model", hardware_type=hardware_type, model_id=model_id)
+
+    def results(
+        self,
+        hardware_type: Optional[str] = None,
+        machine: Optional[str] = None,
+        model_id: Optional[str] = None,
+        backend_type: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """The latest result of each combination matching the filters."""
+        return self._get("latest", hardware_type=hardware_type, machine=machine, model_id=model_id, backend_type=backend_type)
+
+    def compatibility(self, hardware_type: str, machine: Optional[str] = None) -> pd.DataFrame:
+        """Whether each model works with each backend on a hardware type, models as rows and backends as columns, NA if not benchmarked."""
+        return self._get("latest", pivot=True, hardware_type=hardware_type, machine=machine)
@@ -1,10 +1,14 @@
 from pydantic import BaseModel
 from typing import Optional
-from datasets import load_dataset, Dataset
-import pandas as pd
 from datetime import datetime
 from loguru import logger
 
+from benchmark.load_generator import ConcurrencyResult
+from benchmark.open_loop import RatePoint
+from benchmark.workload import WorkloadCellResult
+from telemetry.sampler import ServerMetricsPoint
+from dataset.result_publisher import HubPublisher, Publisher, publish_results
+
 DATASET_NAME = "hf-ai-hardware/ai-hardware-leaderboard"
 
 class LeaderboardData(BaseModel):
@@ -12,71 +16,142 @@ class LeaderboardData(BaseModel):
     backend_type: str
     hardware_type: str
     machine: str
+    # Hardware profile of the machine, to normalize the results per socket or per core
+    cpu_model_name: Optional[str] = None
+    cpu_sockets: Optional[int] = None
+    cpu_physical_cores: Optional[int] = None
+    cpu_logical_cpus: Optional[int] = None
+    cpu_isa_flags: Optional[str] = None
+    numa_nodes: Optional[int] = None
+    memory_total_bytes: Optional[int] = None
+    accelerator_count: Optional[int] = None
+    accelerator_devices: Optional[str] = None
     can_serve_single_request: bool
+    # Backend instances sharing the load, one per NUMA node in multi instance mode, throughputs are their aggregate
+    num_instances: int = 1
+    time_to_ready_s: Optional[float] = None
+    # Parsed from the backend logs of the benchmarked run
+    weight_load_s: Optional[float] = None
+    warmup_s: Optional[float] = None
+    kv_cache_tokens: Optional[int] = None
+    # Why the backend could not serve, for example "out_of_memory", "timeout", "request_failed", "oom_predicted" or "job_error"
+    failure_reason: Optional[str] = None
+    # Preflight memory estimate from the model config, jobs predicted to run out of memory are not started
+    estimated_parameter_bytes: Optional[int] = None
+    estimated_kv_cache_bytes_per_token: Optional[int] = None
+    estimated_memory_bytes: Optional[int] = None
+    available_memory_bytes: Optional[int] = None
+    oom_predicted: Optional[bool] = None
+    # Resource telemetry of the container over the whole run
+    peak_memory_bytes: Optional[float] = None
+    mean_cpu_cores: Optional[float] = None
+    io_read_bytes: Optional[float] = None
+    io_write_bytes: Optional[float] = None
+    mean_accelerator_utilization: Optional[float] = None
+    peak_accelerator_memory_bytes: Optional[float] = None
+    # cpu (RAPL, host wide) plus accelerator energy, per token over the concurrency sweep
+    # The cpu energy is left out when several jobs run in parallel, RAPL measures the whole host
+    energy_joules: Optional[float] = None
+    joules_per_output_token: Optional[float] = None
+    # Scraped from the backend metrics endpoint over the concurrency sweep, each level also has its own
+    server_mean_running_requests: Optional[float] = None
+    server_max_running_requests: Optional[float] = None
+    server_mean_waiting_requests: Optional[float] = None
+    server_mean_kv_cache_utilization: Optional[float] = None
+    server_max_kv_cache_utilization: Optional[float] = None
+    server_queue_time_p50_s: Optional[float] = None
+    server_queue_time_p95_s: Optional[float] = None
+    server_ttft_p50_s: Optional[float] = None
+    server_ttft_p95_s: Optional[float] = None
+    server_tpot_p50_s: Optional[float] = None
+    server_tpot_p95_s: Optional[float] = None
+    server_metrics_series: Optional[list[ServerMetricsPoint]] = None
+    # Pulled before the container is created so it is not part of time_to_ready_s
+    image_pull_time_s: Optional[float] = None
+    image_digest: Optional[str] = None
+    # Model snapshot from the local model cache, downloaded in the background before the job started on a miss
+    model_cache_hit: Optional[bool] = None
+    model_download_time_s: Optional[float] = None
+    single_request_latency_s: Optional[float] = None
+    max_output_tokens_per_second: Optional[float] = None
+    max_requests_per_second: Optional[float] = None
+    concurrency_results: Optional[list[ConcurrencyResult]] = None
+    # Whether a load generator process was saturated at any level, the throughput may then be capped by the client
+    load_workers: Optional[int] = None
+    client_saturated: Optional[bool] = None
+    # Token level latencies aggregated over every streamed request of the run
+    ttft_p50_s: Optional[float] = None
+    ttft_p95_s: Optional[float] = None
+    ttft_p99_s: Optional[float] = None
+    itl_p50_s: Optional[float] = None
+    itl_p95_s: Optional[float] = None
+    itl_p99_s: Optional[float] = None
+    prefill_tokens_per_second: Optional[float] = None
+    decode_tokens_per_second: Optional[float] = None
+    # Open loop latency vs load curve
+    saturation_request_rate: Optional[float] = None
+    rate_results: Optional[list[RatePoint]] = None
+    # Highest load meeting the latency SLO
+    goodput_concurrency: Optional[int] = None
+    goodput_output_tokens_per_second: Optional[float] = None
+    goodput_requests_per_second: Optional[float] = None
+    slo_ttft_p95_s: Optional[float] = None
+    slo_itl_p95_s: Optional[float] = None
+    # Throughput and latency for each (input length, output length) cell
+    workload_matrix: Optional[list[WorkloadCellResult]] = None
+    # Startup breakdown, mean and variance of each phase over the cold and warm start trials
+    cold_start_pull_s_mean: Optional[float] = None
+    cold_start_pull_s_var: Optional[float] = None
+    cold_start_create_s_mean: Optional[float] = None
+    cold_start_create_s_var: Optional[float] = None
+    cold_start_process_start_s_mean: Optional[float] = None
+    cold_start_process_start_s_var: Optional[float] = None
+    cold_start_weight_load_s_mean: Optional[float] = None
+    cold_start_weight_load_s_var: Optional[float] = None
+    cold_start_warmup_s_mean: Optional[float] = None
+    cold_start_warmup_s_var: Optional[float] = None
+    cold_start_healthy_s_mean: Optional[float] = None
+    cold_start_healthy_s_var: Optional[float] = None
+    cold_start_first_token_s_mean: Optional[float] = None
+    cold_start_first_token_s_var: Optional[float] = None
+    cold_start_total_s_mean: Optional[float] = None
+    cold_start_total_s_var: Optional[float] = None
+    warm_start_pull_s_mean: Optional[float] = None
+    warm_start_pull_s_var: Optional[float] = None
+    warm_start_create_s_mean: Optional[float] = None
+    warm_start_create_s_var: Optional[float] = None
+    warm_start_process_start_s_mean: Optional[float] = None
+    warm_start_process_start_s_var: Optional[float] = None
+    warm_start_weight_load_s_mean: Optional[float] = None
+    warm_start_weight_load_s_var: Optional[float] = None
+    warm_start_warmup_s_mean: Optional[float] = None
+    warm_start_warmup_s_var: Optional[float] = None
+    warm_start_healthy_s_mean: Optional[float] = None
+    warm_start_healthy_s_var: Optional[float] = None
+    warm_start_first_token_s_mean: Optional[float] = None
+    warm_start_first_token_s_var: Optional[float] = None
+    warm_start_total_s_mean: Optional[float] = None
+    warm_start_total_s_var: Optional[float] = None
     docker_command: Optional[str]
     benchmark_time: datetime
+    # Fingerprint of the image, model revision, docker command, hardware and harness the result was measured with
+    result_fingerprint: Optional[str] = None
+    # Whether the result was reused from an earlier run with the same fingerprint instead of being measured again
+    reused_result: Optional[bool] = None
 
-def upload_data_to_hub(results: list[LeaderboardData]):
+def upload_data_to_hub(results: list[LeaderboardData], publisher: Optional[Publisher] = None) -> list[str]:
     """
-    Upload the results to the hub.
+    Publish the results of a run as new shards of the leaderboard dataset, see result_publisher.
+    Reused results are already published, as the result of the run which measured them, and are left out.
+    The summaries read by the frontend are rebuilt separately, see the ai-hardware-summaries command.
+
+    Args:
+        results (list[LeaderboardData]): The results of the run
+        publisher (Publisher, optional): Where the shards are written. Defaults to the leaderboard dataset on the hub.
+
+    Returns:
+        list[str]: The paths of the written shards
     """
-    # Convert results to list of dicts
-    results_dict = [result.model_dump() for result in results]
-    logger.debug(f"Results: {results_dict}")
-    
-    try:
-        # Try to download existing dataset
-        leaderboard_dataset = load_dataset(DATASET_NAME)
-        df: pd.DataFrame = leaderboard_dataset.to_pandas()  # type: ignore
-    except Exception:
-        # If dataset doesn't exist, start with empty DataFrame
-        df = pd.DataFrame(columns=["model_id", "backend_type", "hardware_type", "can_serve_single_request", "machine"])
-    
-    # Create DataFrame from new results
-    new_df: pd.DataFrame = pd.DataFrame(results_dict)
-    
-    # Keep track of updated and added entries for commit message
-    updated_entries: list[str] = []
-    added_entries: list[str] = []
-    
-    # Update existing entries and add new ones
-    # We use model_id and backend_type as unique identifiers
-    for _, row in new_df.iterrows():
-        row_dict = row.to_dict()
-        if row_dict["machine"] == "unknown":
-            # do not upload unknown machines to the leaderboard
-            continue
-        
-        mask = (df["model_id"] == row_dict["model_id"]) & (df["backend_type"] == row_dict["backend_type"]) & (df["machine"] == row_dict["machine"])
-        entry_desc = f"{row_dict['model_id']} ({row_dict['backend_type']}, {row_dict['machine']})"
-        if mask.any():
-            # Update existing entry
-            row_series = pd.Series(row_dict)
-            df.loc[mask] = row_series
-            updated_entries.append(entry_desc)
-        else:
-            # Add new entry
-            new_row_df = pd.DataFrame([row_dict])
-            df = pd.concat([df, new_row_df], ignore_index=True)
-            added_entries.append(entry_desc)
-    
-    # Create commit message
-    commit_parts = []
-    if updated_entries:
-        commit_parts.append(f"Updated entries: {', '.join(updated_entries)}")
-    if added_entries:
-        commit_parts.append(f"Added entries: {', '.join(added_entries)}")
-    commit_message = " | ".join(commit_parts)
-    
-    # if there is no commit message, we don't need to upload as we didn't change anything
-    if not commit_message:
-        logger.info("No changes to upload")
-        return
-    
-    # Convert back to Dataset
-    dataset = Dataset.from_pandas(df)
-    
-    # Push to hub with commit message
-    dataset.push_to_hub(DATASET_NAME, commit_message=commit_message)
-    logger.info(f"Successfully uploaded results to the leaderboard")
-   
\ No newline at end of file
+    records = [result.model_dump() for result in results if not result.reused_result]
+    logger.debug(f"Results: {records}")
+    return publish_results(records, publisher or HubPublisher(DATASET_NAME))
@@ -0,0 +1,226 @@
+from datetime import datetime
+from typing import Optional
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel
+
+from backend.log_events import OUT_OF_MEMORY
+from dataset.result_publisher import KEY_COLUMNS, TIME_COLUMN
+from scheduler.preflight import OOM_PREDICTED
+
+# Metrics compared against their baseline, and whether higher is better
+REGRESSION_METRICS: dict[str, bool] = {
+    "max_output_tokens_per_second": True,
+    "max_requests_per_second": True,
+    "goodput_output_tokens_per_second": True,
+    "prefill_tokens_per_second": True,
+    "decode_tokens_per_second": True,
+    "single_request_latency_s": False,
+    "ttft_p50_s": False,
+    "ttft_p95_s": False,
+    "itl_p50_s": False,
+    "itl_p95_s": False,
+    "time_to_ready_s": False,
+    "weight_load_s": False,
+    "joules_per_output_token": False,
+}
+# The baseline of a combination is its working runs over this many days before its latest run
+BASELINE_WINDOW_DAYS = 28
+MIN_BASELINE_RUNS = 3
+# A metric regressed if it is this much worse than the baseline median, and further than
+# Z_THRESHOLD robust standard deviations from it, so noisy metrics need a larger change
+RELATIVE_THRESHOLD = 0.1
+Z_THRESHOLD = 3.0
+# Scales the median absolute deviation to the standard deviation of normally distributed values
+MAD_SCALE = 1.4826
+WORKING_COLUMN = "can_serve_single_request"
+# A model which no longer fits in memory is reported on its own, it is not a broken backend
+OUT_OF_MEMORY_REASONS = {OUT_OF_MEMORY, OOM_PREDICTED}
+
+
+class MetricRegression(BaseModel):
+    model_id: str
+    backend_type: str
+    hardware_type: str
+    machine: str
+    metric: str
+    benchmark_time: datetime
+    current: float
+    baseline_median: float
+    baseline_mad: float
+    baseline_runs: int
+    # Signed change from the baseline median, and the same change counted positive when it is worse
+    relative_change: float
+    worsening: float
+    robust_z: float
+
+
+class CompatibilityFlip(BaseModel):
+    model_id: str
+    backend_type: str
+    hardware_type: str
+    machine: str
+    benchmark_time: datetime
+    # True if the combination stopped working, False if it started working again
+    broke: bool
+    failure_reason: Optional[str] = None
+
+
+class RegressionReport(BaseModel):
+    """
+    The regressions of the latest run of each combination, ranked from the worst, and the machine readable verdict.
+    """
+    combinations: int
+    regressions: list[MetricRegression]
+    compatibility_flips: list[CompatibilityFlip]
+
+    @property
+    def broken(self) -> list[CompatibilityFlip]:
+        return [flip for flip in self.compatibility_flips if flip.broke and flip.failure_reason not in OUT_OF_MEMORY_REASONS]
+
+    @property
+    def out_of_memory(self) -> list[CompatibilityFlip]:
+        return [flip for flip in self.compatibility_flips if flip.broke and flip.failure_reason in OUT_OF_MEMORY_REASONS]
+
+    @property
+    def failed(self) -> bool:
+        return bool(self.regressions or self.broken)
+
+    def verdict(self) -> dict:
+        return {
+            "verdict": "fail" if self.failed else "pass",
+            "combinations": self.combinations,
+            "regressions": len(self.regressions),
+            "broken": len(self.broken),
+            "out_of_memory": len(self.out_of_memory),
+            "fixed": len([flip for flip in self.compatibility_flips if not flip.broke]),
+        }
+
+
+def prepare_history(history: pd.DataFrame) -> pd.DataFrame:
+    """Sort the runs by time, without the copies of reused results which share the time of the run they reuse."""
+    history = history.assign(**{TIME_COLUMN: pd.to_datetime(history[TIME_COLUMN])})
+    history[WORKING_COLUMN] = history[WORKING_COLUMN].fillna(False).astype(bool)
+    return history.drop_duplicates(subset=KEY_COLUMNS + [TIME_COLUMN]).sort_values(TIME_COLUMN, kind="stable")
+
+
+def find_compatibility_flips(history: pd.DataFrame) -> list[CompatibilityFlip]:
+    """Find the combinations whose latest run works while the previous one did not, or the opposite."""
+    previous_working = history.groupby(KEY_COLUMNS)[WORKING_COLUMN].shift(1)
+    latest = history.assign(previous_working=previous_working).groupby(KEY_COLUMNS).tail(1)
+    flips = latest[latest["previous_working"].notna() & (latest["previous_working"] != latest[WORKING_COLUMN])]
+    if "failure_reason" not in flips.columns:
+        flips = flips.assign(failure_reason=None)
+    return [
+        CompatibilityFlip(
+            model_id=row.model_id,
+            backend_type=row.backend_type,
+            hardware_type=row.hardware_type,
+            machine=row.machine,
+            benchmark_time=getattr(row, TIME_COLUMN),
+            broke=not getattr(row, WORKING_COLUMN),
+            failure_reason=row.failure_reason if isinstance(row.failure_reason, str) else None,
+        )
+        for row in flips.itertuples(index=False)
+    ]
+
+
+def find_metric_regressions(
+    history: pd.DataFrame,
+    window_days: float = BASELINE_WINDOW_DAYS,
+    min_baseline_runs: int = MIN_BASELINE_RUNS,
+    relative_threshold: float = RELATIVE_THRESHOLD,
+    z_threshold: float = Z_THRESHOLD,
+) -> list[MetricRegression]:
+    """
+    Compare the metrics of the latest working run of each combination with the median and median absolute deviation
+    of its working runs over the window before, in a few group-bys over the whole history in long format.
+    """
+    metrics = [metric for metric in REGRESSION_METRICS if metric in history.columns]
+    if not metrics:
+        return []
+    history = history.assign(**{metric: pd.to_numeric(history[metric], errors="coerce") for metric in metrics})
+    group_columns = KEY_COLUMNS + ["metric"]
+
+    latest = history.groupby(KEY_COLUMNS).tail(1)
+    current_time = latest.set_index(KEY_COLUMNS)[TIME_COLUMN].rename("current_time")
+    history = history.join(current_time, on=KEY_COLUMNS)
+    in_window = (history[TIME_COLUMN] < history["current_time"]) & (
+        history[TIME_COLUMN] >= history["current_time"] - pd.Timedelta(days=window_days)
+    )
+    baseline = history[in_window & history[WORKING_COLUMN]].melt(id_vars=KEY_COLUMNS, value_vars=metrics, var_name="metric")
+    baseline = baseline.dropna(subset=["value"])
+    stats = baseline.groupby(group_columns)["value"].agg(baseline_median="median", baseline_runs="count")
+    deviations = (baseline["value"] - baseline.join(stats["baseline_median"], on=group_columns)["baseline_median"]).abs()
+    stats["baseline_mad"] = deviations.groupby([baseline[column] for column in group_columns]).median()
+
+    current = latest[latest[WORKING_COLUMN]].melt(
+        id_vars=KEY_COLUMNS + [TIME_COLUMN], value_vars=metrics, var_name="metric", value_name="current"
+    )
+    compared = current.dropna(subset=["current"]).join(stats, on=group_columns, how="inner")
+    compared = compared[(compared["baseline_runs"] >= min_baseline_runs) & (compared["baseline_median"] != 0)]
+    if compared.empty:
+        return []
+
+    # +1 when an increase is worse, -1 when a decrease is worse
+    direction = np.where(compared["metric"].map(REGRESSION_METRICS).astype(bool), -1.0, 1.0)
+    change = compared["current"] - compared["baseline_median"]
+    compared["relative_change"] = change / compared["baseline_median"].abs()
+    compared["worsening"] = direction * compared["relative_change"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # A constant baseline has no spread, any change beyond the relative threshold counts
+        compared["robust_z"] = np.where(
+            compared["baseline_mad"] > 0, direction * change / (MAD_SCALE * compared["baseline_mad"]), np.sign(direction * change) * np.inf
+        )
+    regressed = compared[(compared["worsening"] > relative_threshold) & (compared["robust_z"] > z_threshold)]
+    regressed = regressed.sort_values("worsening", ascending=False)
+    return [MetricRegression(**record) for record in regressed.to_dict("records")]
+
+
+def detect_regressions(
+    history: pd.DataFrame,
+    window_days: float = BASELINE_WINDOW_DAYS,
+    min_baseline_runs: int = MIN_BASELINE_RUNS,
+    relative_threshold: float = RELATIVE_THRESHOLD,
+    z_threshold: float = Z_THRESHOLD,
+) -> RegressionReport:
+    """
+    Check the latest run of each (model, backend, hardware, machine) combination of the result history for regressions.
+
+    Args:
+        history (pd.DataFrame): Every published result, for example from result_publisher.read_results
+        window_days (float): Days of runs before the latest one making up the baseline
+        min_baseline_runs (int): Metrics with fewer baseline runs are not compared
+        relative_threshold (float): Relative worsening from the baseline median above which a metric may have regressed
+        z_threshold (float): Robust z-score above which a metric may have regressed
+
+    Returns:
+        RegressionReport: The metric regressions ranked from the worst and the compatibility flips
+    """
+    if history.empty:
+        return RegressionReport(combinations=0, regressions=[], compatibility_flips=[])
+    history = prepare_history(history)
+    return RegressionReport(
+        combinations=len(history.groupby(KEY_COLUMNS)),
+        regressions=find_metric_regressions(history, window_days, min_baseline_runs, relative_threshold, z_threshold),
+        compatibility_flips=find_compatibility_flips(history),
+    )
+
+
+def format_report(report: RegressionReport) -> str:
+    lines = [f"Checked {report.combinations} combinations: {report.verdict()['verdict']}"]
+    for flip in report.compatibility_flips:
+        if not flip.broke:
+            status = "works again"
+        elif flip.failure_reason in OUT_OF_MEMORY_REASONS:
+            status = f"does not fit in memory ({flip.failure_reason})"
+        else:
+            status = f"stopped working ({flip.failure_reason or 'unknown reason'})"
+        lines.append(f"  {flip.model_id} with {flip.backend_type} on {flip.machine} ({flip.hardware_type}): {status}")
+    for rank, regression in enumerate(report.regressions, 1):
+        lines.append(
+            f"  {rank}. {regression.model_id} with {regression.backend_type} on {regression.machine} ({regression.hardware_type}): "
+            f"{regression.metric} {regression.current:.4g} vs median {regression.baseline_median:.4g} "
+            f"({regression.relative_change:+.1%}, z {regression.robust_z:.1f}, {regression.baseline_runs} runs)"
+        )
+    return "\n".join(lines)
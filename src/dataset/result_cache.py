@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import subprocess
+import time
+from functools import lru_cache
+from importlib.metadata import PackageNotFoundError, version
+from typing import Optional
+from loguru import logger
+from pydantic import BaseModel, ValidationError
+from huggingface_hub import HfApi
+from huggingface_hub.utils._auth import get_token
+
+from backend.backend_types import SIMULATED_BACKEND
+from backend.run_backend import render_docker_command
+from backend.simulated_backend import get_simulated_backend_config
+from dataset.leaderboard_dataset import LeaderboardData
+from hardware.hardware_inventory import get_hardware_profile
+
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", "benchmark_result_cache")
+# Results older than this are benchmarked again even if nothing changed, to catch drift of the machine itself
+RESULT_CACHE_TTL_S = 7 * 24 * 3600
+PACKAGE_NAME = "ai-hardware-leaderboard"
+# Stands in for the token in the fingerprinted docker command, so rotating the token keeps the results
+TOKEN_PLACEHOLDER = "YOUR_HF_TOKEN"
+
+
+class ResultFingerprint(BaseModel):
+    """
+    Everything a benchmark result depends on, two jobs with the same fingerprint measure the same thing.
+    """
+    model_id: str
+    backend_type: str
+    hardware_type: str
+    image_digest: Optional[str]
+    model_revision: Optional[str]
+    docker_command: Optional[str]
+    hardware_profile: dict
+    harness_version: str
+    # The benchmarks run and their settings, for example the concurrency levels
+    options: dict
+
+    @property
+    def key(self) -> str:
+        return hashlib.sha256(json.dumps(self.model_dump(), sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class CachedResult(BaseModel):
+    fingerprint: ResultFingerprint
+    cached_at: float
+    result: LeaderboardData
+
+
+@lru_cache(maxsize=None)
+def get_harness_version() -> str:
+    """Get the version of the harness, the package version and the git commit when run from a checkout."""
+    try:
+        package_version = version(PACKAGE_NAME)
+    except PackageNotFoundError:
+        package_version = "unknown"
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL
+        ).decode("utf-8").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return package_version
+    return f"{package_version}+{commit}"
+
+
+@lru_cache(maxsize=None)
+def get_model_revision(model_id: str) -> Optional[str]:
+    """Get the commit hash of the main branch of a model repository, None if the hub cannot be reached."""
+    try:
+        return HfApi().model_info(model_id).sha
+    except Exception as e:
+        logger.warning(f"Could not get the revision of {model_id}, its results are not cached: {str(e)}")
+        return None
+
+
+def get_fingerprint(
+    model_id: str,
+    backend_type: str,
+    hardware_type: str,
+    image_digest: Optional[str],
+    no_weights: Optional[bool],
+    options: dict,
+) -> Optional[ResultFingerprint]:
+    """
+    Fingerprint a job before it runs, None if part of it cannot be resolved, such a job is always benchmarked.
+
+    Args:
+        model_id (str): The model id the backend loads, for example the gguf repository for llama.cpp
+        image_digest (str, optional): The digest the backend image resolved to
+        options (dict): The benchmark options
+    """
+    if backend_type == SIMULATED_BACKEND:
+        # Nothing is downloaded, the simulated backend is defined by its cost model
+        model_revision = None
+        docker_command = get_simulated_backend_config().model_dump_json()
+    else:
+        model_revision = get_model_revision(model_id)
+        if image_digest is None or model_revision is None:
+            return None
+        docker_command = " ".join(render_docker_command(model_id, backend_type, hardware_type, no_weights=no_weights).split())
+        token = get_token()
+        if token:
+            docker_command = docker_command.replace(token, TOKEN_PLACEHOLDER)
+
+    return ResultFingerprint(
+        model_id=model_id,
+        backend_type=backend_type,
+        hardware_type=hardware_type,
+        image_digest=image_digest,
+        model_revision=model_revision,
+        docker_command=docker_command,
+        hardware_profile=get_hardware_profile().to_columns(),
+        harness_version=get_harness_version(),
+        options=dict(options, no_weights=bool(no_weights)),
+    )
+
+
+class ResultCache:
+    """
+    Results of the previous runs stored by fingerprint, <cache_dir>/<fingerprint>.json, so a job whose image, model,
+    command, hardware and harness did not change reuses its last result instead of being benchmarked again.
+    Only the results of backends which served requests are cached, failures may be transient.
+
+    Usage:
+        cache = ResultCache()
+        fingerprint = get_fingerprint(...)
+        result = cache.get(fingerprint)
+        if result is None:
+            result = ...
+            cache.put(fingerprint, result)
+    """
+
+    def __init__(self, cache_dir: str = RESULT_CACHE_DIR, ttl_s: float = RESULT_CACHE_TTL_S):
+        self.cache_dir = cache_dir
+        self.ttl_s = ttl_s
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, fingerprint: ResultFingerprint) -> str:
+        return os.path.join(self.cache_dir, f"{fingerprint.key}.json")
+
+    def get(self, fingerprint: ResultFingerprint) -> Optional[LeaderboardData]:
+        """Get the cached result of a fingerprint, None if there is none younger than the TTL."""
+        try:
+            with open(self._path(fingerprint)) as f:
+                cached = CachedResult.model_validate_json(f.read())
+        except (OSError, ValidationError):
+            return None
+        if time.time() - cached.cached_at > self.ttl_s:
+            return None
+        return cached.result
+
+    def put(self, fingerprint: ResultFingerprint, result: LeaderboardData):
+        if not result.can_serve_single_request:
+            return
+        path = self._path(fingerprint)
+        # Written to a temporary file and renamed, a concurrent job never reads a partial result
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "w") as f:
+            f.write(CachedResult(fingerprint=fingerprint, cached_at=time.time(), result=result).model_dump_json())
+        os.replace(temporary_path, path)
@@ -0,0 +1,182 @@
+import io
+import os
+import uuid
+from datetime import datetime
+from typing import Optional, Protocol
+import pandas as pd
+from loguru import logger
+from huggingface_hub import HfApi, hf_hub_download
+
+# Each run appends its own parquet shards under this directory of the dataset repository, partitioned like
+# shards/hardware_type=cuda/machine=MY_MACHINE/date=2025-01-31/<run id>.parquet, so runs never rewrite each other's files
+SHARD_DIR = "shards"
+PARTITION_COLUMNS = ["hardware_type", "machine", "date"]
+# A (model, backend, machine) combination keeps only its most recent result in the latest view
+# A combination, the same machine name can show up with several hardware types like the journal keys
+KEY_COLUMNS = ["model_id", "backend_type", "hardware_type", "machine"]
+TIME_COLUMN = "benchmark_time"
+# Results of machines without a name are never published
+UNKNOWN_MACHINE = "UNKNOWN"
+
+
+class Publisher(Protocol):
+    """Storage of the dataset repository, the hub or a local directory standing in for it."""
+
+    def list_files(self, prefix: str) -> list[str]: ...
+
+    def read_parquet(self, path: str) -> pd.DataFrame: ...
+
+    def write_parquet(self, path: str, df: pd.DataFrame, message: str): ...
+
+
+class LocalPublisher:
+    """
+    A local directory standing in for the dataset repository, with the same layout.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def list_files(self, prefix: str) -> list[str]:
+        files: list[str] = []
+        for directory, _, names in os.walk(os.path.join(self.root, prefix)):
+            files.extend(os.path.relpath(os.path.join(directory, name), self.root) for name in names)
+        return sorted(files)
+
+    def read_parquet(self, path: str) -> pd.DataFrame:
+        return pd.read_parquet(os.path.join(self.root, path))
+
+    def write_parquet(self, path: str, df: pd.DataFrame, message: str):
+        full_path = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        # Written to a temporary file and renamed, a reader never sees a partial shard
+        temporary_path = f"{full_path}.tmp"
+        df.to_parquet(temporary_path, index=False)
+        os.replace(temporary_path, full_path)
+        logger.info(f"Wrote {path}: {message}")
+
+
+class HubPublisher:
+    """
+    A dataset repository on the Hugging Face Hub, each shard is uploaded in its own commit.
+    Shards are immutable, so the ones read before are served from the local hub cache.
+    """
+
+    def __init__(self, repo_id: str, api: Optional[HfApi] = None):
+        self.repo_id = repo_id
+        self.api = api or HfApi()
+
+    def list_files(self, prefix: str) -> list[str]:
+        return sorted(
+            path for path in self.api.list_repo_files(self.repo_id, repo_type="dataset") if path.startswith(f"{prefix}/")
+        )
+
+    def read_parquet(self, path: str) -> pd.DataFrame:
+        return pd.read_parquet(hf_hub_download(self.repo_id, path, repo_type="dataset"))
+
+    def write_parquet(self, path: str, df: pd.DataFrame, message: str):
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False)
+        self.api.upload_file(
+            path_or_fileobj=buffer.getvalue(),
+            path_in_repo=path,
+            repo_id=self.repo_id,
+            repo_type="dataset",
+            commit_message=message,
+        )
+        logger.info(f"Uploaded {path} to {self.repo_id}: {message}")
+
+
+def get_partition_dir(hardware_type: str, machine: str, date: str) -> str:
+    """Get the directory of a partition, for example shards/hardware_type=cuda/machine=MY_MACHINE/date=2025-01-31."""
+    values = [str(value).replace("/", "_") for value in (hardware_type, machine, date)]
+    return "/".join([SHARD_DIR] + [f"{column}={value}" for column, value in zip(PARTITION_COLUMNS, values)])
+
+
+def parse_partition(path: str) -> dict[str, str]:
+    """Get the partition values of a shard path, for example {"hardware_type": "cuda", "machine": ..., "date": ...}."""
+    return dict(part.split("=", 1) for part in path.split("/")[:-1] if "=" in part)
+
+
+def publish_results(records: list[dict], publisher: Publisher, run_id: Optional[str] = None) -> list[str]:
+    """
+    Append the results of a run as new parquet shards, one per (hardware type, machine, date) partition.
+    Nothing already published is read or rewritten, so machines publishing at the same time never conflict.
+
+    Args:
+        records (list[dict]): The results of the run, one dict per (model, backend) combination
+        publisher (Publisher): Where the shards are written
+        run_id (str, optional): Name of the shards. Defaults to the current time and a random suffix.
+
+    Returns:
+        list[str]: The paths of the written shards
+    """
+    df = pd.DataFrame(records)
+    if df.empty:
+        logger.info("No results to publish")
+        return []
+    df = df[df["machine"].str.upper() != UNKNOWN_MACHINE]
+    if df.empty:
+        logger.info("Not publishing the results of an unknown machine")
+        return []
+    if run_id is None:
+        run_id = f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+    dates = pd.to_datetime(df[TIME_COLUMN]).dt.strftime("%Y-%m-%d")
+    paths: list[str] = []
+    for (hardware_type, machine, date), shard in df.groupby([df["hardware_type"], df["machine"], dates], sort=False):
+        path = f"{get_partition_dir(hardware_type, machine, date)}/{run_id}.parquet"
+        entries = ", ".join(f"{model_id} ({backend_type})" for model_id, backend_type in zip(shard["model_id"], shard["backend_type"]))
+        publisher.write_parquet(path, shard.reset_index(drop=True), f"Added results of {machine} ({hardware_type}): {entries}")
+        paths.append(path)
+    return paths
+
+
+def read_results(
+    publisher: Publisher,
+    hardware_type: Optional[str] = None,
+    machine: Optional[str] = None,
+    since: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Read the published shards, only the partitions matching the filters are read.
+
+    Args:
+        hardware_type (str, optional): Only this hardware type
+        machine (str, optional): Only this machine
+        since (str, optional): Only the partitions of this date or later, for example "2025-01-31"
+    """
+    frames: list[pd.DataFrame] = []
+    for path in publisher.list_files(SHARD_DIR):
+        if not path.endswith(".parquet"):
+            continue
+        partition = parse_partition(path)
+        if hardware_type is not None and partition.get("hardware_type") != hardware_type:
+            continue
+        if machine is not None and partition.get("machine") != machine:
+            continue
+        if since is not None and partition.get("date", "") < since:
+            continue
+        frames.append(publisher.read_parquet(path))
+    frames = [frame for frame in frames if not frame.empty]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def get_latest_view(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Keep the most recent result of each (model, backend, machine) combination, in a single sort instead of a scan per result.
+    """
+    if df.empty:
+        return df
+    df = df.assign(**{TIME_COLUMN: pd.to_datetime(df[TIME_COLUMN])})
+    return (
+        df.sort_values(TIME_COLUMN, kind="stable")
+        .drop_duplicates(subset=KEY_COLUMNS, keep="last")
+        .sort_values(KEY_COLUMNS)
+        .reset_index(drop=True)
+    )
+
+
+def read_latest_results(publisher: Publisher, hardware_type: Optional[str] = None, machine: Optional[str] = None) -> pd.DataFrame:
+    """Read the published shards and keep the most recent result of each combination."""
+    return get_latest_view(read_results(publisher, hardware_type, machine))
@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Optional
+from loguru import logger
+from pydantic import ValidationError
+
+from dataset.leaderboard_dataset import LeaderboardData
+
+RESULTS_JOURNAL_DIR = os.environ.get("RESULTS_JOURNAL_DIR", "benchmark_journal")
+JOURNAL_SUFFIX = ".jsonl"
+# Last line of a journal whose results were published, such a run is not resumed
+COMPLETE_RECORD = {"complete": True}
+
+
+def get_result_key(model_id: str, backend_type: str, hardware_type: str) -> str:
+    """Get the key of a (model, backend, hardware) combination in the journal."""
+    return f"{model_id}|{backend_type}|{hardware_type}"
+
+
+class ResultsJournal:
+    """
+    Append only log of the results of a run, one JSON line per finished job, flushed and fsync'd before the next job
+    starts so a crash, an OOM-killed harness or ctrl-C only loses the jobs which were running.
+    An interrupted run is resumed by reading its journal back and skipping the combinations it already has.
+
+    Usage:
+        journal = ResultsJournal.open_latest() if resume else ResultsJournal.create()
+        completed = journal.load()
+        ...
+        journal.append(result)
+        ...
+        journal.mark_complete()
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, journal_dir: str = RESULTS_JOURNAL_DIR) -> "ResultsJournal":
+        os.makedirs(journal_dir, exist_ok=True)
+        path = os.path.join(journal_dir, f"{datetime.now():%Y%m%dT%H%M%S}{JOURNAL_SUFFIX}")
+        open(path, "a").close()
+        # The new file only survives a crash once its directory entry is on disk
+        directory_fd = os.open(journal_dir, os.O_RDONLY)
+        try:
+            os.fsync(directory_fd)
+        finally:
+            os.close(directory_fd)
+        logger.info(f"Journaling the results to {path}")
+        return cls(path)
+
+    @classmethod
+    def open_latest(cls, journal_dir: str = RESULTS_JOURNAL_DIR) -> Optional["ResultsJournal"]:
+        """Open the journal of the most recent run if it did not complete, None otherwise."""
+        if not os.path.isdir(journal_dir):
+            return None
+        names = sorted(name for name in os.listdir(journal_dir) if name.endswith(JOURNAL_SUFFIX))
+        if not names:
+            return None
+        # Only the last run is resumed, an older crashed run was superseded by the runs after it
+        journal = cls(os.path.join(journal_dir, names[-1]))
+        if journal.is_complete():
+            return None
+        logger.info(f"Resuming the run journaled in {journal.path}")
+        return journal
+
+    def _read_records(self) -> list[dict]:
+        records: list[dict] = []
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # The last line of a journal interrupted in the middle of a write
+                    logger.warning(f"Ignoring a truncated line of {self.path}")
+        return records
+
+    def is_complete(self) -> bool:
+        records = self._read_records()
+        return bool(records) and records[-1] == COMPLETE_RECORD
+
+    def load(self) -> dict[str, LeaderboardData]:
+        """Read the journaled results by combination key, the last result of a combination wins."""
+        results: dict[str, LeaderboardData] = {}
+        for record in self._read_records():
+            if "result" not in record:
+                continue
+            try:
+                result = LeaderboardData(**record["result"])
+            except ValidationError as e:
+                logger.warning(f"Ignoring a journaled result which does not match the current schema: {str(e)}")
+                continue
+            results[get_result_key(result.model_id, result.backend_type, result.hardware_type)] = result
+        return results
+
+    def _write(self, record: dict):
+        with self._lock:
+            with open(self.path, "a") as f:
+                # A previous run may have been interrupted in the middle of a line
+                if f.tell() > 0:
+                    with open(self.path, "rb") as tail:
+                        tail.seek(-1, os.SEEK_END)
+                        if tail.read(1) != b"\n":
+                            f.write("\n")
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def append(self, result: LeaderboardData):
+        """Durably record the result of a finished job, called from the scheduler worker threads."""
+        self._write({"result": result.model_dump(mode="json")})
+
+    def mark_complete(self):
+        """Record that the results of the run were published, a later resume starts a new run."""
+        self._write(COMPLETE_RECORD)
@@ -4,9 +4,19 @@ from typing import List
 from rich.console import Console
 import platform
 
+from hardware.hardware_inventory import HardwareProfile, get_hardware_profile
+
 console = Console()
 
 class HardwareDetector:
+    def __init__(self, root: str = "/"):
+        self.root = root
+
+    @property
+    def profile(self) -> HardwareProfile:
+        # Read once from /proc and sysfs and cached, on Linux only
+        return get_hardware_profile(self.root)
+
     def _run_cmd(self, cmd: List[str]) -> str:
         try:
             return subprocess.check_output(cmd, stderr=subprocess.DEVNULL).decode('utf-8')
@@ -14,12 +24,13 @@ class HardwareDetector:
             return ""
 
     def detect_nvidia_gpu(self) -> bool:
+        if platform.system() == "Linux":
+            return self.profile.has_accelerator("NVIDIA")
         return bool(self._run_cmd(['nvidia-smi']))
 
     def detect_intel_cpu(self) -> bool:
         if platform.system() == "Linux":
-            cpu_info = self._run_cmd(['cat', '/proc/cpuinfo'])
-            return 'Intel' in cpu_info
+            return self.profile.cpu.vendor == 'GenuineIntel'
         elif platform.system() == "Darwin":  # macOS
             sysctl_output = self._run_cmd(['sysctl', '-n', 'machdep.cpu.brand_string'])
             return 'Intel' in sysctl_output
@@ -30,8 +41,7 @@ class HardwareDetector:
 
     def detect_amd_cpu(self) -> bool:
         if platform.system() == "Linux":
-            cpu_info = self._run_cmd(['cat', '/proc/cpuinfo'])
-            return 'AMD' in cpu_info
+            return self.profile.cpu.vendor == 'AuthenticAMD'
         elif platform.system() == "Darwin":  # macOS
             sysctl_output = self._run_cmd(['sysctl', '-n', 'machdep.cpu.brand_string'])
             return 'AMD' in sysctl_output
@@ -42,8 +52,7 @@ class HardwareDetector:
 
     def detect_intel_gpu(self) -> bool:
         if platform.system() == "Linux":
-            lspci_output = self._run_cmd(['lspci'])
-            return 'Intel' in lspci_output and ('VGA' in lspci_output or 'Display' in lspci_output)
+            return self.profile.has_accelerator('Intel', display_only=True)
         elif platform.system() == "Darwin":
             system_profiler = self._run_cmd(['system_profiler', 'SPDisplaysDataType'])
             return 'Intel' in system_profiler
@@ -51,21 +60,20 @@ class HardwareDetector:
 
     def detect_amd_gpu(self) -> bool:
         if platform.system() == "Linux":
-            lspci_output = self._run_cmd(['lspci'])
-            return ('AMD' in lspci_output or 'Radeon' in lspci_output) and ('VGA' in lspci_output or 'Display' in lspci_output)
+            return self.profile.has_accelerator('AMD')
         elif platform.system() == "Darwin":
             system_profiler = self._run_cmd(['system_profiler', 'SPDisplaysDataType'])
             return 'AMD' in system_profiler or 'Radeon' in system_profiler
         return False
 
     def detect_habana(self) -> bool:
-        return os.path.exists('/dev/habana_pci0')
+        return os.path.exists(os.path.join(self.root, 'dev/habana_pci0')) or self.profile.has_accelerator('Habana')
 
     def detect_tpu(self) -> bool:
-        return os.path.exists('/dev/accel0')
+        return os.path.exists(os.path.join(self.root, 'dev/accel0'))
 
     def detect_inferentia(self) -> bool:
-        return os.path.exists('/dev/neuron0')
+        return os.path.exists(os.path.join(self.root, 'dev/neuron0'))
 
     def detect_apple_silicon(self) -> bool:
         if platform.system() != "Darwin":
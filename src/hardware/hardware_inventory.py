@@ -0,0 +1,218 @@
+import functools
+import glob
+import os
+import platform
+import re
+from typing import Optional
+from pydantic import BaseModel
+
+# ISA extensions relevant to inference kernels, as named in /proc/cpuinfo
+ISA_FLAGS = [
+    "avx2", "avx512f", "avx512_bf16", "avx512_fp16", "avx512_vnni", "avx_vnni",
+    "amx_tile", "amx_bf16", "amx_int8", "asimd", "sve", "sve2",
+]
+PCI_VENDORS = {
+    "0x10de": "NVIDIA",
+    "0x1002": "AMD",
+    "0x8086": "Intel",
+    "0x1da3": "Habana",
+    "0x1d0f": "Amazon",
+    "0x1ae0": "Google",
+}
+# PCI classes of display controllers, co-processors and processing accelerators
+ACCELERATOR_PCI_CLASSES = ("0x03", "0x0b40", "0x12")
+COPROCESSOR_PCI_CLASS = "0x0b40"
+# Co-processors are only accelerators of these vendors, Intel QuickAssist crypto and compression cards share the class
+COPROCESSOR_PCI_VENDORS = {"0x1da3", "0x1d0f", "0x1ae0"}
+
+
+class CpuInfo(BaseModel):
+    vendor: Optional[str] = None
+    model_name: Optional[str] = None
+    sockets: int
+    physical_cores: int
+    logical_cpus: int
+    isa_flags: list[str]
+
+
+class NumaNode(BaseModel):
+    node_id: int
+    cpus: list[int]
+    memory_bytes: Optional[int] = None
+
+
+class PciDevice(BaseModel):
+    address: str
+    vendor_id: str
+    device_id: str
+    pci_class: str
+    numa_node: Optional[int] = None
+
+    @property
+    def vendor(self) -> str:
+        return PCI_VENDORS.get(self.vendor_id, self.vendor_id)
+
+
+class HardwareProfile(BaseModel):
+    """
+    The hardware of the machine running the benchmarks, stored with every result.
+    """
+    cpu: CpuInfo
+    numa_nodes: list[NumaNode]
+    memory_bytes: Optional[int] = None
+    accelerators: list[PciDevice]
+
+    def has_accelerator(self, vendor: str, display_only: bool = False) -> bool:
+        return any(
+            device.vendor == vendor and (not display_only or device.pci_class.startswith("0x03"))
+            for device in self.accelerators
+        )
+
+    def to_columns(self) -> dict:
+        """
+        Get the flat result columns used to normalize the results per socket or per core.
+        """
+        return {
+            "cpu_model_name": self.cpu.model_name,
+            "cpu_sockets": self.cpu.sockets,
+            "cpu_physical_cores": self.cpu.physical_cores,
+            "cpu_logical_cpus": self.cpu.logical_cpus,
+            "cpu_isa_flags": ",".join(self.cpu.isa_flags),
+            "numa_nodes": len(self.numa_nodes),
+            "memory_total_bytes": self.memory_bytes,
+            "accelerator_count": len(self.accelerators),
+            "accelerator_devices": ",".join(sorted({f"{device.vendor}:{device.device_id}" for device in self.accelerators})),
+        }
+
+
+def read_text(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def parse_cpu_list(cpu_list: str) -> list[int]:
+    """
+    Parse a kernel cpu list, for example "0-3,8" -> [0, 1, 2, 3, 8].
+    """
+    cpus: list[int] = []
+    for part in cpu_list.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        cpus.extend(range(int(start), int(end or start) + 1))
+    return cpus
+
+
+def read_cpu_info(root: str = "/") -> CpuInfo:
+    """
+    Read the cpu model and ISA flags from /proc/cpuinfo and the topology from sysfs,
+    falling back to the cpuinfo physical and core ids on kernels without topology files.
+    """
+    processors: list[dict[str, str]] = []
+    cpuinfo = read_text(os.path.join(root, "proc/cpuinfo")) or ""
+    for block in cpuinfo.split("\n\n"):
+        fields = {}
+        for line in block.splitlines():
+            key, _, value = line.partition(":")
+            fields[key.strip()] = value.strip()
+        if "processor" in fields:
+            processors.append(fields)
+
+    first = processors[0] if processors else {}
+    # x86 lists the extensions in "flags", arm in "Features"
+    flags = set((first.get("flags") or first.get("Features") or "").split())
+
+    cores: set[tuple[str, str]] = set()
+    packages: set[str] = set()
+    cpu_dirs = glob.glob(os.path.join(root, "sys/devices/system/cpu/cpu[0-9]*"))
+    for cpu_dir in cpu_dirs:
+        package_id = read_text(os.path.join(cpu_dir, "topology/physical_package_id"))
+        core_id = read_text(os.path.join(cpu_dir, "topology/core_id"))
+        if package_id is not None and core_id is not None:
+            packages.add(package_id)
+            cores.add((package_id, core_id))
+    if not cores:
+        for processor in processors:
+            package_id = processor.get("physical id", "0")
+            packages.add(package_id)
+            cores.add((package_id, processor.get("core id", processor["processor"])))
+
+    return CpuInfo(
+        vendor=first.get("vendor_id") or first.get("CPU implementer"),
+        model_name=first.get("model name") or first.get("Model") or platform.processor() or None,
+        sockets=max(len(packages), 1),
+        physical_cores=max(len(cores), 1),
+        logical_cpus=max(len(processors), len(cpu_dirs), 1),
+        isa_flags=[flag for flag in ISA_FLAGS if flag in flags],
+    )
+
+
+def read_meminfo_bytes(text: str, key: str) -> Optional[int]:
+    """Read a "Key: value kB" entry of a meminfo file in bytes."""
+    match = re.search(rf"{re.escape(key)}:\s+(\d+) kB", text)
+    return int(match.group(1)) * 1024 if match else None
+
+
+def read_numa_nodes(root: str = "/") -> list[NumaNode]:
+    nodes: list[NumaNode] = []
+    for node_dir in glob.glob(os.path.join(root, "sys/devices/system/node/node[0-9]*")):
+        cpu_list = read_text(os.path.join(node_dir, "cpulist"))
+        nodes.append(
+            NumaNode(
+                node_id=int(os.path.basename(node_dir)[len("node"):]),
+                cpus=parse_cpu_list(cpu_list) if cpu_list else [],
+                memory_bytes=read_meminfo_bytes(read_text(os.path.join(node_dir, "meminfo")) or "", "MemTotal"),
+            )
+        )
+    return sorted(nodes, key=lambda node: node.node_id)
+
+
+def read_accelerators(root: str = "/") -> list[PciDevice]:
+    """
+    List the accelerator devices from the PCI sysfs tree, without lspci or vendor tools.
+    """
+    devices: list[PciDevice] = []
+    for device_dir in sorted(glob.glob(os.path.join(root, "sys/bus/pci/devices/*"))):
+        pci_class = read_text(os.path.join(device_dir, "class"))
+        vendor_id = read_text(os.path.join(device_dir, "vendor"))
+        if pci_class is None or vendor_id is None or not pci_class.startswith(ACCELERATOR_PCI_CLASSES):
+            continue
+        # Server boards have a basic display controller for the console, only keep known accelerator vendors
+        if vendor_id not in PCI_VENDORS:
+            continue
+        if pci_class.startswith(COPROCESSOR_PCI_CLASS) and vendor_id not in COPROCESSOR_PCI_VENDORS:
+            continue
+        numa_node = read_text(os.path.join(device_dir, "numa_node"))
+        devices.append(
+            PciDevice(
+                address=os.path.basename(device_dir),
+                vendor_id=vendor_id,
+                device_id=read_text(os.path.join(device_dir, "device")) or "",
+                pci_class=pci_class,
+                numa_node=int(numa_node) if numa_node and int(numa_node) >= 0 else None,
+            )
+        )
+    return devices
+
+
+@functools.lru_cache(maxsize=None)
+def get_hardware_profile(root: str = "/") -> HardwareProfile:
+    """
+    Read the hardware profile of the machine once, from /proc and sysfs only, and cache it.
+
+    Args:
+        root (str): Root of the /proc and sysfs trees, to read the profile of a fake tree
+
+    Returns:
+        HardwareProfile: The cpu, NUMA, memory and accelerator inventory
+    """
+    return HardwareProfile(
+        cpu=read_cpu_info(root),
+        numa_nodes=read_numa_nodes(root),
+        memory_bytes=read_meminfo_bytes(read_text(os.path.join(root, "proc/meminfo")) or "", "MemTotal"),
+        accelerators=read_accelerators(root),
+    )
@@ -1,16 +1,39 @@
-from typing import Optional
+from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
 import os
+import time
 import typer
 from backend.run_backend import BackendRunner
-from benchmark.test_backend_working import test_backend_working
+from benchmark.test_backend_working import BASE_URL, get_served_model_id, test_backend_working
+from benchmark.benchmark_options import BenchmarkOptions
+from benchmark.load_generator import ConcurrencyResult, run_concurrency_sweep, summarize_streaming
+from benchmark.load_workers import LoadWorkerPool, get_load_workers
+from benchmark.open_loop import RateSweepResult, run_rate_sweep
+from benchmark.workload import WorkloadCellResult, format_workload_matrix, run_workload_matrix
+from benchmark.startup import StartupBenchmarkResult, get_startup_phases, run_startup_benchmark
+from benchmark.slo_search import DEFAULT_ITL_P95_S, DEFAULT_TTFT_P95_S, GoodputResult, LatencySLO, find_max_goodput
+from backend.docker_client import DockerClient
+from backend.resources import CPU_HARDWARE_TYPES, get_load_generator_cpus
+from telemetry.collectors import create_collectors
+from telemetry.prometheus import PrometheusCollector, get_metrics_url
+from telemetry.sampler import ServerMetricsPoint, TelemetrySampler, TelemetrySummary
+from backend.images import ImagePrefetcher, collect_images, get_backend_image
+from scheduler.job_scheduler import JOB_ERROR, JOB_LOG_DIR, BenchmarkJob, JobScheduler, create_jobs, remove_stale_containers
+from scheduler.preflight import OOM_PREDICTED, preflight_jobs
 from model.get_models import Model, get_models
 from loguru import logger
 from hardware.hardware_cli import display_hardware_menu
 from hardware.hardware_detector import HardwareDetector
+from hardware.hardware_inventory import get_hardware_profile
 from model.weights import download_no_weights_model
+from model.model_cache import ModelCache
 from huggingface_hub.utils._auth import get_token
-from backend.backend_types import get_backend_types
+from backend.backend_types import SIMULATED_BACKEND, get_backend_types
 from dataset.leaderboard_dataset import LeaderboardData, upload_data_to_hub
+from dataset.result_publisher import LocalPublisher
+from dataset.results_journal import ResultsJournal, get_result_key
+from dataset.result_cache import RESULT_CACHE_TTL_S, ResultCache, ResultFingerprint, get_fingerprint
 from datetime import datetime
 from rich.console import Console
 from dotenv import load_dotenv
@@ -33,11 +56,45 @@ if machine == "UNKNOWN":
 @app.command()
 def start_benchmark(
     no_weights: Optional[bool] = False,
+    concurrency_levels: Optional[List[int]] = None,
+    request_rates: Optional[List[float]] = None,
+    slo_ttft_p95: float = DEFAULT_TTFT_P95_S,
+    slo_itl_p95: float = DEFAULT_ITL_P95_S,
+    workload_matrix: bool = False,
+    cold_start_trials: int = 0,
+    warm_start_trials: int = 0,
+    workers: int = 1,
+    multi_instance: bool = False,
+    run_oom_predicted: bool = False,
+    model_cache_budget_gb: Optional[float] = None,
+    simulated: bool = False,
+    load_workers: Optional[int] = None,
+    publish_dir: Optional[str] = None,
+    resume: bool = False,
+    force_refresh: bool = False,
+    result_cache_ttl_hours: float = RESULT_CACHE_TTL_S / 3600,
 ):
     """
     Start all the benchmarks for all the top text generation models on Hugging Face Hub with all the backends.
     Args:
         no_weights (Optional[bool], optional): Whether to download models without weights. Defaults to True.
+        concurrency_levels (Optional[List[int]], optional): Concurrency levels of the load benchmark. Defaults to 1, 8, 32 and 128.
+        request_rates (Optional[List[float]], optional): Request rates of the open loop benchmark, it is skipped if not set.
+        slo_ttft_p95 (float, optional): p95 time to first token objective in seconds of the goodput search. Defaults to 0.5.
+        slo_itl_p95 (float, optional): p95 inter token latency objective in seconds of the goodput search. Defaults to 0.05.
+        workload_matrix (bool, optional): Whether to run the input/output length sweep. Defaults to False.
+        cold_start_trials (int, optional): Number of startups from a removed image timed phase by phase. Defaults to 0.
+        warm_start_trials (int, optional): Number of startups from a present image timed phase by phase. Defaults to 0.
+        workers (int, optional): Number of (model, backend) combinations benchmarked in parallel, each on its own slice of the machine. Defaults to 1.
+        multi_instance (bool, optional): On CPU, run one backend instance per NUMA node of each job and spread the load over them. Defaults to False.
+        run_oom_predicted (bool, optional): Whether to still start the backends predicted to run out of memory. Defaults to False.
+        model_cache_budget_gb (Optional[float], optional): Disk budget of the model cache, the least recently used models are evicted above it. Defaults to no limit.
+        simulated (bool, optional): Benchmark the in process simulated backend instead of the real ones, to test the harness without docker or accelerators. Defaults to False.
+        load_workers (Optional[int], optional): Load generator processes of the closed loop benchmarks, 1 runs the load in this process. Defaults to one per cpu left to the client.
+        publish_dir (Optional[str], optional): Publish the results as dataset shards in this directory instead of the hub repository, for example to check them before uploading. Defaults to None.
+        resume (bool, optional): Resume the most recent interrupted run from its results journal, skipping the combinations it already benchmarked. Defaults to False.
+        force_refresh (bool, optional): Benchmark every combination, even those with a recent result measured with the same image, model revision, docker command, hardware and harness. Defaults to False.
+        result_cache_ttl_hours (float, optional): Age after which a result is measured again even if nothing changed. Defaults to a week.
     """
     # Check if hardware type is already set in environment
     selected_hardware = os.environ.get("HARDWARE_TYPE")
@@ -51,34 +108,197 @@ def start_benchmark(
         selected_hardware = display_hardware_menu(recommended_hardware)
 
     console.print(f"\n[green]Selected Hardware Configuration:[/green]: {selected_hardware}\n")
+    
+    if cold_start_trials and workers > 1:
+        # A cold start removes the image, which the other jobs may be running
+        logger.warning("Cold start trials need a single worker, skipping them")
+        cold_start_trials = 0
+    
+    options = BenchmarkOptions(
+        concurrency_levels=concurrency_levels,
+        request_rates=request_rates,
+        slo=LatencySLO(ttft_p95_s=slo_ttft_p95, itl_p95_s=slo_itl_p95),
+        workload_matrix=workload_matrix,
+        load_workers=load_workers,
+        cold_start_trials=cold_start_trials,
+        warm_start_trials=warm_start_trials,
+    )
 
     top_models = get_models()
     logger.info(
         f"\nTop {len(top_models)} text generation models on Hugging Face Hub:"
     )
-    
-    results: list[LeaderboardData] = []
     for i, model in enumerate(top_models, 1):
         logger.info(f"{i}. {model.name}")
-        for backend_type in get_backend_types():
+    
+    backend_types = [SIMULATED_BACKEND] if simulated else get_backend_types()
+    if not simulated:
+        remove_stale_containers(DockerClient())
+    if multi_instance and selected_hardware not in CPU_HARDWARE_TYPES:
+        logger.warning("Multi instance mode is only supported on CPU, running a single instance per job")
+        multi_instance = False
+    scheduler = JobScheduler(selected_hardware, workers, multi_instance=multi_instance)
+    
+    # Jobs which would not fit in the memory of a resource slice are recorded without starting their backend
+    jobs, oom_predicted_jobs = preflight_jobs(
+        create_jobs(top_models, backend_types, selected_hardware),
+        scheduler.resource_slices[0].device_ids,
+        run_oom_predicted,
+    )
+    
+    # Every finished job is journaled, so an interrupted run can be resumed where it stopped
+    journal = ResultsJournal.open_latest() if resume else None
+    if resume and journal is None:
+        logger.warning("No interrupted run to resume, starting a new run")
+    journal = journal or ResultsJournal.create()
+    completed_results = journal.load()
+    
+    def job_key(job: BenchmarkJob) -> str:
+        return get_result_key(job.model.hf_model_id, job.backend_type, job.hardware_type)
+    
+    if completed_results:
+        logger.info(f"Skipping {len(completed_results)} combinations already benchmarked by the interrupted run")
+    resumed_jobs = [job for job in jobs if job_key(job) in completed_results]
+    jobs = [job for job in jobs if job_key(job) not in completed_results]
+    
+    prefetcher = ImagePrefetcher()
+    
+    def get_job_fingerprint(job: BenchmarkJob, image_digest: Optional[str]) -> Optional[ResultFingerprint]:
+        return get_fingerprint(
+            get_served_model_id(job.model, job.backend_type),
+            job.backend_type,
+            job.hardware_type,
+            image_digest,
+            no_weights,
+            options.model_dump(),
+        )
+    
+    # Results of the combinations which did not change since they were last benchmarked are reused. They are looked
+    # up before anything is pulled or downloaded, with the digests the image tags resolve to in their registry
+    result_cache = ResultCache(ttl_s=result_cache_ttl_hours * 3600)
+    reused_results: dict[str, LeaderboardData] = {}
+    for job in [] if force_refresh else jobs:
+        image_digest = None
+        if job.backend_type != SIMULATED_BACKEND:
+            image_digest = prefetcher.resolve_digest(get_backend_image(job.backend_type, job.hardware_type))
+        fingerprint = get_job_fingerprint(job, image_digest)
+        cached_result = result_cache.get(fingerprint) if fingerprint is not None else None
+        if cached_result is not None:
             logger.info(
-                f"Running benchmark for {model.name} with {backend_type} backend"
+                f"Reusing the result of {job.model.name} with {job.backend_type} measured at {cached_result.benchmark_time}, nothing changed since"
             )
-
-            result = single_model_benchmark(model, backend_type, selected_hardware, no_weights)
-            results.append(result)
-            if result.can_serve_single_request and os.environ.get("QUICK_BENCHMARKING", "0") == "1":
-                logger.info(f"Quick benchmarking enabled, stopping after first successful benchmark")
-                break
-                
+            reused_results[job_key(job)] = cached_result.model_copy(update={"reused_result": True})
+            journal.append(reused_results[job_key(job)])
+    done_jobs = resumed_jobs + [job for job in jobs if job_key(job) in reused_results]
+    jobs = [job for job in jobs if job_key(job) not in reused_results]
+    
+    # Pull the images of the jobs to run in backend order in the background, so later pulls overlap with the running benchmarks
+    needed_images = {get_backend_image(job.backend_type, job.hardware_type) for job in jobs if job.backend_type != SIMULATED_BACKEND}
+    prefetcher.prefetch([image for image in collect_images(selected_hardware, backend_types) if image in needed_images])
+    
+    # Download the model snapshots in job order in the background, llama.cpp downloads its GGUF files itself
+    model_cache = ModelCache(budget_bytes=int(model_cache_budget_gb * 1024**3) if model_cache_budget_gb else None)
+    
+    def uses_model_cache(job: BenchmarkJob) -> bool:
+        return not no_weights and job.backend_type not in ("llama_cpp", SIMULATED_BACKEND)
+    
+    cached_jobs = [job for job in jobs if uses_model_cache(job)]
+    if cached_jobs:
+        model_cache.plan(
+            [job.model.hf_model_id for job in cached_jobs],
+            {job.model.hf_model_id: job.memory_estimate.parameter_bytes for job in cached_jobs if job.memory_estimate},
+        )
+    
+    # Models with a successful benchmark, used to skip the other backends in quick benchmarking mode
+    done_results = {**completed_results, **reused_results}
+    working_models: set[str] = {job.model.name for job in done_jobs if done_results[job_key(job)].can_serve_single_request}
+    
+    def should_skip(job: BenchmarkJob) -> bool:
+        skip = os.environ.get("QUICK_BENCHMARKING", "0") == "1" and job.model.name in working_models
+        if skip and uses_model_cache(job):
+            # Its model is not downloaded for it
+            model_cache.drop(job.model.hf_model_id)
+        return skip
+    
+    def run_job(job: BenchmarkJob) -> LeaderboardData:
+        logger.info(
+            f"Running benchmark for {job.model.name} with {job.backend_type} backend"
+        )
+        if job.backend_type != SIMULATED_BACKEND:
+            job.image = prefetcher.wait(get_backend_image(job.backend_type, job.hardware_type))
+        if uses_model_cache(job):
+            job.cached_model = model_cache.wait(job.model.hf_model_id)
+        try:
+            result = single_model_benchmark(job.model, job.backend_type, job.hardware_type, no_weights, options, job)
+        finally:
+            if uses_model_cache(job):
+                model_cache.release(job.model.hf_model_id)
+        # Cached under the digest of the image which actually ran
+        fingerprint = get_job_fingerprint(job, job.image.digest if job.image is not None else None)
+        if fingerprint is not None:
+            result.result_fingerprint = fingerprint.key
+            result_cache.put(fingerprint, result)
+        journal.append(result)
+        if result.can_serve_single_request:
+            working_models.add(job.model.name)
+        return result
+    
+    try:
+        # A failed job is not journaled, so a resumed run tries it again
+        results = scheduler.run(jobs, run_job, should_skip, failed_job_result)
+    finally:
+        prefetcher.shutdown()
+        model_cache.shutdown()
+    results = list(completed_results.values()) + list(reused_results.values()) + results + [oom_predicted_result(job) for job in oom_predicted_jobs]
                 
     # display summary of results
     console.print("\n[green]Summary of results:[/green]")
     for result in results:
-        console.print(f"{selected_hardware} - {result.model_id} with {result.backend_type} backend: {'[green]working[/green]' if result.can_serve_single_request else '[red]failed[/red]'}")
+        throughput = f" ({result.max_output_tokens_per_second:.1f} tok/s)" if result.max_output_tokens_per_second else ""
+        status = "[green]working[/green]" if result.can_serve_single_request else "[yellow]predicted out of memory[/yellow]" if result.failure_reason == OOM_PREDICTED else "[red]failed[/red]"
+        reused = " (reused)" if result.reused_result else ""
+        console.print(f"{selected_hardware} - {result.model_id} with {result.backend_type} backend: {status}{throughput}{reused}")
     
-    # Upload all results at once
-    # upload_data_to_hub(results)
+    # Upload all results at once, as new shards of the dataset, results of an unknown machine are not uploaded
+    upload_data_to_hub(results, LocalPublisher(publish_dir) if publish_dir else None)
+    # Only once they are published, a failed upload can be retried with --resume
+    journal.mark_complete()
+
+
+def oom_predicted_result(job: BenchmarkJob) -> LeaderboardData:
+    """
+    Get the result of a job skipped by the preflight, so the combination shows as not fitting rather than missing.
+    """
+    return LeaderboardData(
+        model_id=job.model.hf_model_id,
+        backend_type=job.backend_type,
+        can_serve_single_request=False,
+        failure_reason=OOM_PREDICTED,
+        **job.memory_estimate.to_columns(),
+        hardware_type=job.hardware_type,
+        machine=machine,
+        **get_hardware_profile().to_columns(),
+        benchmark_time=datetime.now(),
+        docker_command=None,
+    )
+
+
+def failed_job_result(job: BenchmarkJob, error: Exception) -> LeaderboardData:
+    """
+    Get the result of a job which raised, so the combination shows as failed rather than missing.
+    """
+    return LeaderboardData(
+        model_id=job.model.hf_model_id,
+        backend_type=job.backend_type,
+        can_serve_single_request=False,
+        failure_reason=JOB_ERROR,
+        **(job.memory_estimate.to_columns() if job.memory_estimate is not None else {}),
+        hardware_type=job.hardware_type,
+        machine=machine,
+        **get_hardware_profile().to_columns(),
+        benchmark_time=datetime.now(),
+        docker_command=None,
+    )
 
 
 def single_model_benchmark(
@@ -86,6 +306,8 @@ def single_model_benchmark(
     backend_type: str,
     hardware_type: str,
     no_weights: Optional[bool] = True,
+    options: Optional[BenchmarkOptions] = None,
+    job: Optional[BenchmarkJob] = None,
 ) -> LeaderboardData:
     """
     Start a benchmark for a given model and backend.
@@ -93,39 +315,188 @@ def single_model_benchmark(
         model_name (str): The model name to use such as "gpt2"
         type (BackendType): The backend type to use such as "vllm" or "tgi"
         no_weights (bool, optional): Whether to download the model without weights. Defaults to True.
+        options (BenchmarkOptions, optional): The performance benchmarks to run. Defaults to the closed loop sweep and goodput search.
+        job (BenchmarkJob, optional): The scheduled job giving the container name, port and resources. Defaults to a single job on port 8080.
     """
-    if backend_type not in get_backend_types():
-        raise ValueError(f"backend_type must be one of the following: {get_backend_types()}")
+    if backend_type not in get_backend_types(include_simulated=True):
+        raise ValueError(f"backend_type must be one of the following: {get_backend_types(include_simulated=True)}")
 
-    if no_weights:
-        raise ValueError("No weights are currently not working")
-        logger.info(f"Using no weights model {model_name}")
-        download_no_weights_model(model_name)
+    # The simulated backend has no weights to load
+    if no_weights and backend_type != SIMULATED_BACKEND:
+        if backend_type == "llama_cpp":
+            raise ValueError("No weights mode builds safetensors checkpoints, llama.cpp only loads GGUF files")
+        logger.info(f"Using no weights model {model.hf_model_id}")
+        download_no_weights_model(model.hf_model_id)
 
-    backend_runner = BackendRunner()
+    if options is None:
+        options = BenchmarkOptions()
+    
+    if job is not None:
+        backend_runner = BackendRunner(
+            container_name=job.container_name,
+            host_port=job.host_port,
+            resources=job.instances[0].resources if job.instances else job.resources,
+            log_path=os.path.join(JOB_LOG_DIR, f"{job.job_id}.container.log.gz"),
+        )
+        # In multi instance mode the other instances share the load with the first one, each on its own NUMA node
+        instance_runners = [
+            BackendRunner(
+                container_name=instance.container_name,
+                host_port=instance.host_port,
+                resources=instance.resources,
+                log_path=os.path.join(JOB_LOG_DIR, f"{job.job_id}.{index}.container.log.gz"),
+            )
+            for index, instance in enumerate(job.instances[1:], 1)
+        ]
+        base_urls = job.base_urls
+    else:
+        backend_runner = BackendRunner()
+        instance_runners = []
+        base_urls = [BASE_URL]
     
     can_serve_single_request = False
+    concurrency_results: list[ConcurrencyResult] = []
+    rate_sweep: Optional[RateSweepResult] = None
+    goodput: Optional[GoodputResult] = None
+    workload_results: list[WorkloadCellResult] = []
+    startup: Optional[StartupBenchmarkResult] = None
+    # Energy per token is measured over the concurrency sweep only, startup and idle time excluded
+    sweep_telemetry: Optional[TelemetrySummary] = None
+    server_series: list[ServerMetricsPoint] = []
+    
+    device_ids = job.resources.device_ids if job is not None and job.resources is not None else None
+    sampler = TelemetrySampler(
+        create_collectors(
+            lambda: [runner.container_id for runner in [backend_runner] + instance_runners if runner.container_id is not None],
+            hardware_type,
+            device_ids,
+            shared_host=job is not None and job.parallel_jobs > 1,
+        )
+        + [PrometheusCollector(backend_type, [get_metrics_url(base_url) for base_url in base_urls])]
+    )
+    sampler.start()
     
     try:
         # Start the backend server
-        started, docker_command = backend_runner.run(model, backend_type, hardware_type, no_weights)
+        pinned_image = job.image.pinned_image if job is not None and job.image is not None else None
+        with ThreadPoolExecutor(max_workers=max(len(instance_runners), 1)) as executor:
+            instance_starts = [
+                executor.submit(
+                    contextvars.copy_context().run, runner.run, model, backend_type, hardware_type, no_weights, pinned_image
+                )
+                for runner in instance_runners
+            ]
+            started, docker_command = backend_runner.run(model, backend_type, hardware_type, no_weights, pinned_image)
+            instances_started = all(future.result()[0] for future in instance_starts)
+        if started and not instances_started:
+            backend_runner.failure_reason = next((runner.failure_reason for runner in instance_runners if runner.failure_reason), "run_error")
+            started = False
         
         if started:
             # Try the requests - this will try chat first, then completion if chat fails
-            backend_working = test_backend_working(model, backend_type)
+            backend_working = all(test_backend_working(model, backend_type, base_url) for base_url in base_urls)
             
-            if backend_working:
+            if not backend_working:
+                backend_runner.failure_reason = "request_failed"
+            else:
                 can_serve_single_request = True
+                # Measure latency and throughput under load once we know the backend answers
+                served_model_id = get_served_model_id(model, backend_type)
+                # The closed loop load is split over processes on the cpus left to the client, reused by every level
+                load_cpus = get_load_generator_cpus(job.resources if job is not None else None, hardware_type)
+                with LoadWorkerPool(options.load_workers or get_load_workers(load_cpus), load_cpus) as load_pool:
+                    sweep_started = time.monotonic()
+                    concurrency_results = run_concurrency_sweep(served_model_id, options.concurrency_levels, base_urls, pool=load_pool)
+                    sampler.sample()
+                    sweep_telemetry = sampler.summarize(sweep_started)
+                    server_series = sampler.server_series(sweep_started)
+                    for concurrency_result in concurrency_results:
+                        concurrency_result.server = sampler.summarize(concurrency_result.started_at, concurrency_result.ended_at).server
+                    if options.request_rates:
+                        rate_sweep = run_rate_sweep(served_model_id, options.request_rates, base_url=base_urls)
+                    goodput = find_max_goodput(served_model_id, options.slo, base_urls, pool=load_pool)
+                if options.workload_matrix:
+                    # Requests of a cell run one at a time, a single instance is enough
+                    workload_results = run_workload_matrix(model.hf_model_id, served_model_id, backend_type, base_url=base_urls[0])
+                    logger.info(f"\n{format_workload_matrix(workload_results, 'ttft_p50_s')}")
+                    logger.info(f"\n{format_workload_matrix(workload_results, 'decode_tokens_per_second')}")
     finally:
         # Only stop the backend after all attempts are done
+        sampler.stop()
         backend_runner.stop()
+        for runner in instance_runners:
+            runner.stop()
+    
+    if can_serve_single_request and backend_type != SIMULATED_BACKEND and (options.cold_start_trials or options.warm_start_trials):
+        # Startup trials run their own containers, once the benchmarked one is removed
+        startup = run_startup_benchmark(
+            model,
+            backend_type,
+            hardware_type,
+            pinned_image or get_backend_image(backend_type, hardware_type),
+            options.cold_start_trials,
+            options.warm_start_trials,
+            no_weights,
+            backend_runner.container_name,
+            backend_runner.host_port,
+            backend_runner.resources,
+            backend_runner.docker_client,
+            backend_runner.log_path,
+        )
+    
+    startup_phases = get_startup_phases(backend_runner.startup_times)
+    telemetry = sampler.summarize()
+    sweep_output_tokens = sum(r.output_tokens for r in concurrency_results)
+    streaming_metrics = summarize_streaming([request for r in concurrency_results for request in r.requests])
         
     return LeaderboardData(
         model_id=model.hf_model_id,
         backend_type=backend_type,
         can_serve_single_request=can_serve_single_request,
+        num_instances=len(base_urls),
+        time_to_ready_s=backend_runner.time_to_ready_s,
+        weight_load_s=startup_phases["weight_load_s"],
+        warmup_s=startup_phases["warmup_s"],
+        kv_cache_tokens=backend_runner.log_capture.kv_cache_tokens if backend_runner.log_capture else None,
+        failure_reason=backend_runner.failure_reason,
+        **(job.memory_estimate.to_columns() if job is not None and job.memory_estimate is not None else {}),
+        peak_memory_bytes=telemetry.peak_memory_bytes,
+        mean_cpu_cores=telemetry.mean_cpu_cores,
+        io_read_bytes=telemetry.io_read_bytes,
+        io_write_bytes=telemetry.io_write_bytes,
+        mean_accelerator_utilization=telemetry.mean_accelerator_utilization,
+        peak_accelerator_memory_bytes=telemetry.peak_accelerator_memory_bytes,
+        energy_joules=telemetry.energy_joules,
+        joules_per_output_token=(
+            sweep_telemetry.energy_joules / sweep_output_tokens
+            if sweep_telemetry is not None and sweep_telemetry.energy_joules is not None and sweep_output_tokens
+            else None
+        ),
+        **(sweep_telemetry.server.to_columns() if sweep_telemetry is not None and sweep_telemetry.server else {}),
+        server_metrics_series=server_series or None,
+        image_pull_time_s=job.image.pull_time_s if job is not None and job.image is not None else None,
+        image_digest=job.image.digest if job is not None and job.image is not None else None,
+        model_cache_hit=job.cached_model.hit if job is not None and job.cached_model is not None else None,
+        model_download_time_s=job.cached_model.download_time_s if job is not None and job.cached_model is not None else None,
+        single_request_latency_s=next((r.mean_latency_s for r in concurrency_results if r.concurrency == 1), None),
+        max_output_tokens_per_second=max((r.output_tokens_per_second for r in concurrency_results), default=None),
+        max_requests_per_second=max((r.requests_per_second for r in concurrency_results), default=None),
+        concurrency_results=concurrency_results or None,
+        load_workers=max((r.load_workers for r in concurrency_results), default=None),
+        client_saturated=any(r.client_saturated for r in concurrency_results) if concurrency_results else None,
+        **(streaming_metrics.model_dump() if streaming_metrics else {}),
+        saturation_request_rate=rate_sweep.saturation_request_rate if rate_sweep else None,
+        rate_results=rate_sweep.points if rate_sweep else None,
+        goodput_concurrency=goodput.goodput_concurrency if goodput else None,
+        goodput_output_tokens_per_second=goodput.goodput_output_tokens_per_second if goodput else None,
+        goodput_requests_per_second=goodput.goodput_requests_per_second if goodput else None,
+        slo_ttft_p95_s=goodput.slo.ttft_p95_s if goodput else None,
+        slo_itl_p95_s=goodput.slo.itl_p95_s if goodput else None,
+        workload_matrix=workload_results or None,
+        **(startup.to_columns() if startup else {}),
         hardware_type=hardware_type,
         machine=machine,
+        **get_hardware_profile().to_columns(),
         benchmark_time=datetime.now(),
         docker_command=docker_command
     )
@@ -0,0 +1,211 @@
+import functools
+import glob
+import subprocess
+from typing import Optional
+import torch
+from loguru import logger
+from pydantic import BaseModel
+from transformers import AutoConfig, PretrainedConfig
+
+from backend.backend_types import SIMULATED_BACKEND
+from backend.resources import CPU_HARDWARE_TYPES
+from hardware.hardware_inventory import read_meminfo_bytes, read_text
+from model.get_models import Model
+from model.weights import get_tensor_size, get_tensor_specs
+
+# Share of the memory the backends allocate, vLLM defaults to 90 % of the device memory
+MEMORY_UTILIZATION = 0.9
+# CUDA context, allocator fragmentation and runtime buffers
+RUNTIME_OVERHEAD_BYTES = 1024**3
+# The KV cache must at least hold one request of this many tokens, or the whole context if shorter
+MIN_KV_CACHE_TOKENS = 4096
+# Tokens processed in a single forward pass during prefill, vLLM and TGI chunk prefills around this size
+PREFILL_TOKENS = 8192
+# Sequences sampled in a single decode step, their logits are kept in fp32
+MAX_BATCH_SEQUENCES = 256
+# Average bits per weight of the GGUF quantization types, llama.cpp keeps its KV cache in f16
+GGUF_BITS_PER_WEIGHT = {
+    "F32": 32.0,
+    "F16": 16.0,
+    "BF16": 16.0,
+    "Q8_0": 8.5,
+    "Q6_K": 6.56,
+    "Q5_K_M": 5.69,
+    "Q5_K_S": 5.54,
+    "Q4_K_M": 4.85,
+    "Q4_K_S": 4.58,
+    "Q4_0": 4.55,
+    "Q3_K_M": 3.91,
+    "Q2_K": 3.35,
+}
+# Backends which shard the model over every visible device by default, the others run on a single device
+SHARDING_BACKENDS = {"tgi"}
+
+
+class MemoryEstimate(BaseModel):
+    parameter_bytes: int
+    kv_cache_bytes_per_token: int
+    activation_bytes: int
+    # Parameters, activations, runtime overhead and a KV cache for MIN_KV_CACHE_TOKENS tokens
+    required_bytes: int
+    # None if the memory of the hardware cannot be detected
+    available_bytes: Optional[int] = None
+
+    @property
+    def oom_predicted(self) -> bool:
+        return self.available_bytes is not None and self.required_bytes > self.available_bytes
+
+    def to_columns(self) -> dict:
+        return {
+            "estimated_parameter_bytes": self.parameter_bytes,
+            "estimated_kv_cache_bytes_per_token": self.kv_cache_bytes_per_token,
+            "estimated_memory_bytes": self.required_bytes,
+            "available_memory_bytes": self.available_bytes,
+            "oom_predicted": self.oom_predicted,
+        }
+
+
+@functools.lru_cache(maxsize=None)
+def load_config(model_id: str) -> PretrainedConfig:
+    return AutoConfig.from_pretrained(model_id)
+
+
+@functools.lru_cache(maxsize=None)
+def get_parameter_layout(model_id: str) -> tuple[int, int]:
+    """
+    Get the number of parameters and their size in bytes in the checkpoint dtype.
+    """
+    tensors = get_tensor_specs(load_config(model_id))
+    num_parameters = sum(torch.Size(shape).numel() for _, shape, _ in tensors)
+    return num_parameters, sum(get_tensor_size(shape, dtype) for _, shape, dtype in tensors)
+
+
+def get_text_config(config: PretrainedConfig) -> PretrainedConfig:
+    # Multimodal configs nest the language model config
+    return config.get_text_config() if hasattr(config, "get_text_config") else config
+
+
+def get_kv_cache_bytes_per_token(config: PretrainedConfig, dtype_bytes: int) -> int:
+    """
+    Get the KV cache size of one token: a key and a value per layer and KV head.
+    """
+    text_config = get_text_config(config)
+    num_attention_heads = text_config.num_attention_heads
+    num_kv_heads = getattr(text_config, "num_key_value_heads", None) or num_attention_heads
+    head_dim = getattr(text_config, "head_dim", None) or text_config.hidden_size // num_attention_heads
+    return 2 * text_config.num_hidden_layers * num_kv_heads * head_dim * dtype_bytes
+
+
+def get_activation_bytes(config: PretrainedConfig, dtype_bytes: int) -> int:
+    """
+    Estimate the peak activation memory of a forward pass: the hidden states, attention projections and
+    MLP intermediate states of a prefill chunk, plus the fp32 logits of a decode batch.
+    """
+    text_config = get_text_config(config)
+    hidden_size = text_config.hidden_size
+    intermediate_size = getattr(text_config, "intermediate_size", None) or 4 * hidden_size
+    per_token = (4 * hidden_size + 2 * intermediate_size) * dtype_bytes
+    logits = MAX_BATCH_SEQUENCES * text_config.vocab_size * 4
+    return PREFILL_TOKENS * per_token + logits
+
+
+def get_gguf_quantization(gguf_model_id: str) -> Optional[str]:
+    """Get the quantization type of a llama.cpp model reference, for example "repo/model-GGUF:Q8_0" -> "Q8_0"."""
+    _, separator, quantization = gguf_model_id.rpartition(":")
+    return quantization.upper() if separator and quantization else None
+
+
+def get_device_memory_bytes(hardware_type: str) -> Optional[list[int]]:
+    """
+    Get the memory of each accelerator device, None if it cannot be detected.
+    """
+    if hardware_type == "cuda":
+        try:
+            output = subprocess.check_output(
+                ["nvidia-smi", "--query-gpu=memory.total", "--format=csv,noheader,nounits"], stderr=subprocess.DEVNULL
+            ).decode("utf-8")
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        return [int(line.strip()) * 1024 * 1024 for line in output.splitlines() if line.strip()]
+    if hardware_type == "rocm":
+        # The amdgpu driver exposes the VRAM size of each card, connectors such as card0-DP-1 have none
+        vram_sizes = [
+            read_text(path)
+            for path in sorted(glob.glob("/sys/class/drm/card[0-9]*/device/mem_info_vram_total"))
+            if "-" not in path.split("/")[4]
+        ]
+        return [int(vram) for vram in vram_sizes if vram] or None
+    return None
+
+
+def get_available_memory(hardware_type: str, backend_type: str, device_ids: Optional[list[str]] = None) -> Optional[int]:
+    """
+    Get the memory a backend can use: the usable device memory of the devices it runs on,
+    or the available host memory on CPU.
+    """
+    if hardware_type in CPU_HARDWARE_TYPES:
+        return read_meminfo_bytes(read_text("/proc/meminfo") or "", "MemAvailable")
+
+    device_memories = get_device_memory_bytes(hardware_type)
+    if not device_memories:
+        return None
+    if device_ids is not None:
+        device_memories = [memory for index, memory in enumerate(device_memories) if str(index) in device_ids]
+    if backend_type not in SHARDING_BACKENDS:
+        device_memories = device_memories[:1]
+    return int(sum(device_memories) * MEMORY_UTILIZATION)
+
+
+def estimate_memory(
+    model: Model, backend_type: str, hardware_type: str, device_ids: Optional[list[str]] = None
+) -> Optional[MemoryEstimate]:
+    """
+    Estimate the memory a backend needs to serve a model, from the model config only.
+
+    Args:
+        model (Model): The model to serve
+        backend_type (str): The backend type, llama.cpp serves quantized GGUF weights
+        hardware_type (str): The hardware type, to get the available memory
+        device_ids (list[str], optional): The devices the backend runs on. Defaults to every device.
+
+    Returns:
+        MemoryEstimate: The estimate, None if the model config cannot be loaded or understood
+    """
+    if backend_type == SIMULATED_BACKEND:
+        # The simulated backend holds no weights
+        return None
+    try:
+        config = load_config(model.hf_model_id)
+        num_parameters, parameter_bytes = get_parameter_layout(model.hf_model_id)
+    except Exception as e:
+        logger.warning(f"Cannot estimate the memory of {model.hf_model_id}: {str(e)}")
+        return None
+
+    dtype_bytes = parameter_bytes // max(num_parameters, 1)
+    if backend_type == "llama_cpp":
+        bits_per_weight = GGUF_BITS_PER_WEIGHT.get(get_gguf_quantization(model.gguf_hf_model_id) or "")
+        if bits_per_weight is None:
+            return None
+        parameter_bytes = int(num_parameters * bits_per_weight / 8)
+        dtype_bytes = 2
+
+    try:
+        kv_cache_bytes_per_token = get_kv_cache_bytes_per_token(config, dtype_bytes)
+        activation_bytes = get_activation_bytes(config, dtype_bytes)
+    except AttributeError as e:
+        logger.warning(f"Cannot estimate the memory of {model.hf_model_id}: {str(e)}")
+        return None
+
+    max_context = getattr(get_text_config(config), "max_position_embeddings", None) or MIN_KV_CACHE_TOKENS
+    return MemoryEstimate(
+        parameter_bytes=parameter_bytes,
+        kv_cache_bytes_per_token=kv_cache_bytes_per_token,
+        activation_bytes=activation_bytes,
+        required_bytes=(
+            parameter_bytes
+            + kv_cache_bytes_per_token * min(max_context, MIN_KV_CACHE_TOKENS)
+            + activation_bytes
+            + RUNTIME_OVERHEAD_BYTES
+        ),
+        available_bytes=get_available_memory(hardware_type, backend_type, device_ids),
+    )
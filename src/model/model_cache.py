@@ -0,0 +1,274 @@
+import fnmatch
+import json
+import math
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+from loguru import logger
+from pydantic import BaseModel
+from huggingface_hub import snapshot_download
+from huggingface_hub.constants import HF_HUB_CACHE
+from huggingface_hub.file_download import repo_folder_name
+
+from model.weights import MODEL_FILES
+
+# Mounted by the backend templates as the hub cache of their container, /data for TGI and ~/.cache/huggingface/hub for vLLM
+MODEL_CACHE_DIR = os.environ.get("MODEL_CACHE_DIR", HF_HUB_CACHE)
+# Models downloaded by the cache, with their size and last use, the other models of the hub cache are never evicted
+MANIFEST_FILE = "benchmark_model_cache.json"
+# Only the safetensors weights are downloaded, repositories often also have .bin or original checkpoints
+SNAPSHOT_PATTERNS = MODEL_FILES + ["*.safetensors", "*.safetensors.index.json"]
+# Models downloaded ahead of the running job, each takes disk space until its job runs
+PREFETCH_AHEAD = 1
+# Downloads run one after the other so they do not compete for bandwidth with each other
+MAX_PARALLEL_DOWNLOADS = 1
+
+# (repo_id, cache_dir, allow_patterns) -> snapshot directory, huggingface_hub.snapshot_download by default
+SnapshotFn = Callable[..., str]
+
+
+class CachedModel(BaseModel):
+    model_id: str
+    # Whether the snapshot was already in the cache before the run needed it
+    hit: bool
+    download_time_s: Optional[float] = None
+    size_bytes: Optional[int] = None
+    error: Optional[str] = None
+
+
+class CacheEntry(BaseModel):
+    size_bytes: int
+    last_used: float
+
+
+def get_directory_size(path: str) -> int:
+    """Get the size of the files of a directory, the symlinks of the hub cache snapshots are not counted twice."""
+    size = 0
+    for directory, _, files in os.walk(path):
+        for file in files:
+            file_path = os.path.join(directory, file)
+            if not os.path.islink(file_path):
+                size += os.path.getsize(file_path)
+    return size
+
+
+class LocalHub:
+    """
+    A hub stand-in serving repositories from a local directory, <hub_dir>/<org>/<name>/<files>,
+    to run the cache without network access.
+
+    Usage:
+        cache = ModelCache(cache_dir, snapshot_fn=LocalHub(hub_dir).snapshot_download)
+    """
+
+    def __init__(self, hub_dir: str):
+        self.hub_dir = hub_dir
+
+    def snapshot_download(self, repo_id: str, cache_dir: str, allow_patterns: Optional[list[str]] = None) -> str:
+        repo_dir = os.path.join(self.hub_dir, repo_id)
+        if not os.path.isdir(repo_dir):
+            raise FileNotFoundError(f"Repository {repo_id} not found in {self.hub_dir}")
+        snapshot_dir = os.path.join(cache_dir, repo_folder_name(repo_id=repo_id, repo_type="model"), "snapshots", "local")
+        for directory, _, files in os.walk(repo_dir):
+            for file in files:
+                relative_path = os.path.relpath(os.path.join(directory, file), repo_dir)
+                if allow_patterns is not None and not any(fnmatch.fnmatch(relative_path, pattern) for pattern in allow_patterns):
+                    continue
+                os.makedirs(os.path.dirname(os.path.join(snapshot_dir, relative_path)), exist_ok=True)
+                shutil.copyfile(os.path.join(directory, file), os.path.join(snapshot_dir, relative_path))
+        return snapshot_dir
+
+
+class ModelCache:
+    """
+    Download the model snapshots of the job plan in the background, so downloads overlap with the running benchmarks,
+    and keep the cache under a disk budget.
+    When a download needs room, the models no longer in the plan are evicted least recently used first,
+    then the models needed furthest in the plan, never the models in use.
+
+    Usage:
+        cache = ModelCache(budget_bytes=500 * 1024**3)
+        cache.plan(["meta-llama/Llama-3.2-1B-Instruct", ...])
+        cached_model = cache.wait("meta-llama/Llama-3.2-1B-Instruct")
+        ...
+        cache.release("meta-llama/Llama-3.2-1B-Instruct")
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = MODEL_CACHE_DIR,
+        budget_bytes: Optional[int] = None,
+        snapshot_fn: SnapshotFn = snapshot_download,
+        prefetch_ahead: int = PREFETCH_AHEAD,
+    ):
+        self.cache_dir = cache_dir
+        self.budget_bytes = budget_bytes
+        self.snapshot_fn = snapshot_fn
+        self.prefetch_ahead = prefetch_ahead
+        self._executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_DOWNLOADS, thread_name_prefix="model-download")
+        self._downloads: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        # Models of the jobs which have not started yet, in job order
+        self._remaining: list[str] = []
+        self._expected_sizes: dict[str, int] = {}
+        self._in_use: dict[str, int] = {}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._entries = self._load_manifest()
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.cache_dir, MANIFEST_FILE)
+
+    def _repo_path(self, model_id: str) -> str:
+        return os.path.join(self.cache_dir, repo_folder_name(repo_id=model_id, repo_type="model"))
+
+    def _load_manifest(self) -> dict[str, CacheEntry]:
+        try:
+            with open(self.manifest_path) as f:
+                entries = {model_id: CacheEntry(**entry) for model_id, entry in json.load(f).items()}
+        except (OSError, ValueError):
+            return {}
+        # Snapshots removed by hand are no longer cached
+        return {model_id: entry for model_id, entry in entries.items() if os.path.isdir(self._repo_path(model_id))}
+
+    def _save_manifest(self):
+        # Written to a temporary file and renamed, an interrupted run keeps the previous manifest
+        temporary_path = f"{self.manifest_path}.tmp"
+        with open(temporary_path, "w") as f:
+            json.dump({model_id: entry.model_dump() for model_id, entry in self._entries.items()}, f, indent=2)
+        os.replace(temporary_path, self.manifest_path)
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(entry.size_bytes for entry in self._entries.values())
+
+    def _evict(self, needed_bytes: int, keep: Optional[str] = None) -> bool:
+        """
+        Evict cached models until needed_bytes more fit in the budget, called with the lock held.
+        The models needed before `keep` are not evicted, a prefetch must not evict the model of an earlier job.
+
+        Returns:
+            bool: Whether needed_bytes more fit in the budget
+        """
+        if self.budget_bytes is None:
+            return True
+
+        def next_use(model_id: str) -> float:
+            return self._remaining.index(model_id) if model_id in self._remaining else math.inf
+
+        keep_next_use = next_use(keep) if keep is not None and not self._in_use.get(keep) else -1
+        candidates = sorted(
+            (
+                model_id
+                for model_id in self._entries
+                if model_id != keep and not self._in_use.get(model_id) and next_use(model_id) > keep_next_use
+            ),
+            key=lambda model_id: (-next_use(model_id), self._entries[model_id].last_used),
+        )
+        for model_id in candidates:
+            if self.size_bytes + needed_bytes <= self.budget_bytes:
+                break
+            logger.info(f"Evicting {model_id} from the model cache ({self._entries[model_id].size_bytes / 1024**3:.1f} GB)")
+            shutil.rmtree(self._repo_path(model_id), ignore_errors=True)
+            del self._entries[model_id]
+            self._save_manifest()
+        return self.size_bytes + needed_bytes <= self.budget_bytes
+
+    def _download(self, model_id: str) -> CachedModel:
+        with self._lock:
+            if model_id in self._entries:
+                self._entries[model_id].last_used = time.time()
+                self._save_manifest()
+                return CachedModel(model_id=model_id, hit=True, size_bytes=self._entries[model_id].size_bytes)
+            if not self._evict(self._expected_sizes.get(model_id, 0), keep=model_id) and not self._in_use.get(model_id):
+                # Downloaded when its job starts instead, once the models of the earlier jobs can be evicted
+                logger.info(f"Not prefetching {model_id}, the model cache has no room for it yet")
+                return CachedModel(model_id=model_id, hit=False)
+
+        logger.info(f"Downloading {model_id} to the model cache")
+        start_time = time.monotonic()
+        try:
+            self.snapshot_fn(model_id, cache_dir=self.cache_dir, allow_patterns=SNAPSHOT_PATTERNS)
+        except Exception as e:
+            logger.error(f"Failed to download {model_id}, the backend will download it: {str(e)}")
+            return CachedModel(model_id=model_id, hit=False, error=str(e))
+        download_time = time.monotonic() - start_time
+
+        size_bytes = get_directory_size(self._repo_path(model_id))
+        logger.info(f"Downloaded {model_id} ({size_bytes / 1024**3:.1f} GB) in {download_time:.1f}s")
+        with self._lock:
+            self._entries[model_id] = CacheEntry(size_bytes=size_bytes, last_used=time.time())
+            self._save_manifest()
+            # The expected size is only an estimate, make room for the real one
+            if not self._evict(0, keep=model_id):
+                logger.warning(f"The model cache is over its budget of {self.budget_bytes / 1024**3:.1f} GB, the models in use or needed next are kept")
+        return CachedModel(model_id=model_id, hit=False, download_time_s=download_time, size_bytes=size_bytes)
+
+    def _prefetch(self, model_ids: list[str]):
+        """Queue downloads, called with the lock held, models already queued are ignored."""
+        for model_id in model_ids:
+            if model_id not in self._downloads:
+                self._downloads[model_id] = self._executor.submit(self._download, model_id)
+
+    def _upcoming(self) -> list[str]:
+        upcoming: list[str] = []
+        for model_id in self._remaining:
+            if model_id not in upcoming:
+                upcoming.append(model_id)
+        return upcoming[: self.prefetch_ahead + 1]
+
+    def plan(self, model_ids: list[str], expected_sizes: Optional[dict[str, int]] = None):
+        """
+        Set the models of the jobs in run order and start downloading the first ones.
+
+        Args:
+            model_ids (list[str]): The model of each job, in job order
+            expected_sizes (dict[str, int], optional): The expected snapshot size of the models, to make room before downloading
+        """
+        with self._lock:
+            self._remaining = list(model_ids)
+            self._expected_sizes = expected_sizes or {}
+            self._prefetch(self._upcoming())
+
+    def wait(self, model_id: str) -> CachedModel:
+        """
+        Block until a model is in the cache, mark it in use and prefetch the next models of the plan.
+        """
+        with self._lock:
+            if model_id in self._remaining:
+                self._remaining.remove(model_id)
+            self._in_use[model_id] = self._in_use.get(model_id, 0) + 1
+            self._prefetch([model_id])
+            future = self._downloads[model_id]
+        cached_model = future.result()
+        with self._lock:
+            if cached_model.error is None and model_id not in self._entries:
+                # Evicted since it was prefetched, or not prefetched for lack of room, download it now
+                self._downloads.pop(model_id)
+                self._prefetch([model_id])
+                future = self._downloads[model_id]
+        cached_model = future.result()
+        with self._lock:
+            # A later job of the same model finds it in the cache
+            self._downloads.pop(model_id, None)
+            self._prefetch(self._upcoming())
+        return cached_model
+
+    def drop(self, model_id: str):
+        """Remove a job which will not run from the plan, without downloading its model."""
+        with self._lock:
+            if model_id in self._remaining:
+                self._remaining.remove(model_id)
+            self._prefetch(self._upcoming())
+
+    def release(self, model_id: str):
+        """Mark a model no longer in use, and evict it if the cache is over its budget and no later job needs it."""
+        with self._lock:
+            self._in_use[model_id] = max(self._in_use.get(model_id, 0) - 1, 0)
+            self._evict(0)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
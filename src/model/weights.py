@@ -1,49 +1,162 @@
+import json
 import os
 import shutil
+import struct
 import torch
-from transformers import PretrainedConfig
-from safetensors.torch import save_file
+from transformers import AutoConfig, AutoModelForCausalLM, PretrainedConfig
 from loguru import logger
+from huggingface_hub import snapshot_download
 from huggingface_hub.constants import HF_HOME
 from huggingface_hub.file_download import repo_folder_name
 
 NO_WEIGHTS_CACHE_DIR = os.path.join(HF_HOME, "no_weights_models")
+# Where the no weights model directory is mounted in the backend container
+CONTAINER_MODEL_DIR = "/no_weights_model"
+MAX_SHARD_SIZE = 5 * 1024**3
+# Config, generation config and tokenizer files copied from the model repository
+MODEL_FILES = [
+    "config.json",
+    "generation_config.json",
+    "tokenizer.json",
+    "tokenizer_config.json",
+    "tokenizer.model",
+    "special_tokens_map.json",
+    "vocab.json",
+    "merges.txt",
+    "*.jinja",
+]
+SAFETENSORS_DTYPES = {
+    torch.float64: "F64",
+    torch.float32: "F32",
+    torch.float16: "F16",
+    torch.bfloat16: "BF16",
+    torch.int64: "I64",
+    torch.int32: "I32",
+    torch.int8: "I8",
+    torch.uint8: "U8",
+    torch.bool: "BOOL",
+}
 
 if os.getenv("CLEAN_CACHE_DIR", "0") == "1" and os.path.exists(NO_WEIGHTS_CACHE_DIR):
     shutil.rmtree(NO_WEIGHTS_CACHE_DIR)
 
 
-def download_no_weights_model(model_id: str):
-    # Create base no_weights directory
-    os.makedirs(NO_WEIGHTS_CACHE_DIR, exist_ok=True)
+def get_no_weights_model_path(model_id: str) -> str:
+    return os.path.join(NO_WEIGHTS_CACHE_DIR, repo_folder_name(repo_id=model_id, repo_type="model"))
 
-    model_folder_name = repo_folder_name(repo_id=model_id, repo_type="model")
-    model_folder_path = os.path.join(HF_HOME, model_folder_name)
-    no_weights_model_path = os.path.join(NO_WEIGHTS_CACHE_DIR, model_folder_name)
 
-    # if the model is already in the no_weights_models set or if the model is already downloaded, do nothing
-    if os.path.exists(no_weights_model_path):
-        return
+def get_tensor_size(shape: list[int], dtype: torch.dtype) -> int:
+    return torch.Size(shape).numel() * dtype.itemsize
 
-    if os.path.exists(model_folder_path):
-        os.symlink(model_folder_path, no_weights_model_path)
-        return
+
+def get_tensor_specs(config: PretrainedConfig) -> list[tuple[str, list[int], torch.dtype]]:
+    """
+    Get the (name, shape, dtype) of every tensor of the model checkpoint, by building the model on the meta device.
+    Tied weights are only listed once, like in the real checkpoints.
+    """
+    dtype = getattr(config, "dtype", None) or getattr(config, "torch_dtype", None) or torch.bfloat16
+    if isinstance(dtype, str):
+        dtype = getattr(torch, dtype)
+
+    with torch.device("meta"):
+        model = AutoModelForCausalLM.from_config(config, dtype=dtype)
+
+    # named_parameters skips the parameters shared with an earlier one, the state dict only has persistent buffers
+    state_dict_names = set(model.state_dict().keys())
+    tensors = [(name, list(parameter.shape), parameter.dtype) for name, parameter in model.named_parameters()]
+    tensors += [
+        (name, list(buffer.shape), buffer.dtype)
+        for name, buffer in model.named_buffers()
+        if name in state_dict_names
+    ]
+    return tensors
+
+
+def write_sparse_safetensors(path: str, tensors: list[tuple[str, list[int], torch.dtype]]):
+    """
+    Write a safetensors file whose tensors are all zeros without writing their data: the data section
+    is a hole in a sparse file, so the file has its real size but takes no disk space.
+    """
+    header: dict = {"__metadata__": {"format": "pt"}}
+    offset = 0
+    for name, shape, dtype in tensors:
+        size = get_tensor_size(shape, dtype)
+        header[name] = {"dtype": SAFETENSORS_DTYPES[dtype], "shape": shape, "data_offsets": [offset, offset + size]}
+        offset += size
+
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    # The data section is 8 bytes aligned, the header is padded with spaces
+    header_bytes += b" " * (-len(header_bytes) % 8)
+    with open(path, "wb") as f:
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        f.truncate(8 + len(header_bytes) + offset)
+
+
+def shard_tensors(
+    tensors: list[tuple[str, list[int], torch.dtype]], max_shard_size: int = MAX_SHARD_SIZE
+) -> list[list[tuple[str, list[int], torch.dtype]]]:
+    """Split the tensors in shards of at most max_shard_size bytes, in checkpoint order."""
+    shards: list[list] = [[]]
+    shard_size = 0
+    for tensor in tensors:
+        _, shape, dtype = tensor
+        size = get_tensor_size(shape, dtype)
+        if shards[-1] and shard_size + size > max_shard_size:
+            shards.append([])
+            shard_size = 0
+        shards[-1].append(tensor)
+        shard_size += size
+    return shards
+
+
+def download_no_weights_model(model_id: str) -> str:
+    """
+    Create a checkpoint of the model with its real tensor names, shapes and dtypes but no weights,
+    so backends load it like the real one without downloading the weights.
+    The shards are sparse files, a 70B model takes seconds to create and almost no disk space.
+    The config and tokenizer are downloaded from the model repository so the backends can start offline.
+
+    Args:
+        model_id (str): The model repository, for example "meta-llama/Llama-3.1-8B-Instruct"
+
+    Returns:
+        str: The directory of the checkpoint, to mount in the backend container
+    """
+    no_weights_model_path = get_no_weights_model_path(model_id)
+    index_path = os.path.join(no_weights_model_path, "model.safetensors.index.json")
+    # The index is written last, its presence means the checkpoint is complete
+    if os.path.exists(index_path):
+        return no_weights_model_path
+
+    os.makedirs(no_weights_model_path, exist_ok=True)
+    logger.info(f"Downloading the config and tokenizer of {model_id}")
+    snapshot_download(model_id, allow_patterns=MODEL_FILES, local_dir=no_weights_model_path)
 
     try:
-        pretrained_config = PretrainedConfig.from_pretrained(model_id)
+        config = AutoConfig.from_pretrained(no_weights_model_path)
     except Exception as e:
         raise ValueError(f"Failed to load config from {model_id}: {str(e)}")
+    if getattr(config, "quantization_config", None) is not None:
+        raise ValueError(f"No weights mode does not support quantized models such as {model_id}")
 
-    # Create and save dummy state dict, this is our dummy state to replace the weights download
-    state_dict = torch.nn.Linear(1, 1).state_dict()
+    try:
+        tensors = get_tensor_specs(config)
+    except Exception as e:
+        raise ValueError(f"Failed to build the tensor layout of {model_id}: {str(e)}")
 
-    # Create the model directory before saving files
-    os.makedirs(no_weights_model_path, exist_ok=True)
+    shards = shard_tensors(tensors)
+    weight_map: dict[str, str] = {}
+    total_size = 0
+    for index, shard in enumerate(shards, 1):
+        shard_name = f"model-{index:05d}-of-{len(shards):05d}.safetensors"
+        write_sparse_safetensors(os.path.join(no_weights_model_path, shard_name), shard)
+        for name, shape, dtype in shard:
+            weight_map[name] = shard_name
+            total_size += get_tensor_size(shape, dtype)
 
-    # Save safetensors file
-    safetensors_path = os.path.join(no_weights_model_path, "model.safetensors")
-    save_file(tensors=state_dict, filename=safetensors_path, metadata={"format": "pt"})
+    with open(index_path, "w") as f:
+        json.dump({"metadata": {"total_size": total_size}, "weight_map": weight_map}, f, indent=2)
 
-    # Save config
-    logger.info("Saving model config")
-    pretrained_config.save_pretrained(save_directory=no_weights_model_path)
+    logger.info(f"Created a {total_size / 1024**3:.1f} GB no weights checkpoint of {model_id} in {len(shards)} shards")
+    return no_weights_model_path
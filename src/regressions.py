@@ -0,0 +1,58 @@
+import json
+from typing import Optional
+import typer
+from loguru import logger
+from rich.console import Console
+
+from dataset.leaderboard_dataset import DATASET_NAME
+from dataset.regression import (
+    BASELINE_WINDOW_DAYS,
+    MIN_BASELINE_RUNS,
+    RELATIVE_THRESHOLD,
+    Z_THRESHOLD,
+    detect_regressions,
+    format_report,
+)
+from dataset.result_publisher import HubPublisher, LocalPublisher, read_results
+
+console = Console()
+app = typer.Typer()
+
+
+@app.command()
+def check_regressions(
+    publish_dir: Optional[str] = None,
+    hardware_type: Optional[str] = None,
+    machine: Optional[str] = None,
+    window_days: float = BASELINE_WINDOW_DAYS,
+    min_baseline_runs: int = MIN_BASELINE_RUNS,
+    relative_threshold: float = RELATIVE_THRESHOLD,
+    z_threshold: float = Z_THRESHOLD,
+    output: Optional[str] = None,
+):
+    """
+    Check the latest results of each model, backend, hardware type and machine against their history, exits with 1 on a regression.
+    Args:
+        publish_dir (Optional[str], optional): Read the results published in this directory instead of the hub repository. Defaults to None.
+        hardware_type (Optional[str], optional): Only check this hardware type. Defaults to all.
+        machine (Optional[str], optional): Only check this machine. Defaults to all.
+        window_days (float, optional): Days of runs before the latest one making up the baseline. Defaults to 28.
+        min_baseline_runs (int, optional): Metrics with fewer baseline runs are not compared. Defaults to 3.
+        relative_threshold (float, optional): Relative worsening from the baseline median flagged as a regression. Defaults to 0.1.
+        z_threshold (float, optional): Robust z-score (median absolute deviations) a regression must also exceed. Defaults to 3.
+        output (Optional[str], optional): Write the verdict and the full report as JSON to this file. Defaults to None.
+    """
+    publisher = LocalPublisher(publish_dir) if publish_dir else HubPublisher(DATASET_NAME)
+    history = read_results(publisher, hardware_type, machine)
+    logger.info(f"Read {len(history)} results")
+    report = detect_regressions(history, window_days, min_baseline_runs, relative_threshold, z_threshold)
+    console.print(format_report(report))
+
+    if output:
+        with open(output, "w") as f:
+            json.dump({**report.verdict(), "report": report.model_dump(mode="json")}, f, indent=2)
+    raise typer.Exit(code=1 if report.failed else 0)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,183 @@
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+from loguru import logger
+from pydantic import BaseModel, Field
+
+from backend.docker_client import DockerClient, DockerError
+from backend.images import PulledImage
+from backend.resources import PortAllocator, ResourceSlice, get_resource_slices, split_by_numa_node
+from backend.run_backend import BENCHMARKING_CONTAINER_NAME
+from dataset.leaderboard_dataset import LeaderboardData
+from model.get_models import Model
+from model.memory_estimator import MemoryEstimate
+from model.model_cache import CachedModel
+
+JOB_LOG_DIR = os.environ.get("JOB_LOG_DIR", "benchmark_logs")
+# Failure reason of a job which raised, the other jobs keep running
+JOB_ERROR = "job_error"
+
+
+class BackendInstance(BaseModel):
+    """
+    One of the backend instances of a job in multi instance mode, each pinned to its own NUMA node.
+    """
+    container_name: str
+    host_port: int
+    resources: ResourceSlice
+
+    @property
+    def base_url(self) -> str:
+        return f"http://localhost:{self.host_port}/v1"
+
+
+class BenchmarkJob(BaseModel):
+    job_id: str
+    model: Model
+    backend_type: str
+    hardware_type: str
+    container_name: str
+    # Set by the preflight, None if the memory of the model or hardware is unknown
+    memory_estimate: Optional[MemoryEstimate] = None
+    # Assigned when the job starts
+    host_port: Optional[int] = None
+    resources: Optional[ResourceSlice] = None
+    # Jobs the scheduler may run at the same time as this one, host wide measurements are shared between them
+    parallel_jobs: int = 1
+    image: Optional[PulledImage] = None
+    cached_model: Optional[CachedModel] = None
+    # Only set in multi instance mode, the first instance uses the job container name, port and NUMA node
+    instances: list[BackendInstance] = Field(default_factory=list)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://localhost:{self.host_port}/v1"
+
+    @property
+    def base_urls(self) -> list[str]:
+        """The base urls the load is spread over, one per instance."""
+        return [instance.base_url for instance in self.instances] or [self.base_url]
+
+
+def create_jobs(models: list[Model], backend_types: list[str], hardware_type: str) -> list[BenchmarkJob]:
+    """
+    Create one job per (model, backend) combination, each with its own container name.
+    """
+    jobs: list[BenchmarkJob] = []
+    for model in models:
+        for backend_type in backend_types:
+            job_id = f"{len(jobs):03d}-{model.name}-{backend_type}".lower()
+            jobs.append(
+                BenchmarkJob(
+                    job_id=job_id,
+                    model=model,
+                    backend_type=backend_type,
+                    hardware_type=hardware_type,
+                    container_name=f"{BENCHMARKING_CONTAINER_NAME}-{job_id}",
+                )
+            )
+    return jobs
+
+
+def remove_stale_containers(docker_client: DockerClient):
+    """
+    Remove benchmarking containers left over by an interrupted run.
+    """
+    for container in docker_client.list_containers({"name": [BENCHMARKING_CONTAINER_NAME]}):
+        logger.info(f"Removing leftover container {container['Names']}")
+        try:
+            docker_client.remove_container(container["Id"], force=True)
+        except DockerError as e:
+            logger.error(f"Failed to remove leftover container: {str(e)}")
+
+
+class JobScheduler:
+    """
+    Run benchmark jobs on a pool of workers, each job gets a free host port and one of the
+    resource slices of the machine for the duration of its run, and logs to its own file.
+    In multi instance mode, a job runs one backend instance per NUMA node of its slice.
+    """
+
+    def __init__(self, hardware_type: str, workers: int = 1, log_dir: str = JOB_LOG_DIR, multi_instance: bool = False):
+        self.resource_slices = get_resource_slices(hardware_type, workers)
+        self.workers = len(self.resource_slices)
+        self.log_dir = log_dir
+        self.multi_instance = multi_instance
+        self.port_allocator = PortAllocator()
+        self._free_slices: queue.Queue[ResourceSlice] = queue.Queue()
+        for resource_slice in self.resource_slices:
+            self._free_slices.put(resource_slice)
+
+    def _run_job(
+        self,
+        job: BenchmarkJob,
+        run_job: Callable[[BenchmarkJob], LeaderboardData],
+        should_skip: Optional[Callable[[BenchmarkJob], bool]],
+        on_error: Optional[Callable[[BenchmarkJob, Exception], LeaderboardData]],
+    ) -> Optional[LeaderboardData]:
+        if should_skip is not None and should_skip(job):
+            logger.info(f"Skipping job {job.job_id}")
+            return None
+
+        job.resources = self._free_slices.get()
+        job.parallel_jobs = self.workers
+        job.host_port = self.port_allocator.allocate()
+        if self.multi_instance:
+            job.instances = [
+                BackendInstance(
+                    container_name=job.container_name if index == 0 else f"{job.container_name}-{index}",
+                    host_port=job.host_port if index == 0 else self.port_allocator.allocate(),
+                    resources=instance_resources,
+                )
+                for index, instance_resources in enumerate(split_by_numa_node(job.resources))
+            ]
+        sink_id = logger.add(
+            os.path.join(self.log_dir, f"{job.job_id}.log"),
+            filter=lambda record: record["extra"].get("job_id") == job.job_id,
+        )
+        try:
+            with logger.contextualize(job_id=job.job_id):
+                logger.info(f"Starting job {job.job_id} on port {job.host_port} with {job.resources}")
+                try:
+                    return run_job(job)
+                except Exception as e:
+                    # A job which raises must not take down the jobs running next to it on the other workers
+                    logger.exception(f"Job {job.job_id} failed: {str(e)}")
+                    return on_error(job, e) if on_error is not None else None
+        finally:
+            logger.remove(sink_id)
+            for instance in job.instances[1:]:
+                self.port_allocator.release(instance.host_port)
+            self.port_allocator.release(job.host_port)
+            self._free_slices.put(job.resources)
+
+    def run(
+        self,
+        jobs: list[BenchmarkJob],
+        run_job: Callable[[BenchmarkJob], LeaderboardData],
+        should_skip: Optional[Callable[[BenchmarkJob], bool]] = None,
+        on_error: Optional[Callable[[BenchmarkJob, Exception], LeaderboardData]] = None,
+    ) -> list[LeaderboardData]:
+        """
+        Run the jobs, at most `workers` at a time, and return the results in job order.
+
+        Args:
+            jobs (list[BenchmarkJob]): The jobs to run
+            run_job (Callable): Runs a single job and returns its result
+            should_skip (Callable, optional): Checked right before a job starts, skipped jobs have no result
+            on_error (Callable, optional): Gives the result of a job whose run_job raised. Defaults to no result.
+
+        Returns:
+            list[LeaderboardData]: The results of the jobs which were not skipped
+        """
+        os.makedirs(self.log_dir, exist_ok=True)
+        logger.info(f"Running {len(jobs)} jobs with {self.workers} workers")
+
+        if self.workers == 1:
+            results = [self._run_job(job, run_job, should_skip, on_error) for job in jobs]
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="benchmark-job") as executor:
+                results = list(executor.map(lambda job: self._run_job(job, run_job, should_skip, on_error), jobs))
+
+        return [result for result in results if result is not None]
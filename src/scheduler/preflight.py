@@ -0,0 +1,56 @@
+from typing import Optional
+from loguru import logger
+
+from model.memory_estimator import estimate_memory
+from scheduler.job_scheduler import BenchmarkJob
+
+# Failure reason of the jobs skipped because they would not fit in memory
+OOM_PREDICTED = "oom_predicted"
+
+
+def order_jobs(jobs: list[BenchmarkJob]) -> list[BenchmarkJob]:
+    """
+    Order the jobs largest model first, so the longest jobs do not start last and leave the other workers idle.
+    The backends of a model stay together in their original order, and jobs without an estimate run last.
+    """
+    model_sizes: dict[str, int] = {}
+    for job in jobs:
+        required_bytes = job.memory_estimate.required_bytes if job.memory_estimate is not None else -1
+        model_sizes[job.model.name] = max(model_sizes.get(job.model.name, -1), required_bytes)
+    return sorted(jobs, key=lambda job: -model_sizes[job.model.name])
+
+
+def preflight_jobs(
+    jobs: list[BenchmarkJob], device_ids: Optional[list[str]] = None, run_oom_predicted: bool = False
+) -> tuple[list[BenchmarkJob], list[BenchmarkJob]]:
+    """
+    Estimate the memory of every job before any container starts, and set aside the jobs which would not fit.
+
+    Args:
+        jobs (list[BenchmarkJob]): The jobs to check
+        device_ids (list[str], optional): The devices of a job, the first resource slice. Defaults to every device.
+        run_oom_predicted (bool, optional): Whether to still run the jobs predicted to run out of memory. Defaults to False.
+
+    Returns:
+        tuple[list[BenchmarkJob], list[BenchmarkJob]]: The jobs to run, largest model first, and the jobs predicted to run out of memory
+    """
+    runnable: list[BenchmarkJob] = []
+    oom_predicted: list[BenchmarkJob] = []
+    for job in jobs:
+        job.memory_estimate = estimate_memory(job.model, job.backend_type, job.hardware_type, device_ids)
+        estimate = job.memory_estimate
+        if estimate is None or estimate.available_bytes is None:
+            logger.info(f"No memory estimate for {job.job_id}, running it")
+            runnable.append(job)
+            continue
+
+        logger.info(
+            f"{job.job_id} needs about {estimate.required_bytes / 1024**3:.1f} GB "
+            f"of {estimate.available_bytes / 1024**3:.1f} GB available"
+        )
+        if estimate.oom_predicted and not run_oom_predicted:
+            logger.warning(f"Skipping {job.job_id}, it is predicted to run out of memory")
+            oom_predicted.append(job)
+        else:
+            runnable.append(job)
+    return order_jobs(runnable), oom_predicted
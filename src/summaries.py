@@ -0,0 +1,31 @@
+from typing import Optional
+import typer
+from loguru import logger
+from rich.console import Console
+
+from dataset.aggregates import publish_aggregates
+from dataset.leaderboard_dataset import DATASET_NAME
+from dataset.result_publisher import HubPublisher, LocalPublisher
+
+console = Console()
+app = typer.Typer()
+
+
+@app.command()
+def build_summaries(publish_dir: Optional[str] = None):
+    """
+    Rebuild the leaderboard summaries read by the frontend from every published result.
+    Runs as a single job after the machines published their results, for example once per night.
+    Args:
+        publish_dir (Optional[str], optional): Read and write the results published in this directory instead of the hub repository. Defaults to None.
+    """
+    publisher = LocalPublisher(publish_dir) if publish_dir else HubPublisher(DATASET_NAME)
+    aggregates = publish_aggregates(publisher)
+    if aggregates["hardware"].empty:
+        logger.warning("No published results, the summaries were not written")
+        return
+    console.print(aggregates["hardware"].to_string(index=False))
+
+
+if __name__ == "__main__":
+    app()
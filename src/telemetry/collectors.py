@@ -0,0 +1,232 @@
+import glob
+import os
+import subprocess
+from abc import ABC, abstractmethod
+from typing import Callable, Optional
+from loguru import logger
+
+# Metrics are cumulative counters, differentiated over a window, unless listed as gauges
+CPU_USAGE_USEC = "cpu_usage_usec"
+MEMORY_BYTES = "memory_bytes"
+MEMORY_PEAK_BYTES = "memory_peak_bytes"
+IO_READ_BYTES = "io_read_bytes"
+IO_WRITE_BYTES = "io_write_bytes"
+CPU_ENERGY_J = "cpu_energy_j"
+ACCELERATOR_POWER_W = "accelerator_power_w"
+ACCELERATOR_UTILIZATION = "accelerator_utilization"
+ACCELERATOR_MEMORY_BYTES = "accelerator_memory_bytes"
+GAUGES = {MEMORY_BYTES, MEMORY_PEAK_BYTES, ACCELERATOR_POWER_W, ACCELERATOR_UTILIZATION, ACCELERATOR_MEMORY_BYTES}
+
+
+def read_int(path: str) -> Optional[int]:
+    """Read a file holding a single integer, None if it does not exist or cannot be parsed."""
+    try:
+        with open(path) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def read_keyed_values(path: str) -> dict[str, int]:
+    """Read a flat keyed file such as cpu.stat, one "key value" pair per line."""
+    values: dict[str, int] = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                key, _, value = line.partition(" ")
+                if value.strip().isdigit():
+                    values[key] = int(value)
+    except OSError:
+        pass
+    return values
+
+
+class Collector(ABC):
+    """
+    A source of telemetry samples. Each sample maps metric names to their current value.
+    """
+    name = "collector"
+
+    @abstractmethod
+    def sample(self) -> dict[str, float]: ...
+
+
+class CgroupCollector(Collector):
+    """
+    Read the cpu, memory and io statistics of containers from their cgroup v2 directories, summed over the containers
+    so every instance of a multi instance backend is counted. The container ids are resolved lazily so sampling can
+    start before the containers exist.
+    """
+    name = "cgroup"
+
+    def __init__(self, get_container_ids: Callable[[], list[str]], root: str = "/"):
+        self.get_container_ids = get_container_ids
+        self.cgroup_root = os.path.join(root, "sys/fs/cgroup")
+        self._cgroup_dirs: dict[str, Optional[str]] = {}
+
+    def find_cgroup_dir(self, container_id: str) -> Optional[str]:
+        """Find the cgroup of a container with either the systemd or the cgroupfs docker cgroup driver."""
+        candidates = [
+            os.path.join(self.cgroup_root, "system.slice", f"docker-{container_id}.scope"),
+            os.path.join(self.cgroup_root, "docker", container_id),
+        ]
+        return next((candidate for candidate in candidates if os.path.isdir(candidate)), None)
+
+    def sample(self) -> dict[str, float]:
+        values: dict[str, float] = {}
+        for container_id in self.get_container_ids():
+            # Not cached until found, the cgroup appears a moment after the container id is known
+            if self._cgroup_dirs.get(container_id) is None:
+                self._cgroup_dirs[container_id] = self.find_cgroup_dir(container_id)
+            cgroup_dir = self._cgroup_dirs[container_id]
+            if cgroup_dir is None:
+                continue
+            for key, value in self.read_cgroup(cgroup_dir).items():
+                # The peaks of the containers are summed, an upper bound of the peak of their total
+                values[key] = values.get(key, 0) + value
+        return values
+
+    def read_cgroup(self, cgroup_dir: str) -> dict[str, float]:
+        values: dict[str, float] = {}
+        cpu_stat = read_keyed_values(os.path.join(cgroup_dir, "cpu.stat"))
+        if "usage_usec" in cpu_stat:
+            values[CPU_USAGE_USEC] = cpu_stat["usage_usec"]
+
+        memory_current = read_int(os.path.join(cgroup_dir, "memory.current"))
+        if memory_current is not None:
+            values[MEMORY_BYTES] = memory_current
+        # memory.peak is only available from Linux 5.19
+        memory_peak = read_int(os.path.join(cgroup_dir, "memory.peak"))
+        if memory_peak is not None:
+            values[MEMORY_PEAK_BYTES] = memory_peak
+
+        read_bytes = write_bytes = 0
+        try:
+            with open(os.path.join(cgroup_dir, "io.stat")) as f:
+                # One line per device, for example "8:0 rbytes=1024 wbytes=0 rios=1 wios=0 dbytes=0 dios=0"
+                for line in f:
+                    for field in line.split()[1:]:
+                        key, _, value = field.partition("=")
+                        if key == "rbytes":
+                            read_bytes += int(value)
+                        elif key == "wbytes":
+                            write_bytes += int(value)
+            values[IO_READ_BYTES] = read_bytes
+            values[IO_WRITE_BYTES] = write_bytes
+        except (OSError, ValueError):
+            pass
+        return values
+
+
+class RaplCollector(Collector):
+    """
+    Read the cpu package energy from the RAPL powercap counters, for the whole host.
+    The counters wrap around at max_energy_range_uj, so the energy is accumulated from the deltas.
+    """
+    name = "rapl"
+
+    def __init__(self, root: str = "/"):
+        powercap_dir = os.path.join(root, "sys/class/powercap")
+        # Top level zones are the packages, their sub zones (intel-rapl:0:0) are already counted in them
+        self.zones = sorted(
+            zone for zone in glob.glob(os.path.join(powercap_dir, "intel-rapl:*"))
+            if os.path.basename(zone).count(":") == 1 and os.path.exists(os.path.join(zone, "energy_uj"))
+        )
+        self._last_energy_uj: dict[str, int] = {}
+        self._energy_j = 0.0
+
+    @property
+    def available(self) -> bool:
+        return bool(self.zones)
+
+    def sample(self) -> dict[str, float]:
+        for zone in self.zones:
+            energy_uj = read_int(os.path.join(zone, "energy_uj"))
+            if energy_uj is None:
+                continue
+            last_energy_uj = self._last_energy_uj.get(zone)
+            if last_energy_uj is not None:
+                delta = energy_uj - last_energy_uj
+                if delta < 0:
+                    delta += read_int(os.path.join(zone, "max_energy_range_uj")) or 0
+                self._energy_j += delta / 1e6
+            self._last_energy_uj[zone] = energy_uj
+        return {CPU_ENERGY_J: self._energy_j} if self._last_energy_uj else {}
+
+
+class NvidiaSmiCollector(Collector):
+    """
+    Read the power, utilization and memory of NVIDIA GPUs with nvidia-smi, summed over the devices.
+    """
+    name = "nvidia-smi"
+
+    def __init__(self, device_ids: Optional[list[str]] = None):
+        self.device_ids = device_ids
+
+    def sample(self) -> dict[str, float]:
+        command = ["nvidia-smi", "--query-gpu=power.draw,utilization.gpu,memory.used", "--format=csv,noheader,nounits"]
+        if self.device_ids:
+            command += ["-i", ",".join(self.device_ids)]
+        try:
+            output = subprocess.check_output(command, stderr=subprocess.DEVNULL, timeout=5).decode("utf-8")
+        except (OSError, subprocess.SubprocessError):
+            return {}
+
+        power = utilization = memory = 0.0
+        devices = 0
+        for line in output.splitlines():
+            try:
+                device_power, device_utilization, device_memory = (float(value) for value in line.split(","))
+            except ValueError:
+                # "[N/A]" for devices which do not report a metric
+                continue
+            power += device_power
+            utilization += device_utilization
+            memory += device_memory * 1024 * 1024
+            devices += 1
+        if devices == 0:
+            return {}
+        return {
+            ACCELERATOR_POWER_W: power,
+            ACCELERATOR_UTILIZATION: utilization / devices,
+            ACCELERATOR_MEMORY_BYTES: memory,
+        }
+
+
+# Accelerator collectors by hardware type, each built from the device ids given to the job
+ACCELERATOR_COLLECTORS: dict[str, Callable[[Optional[list[str]]], Collector]] = {
+    "cuda": NvidiaSmiCollector,
+}
+
+
+def create_collectors(
+    get_container_ids: Callable[[], list[str]],
+    hardware_type: str,
+    device_ids: Optional[list[str]] = None,
+    root: str = "/",
+    shared_host: bool = False,
+) -> list[Collector]:
+    """
+    Create the collectors available on this machine for the containers of a backend.
+
+    Args:
+        get_container_ids (Callable): Returns the ids of the containers which exist, one per backend instance
+        hardware_type (str): The hardware type, selecting the accelerator collector
+        device_ids (list[str], optional): The accelerator devices of the container, all of them if not set
+        root (str): Root of the sysfs and cgroup trees, to read from a fake tree
+        shared_host (bool): Whether other jobs run on the host at the same time, the host wide cpu energy
+            would then be charged to each of them, so it is not measured
+    """
+    collectors: list[Collector] = [CgroupCollector(get_container_ids, root)]
+
+    rapl_collector = RaplCollector(root)
+    if shared_host:
+        logger.debug("Other jobs share the host, its cpu energy is not measured")
+    elif rapl_collector.available:
+        collectors.append(rapl_collector)
+    else:
+        logger.debug("No RAPL powercap counters, cpu energy is not measured")
+
+    if hardware_type in ACCELERATOR_COLLECTORS:
+        collectors.append(ACCELERATOR_COLLECTORS[hardware_type](device_ids))
+    return collectors
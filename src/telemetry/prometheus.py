@@ -0,0 +1,176 @@
+import math
+import re
+from typing import Iterable, Iterator, Optional
+import requests
+
+from telemetry.collectors import Collector
+
+# Server side metrics, named the same for every backend
+SERVER_RUNNING_REQUESTS = "server_running_requests"
+SERVER_WAITING_REQUESTS = "server_waiting_requests"
+SERVER_KV_CACHE_UTILIZATION = "server_kv_cache_utilization"
+# Histograms, stored as one cumulative counter per bucket
+SERVER_QUEUE_TIME_S = "server_queue_time_s"
+SERVER_TTFT_S = "server_ttft_s"
+SERVER_TPOT_S = "server_tpot_s"
+SERVER_HISTOGRAMS = [SERVER_QUEUE_TIME_S, SERVER_TTFT_S, SERVER_TPOT_S]
+# Gauges averaged over the backend instances instead of summed
+MEAN_GAUGES = {SERVER_KV_CACHE_UTILIZATION}
+BUCKET_SEPARATOR = ":le="
+
+# Prometheus metric names of each server side metric, the first one exposed by the backend version is used
+PROMETHEUS_METRICS: dict[str, dict[str, list[str]]] = {
+    "tgi": {
+        SERVER_RUNNING_REQUESTS: ["tgi_batch_current_size"],
+        SERVER_WAITING_REQUESTS: ["tgi_queue_size"],
+        SERVER_QUEUE_TIME_S: ["tgi_request_queue_duration"],
+        SERVER_TPOT_S: ["tgi_request_mean_time_per_token_duration"],
+    },
+    "vllm": {
+        SERVER_RUNNING_REQUESTS: ["vllm:num_requests_running"],
+        SERVER_WAITING_REQUESTS: ["vllm:num_requests_waiting"],
+        SERVER_KV_CACHE_UTILIZATION: ["vllm:kv_cache_usage_perc", "vllm:gpu_cache_usage_perc"],
+        SERVER_QUEUE_TIME_S: ["vllm:request_queue_time_seconds"],
+        SERVER_TTFT_S: ["vllm:time_to_first_token_seconds"],
+        SERVER_TPOT_S: ["vllm:inter_token_latency_seconds", "vllm:time_per_output_token_seconds"],
+    },
+    "llama_cpp": {
+        SERVER_RUNNING_REQUESTS: ["llamacpp:requests_processing"],
+        SERVER_WAITING_REQUESTS: ["llamacpp:requests_deferred"],
+        SERVER_KV_CACHE_UTILIZATION: ["llamacpp:kv_cache_usage_ratio"],
+    },
+    "simulated": {
+        SERVER_RUNNING_REQUESTS: ["simulated_num_requests_running"],
+        SERVER_WAITING_REQUESTS: ["simulated_num_requests_waiting"],
+        SERVER_KV_CACHE_UTILIZATION: ["simulated_kv_cache_usage_ratio"],
+        SERVER_QUEUE_TIME_S: ["simulated_request_queue_time_seconds"],
+        SERVER_TTFT_S: ["simulated_time_to_first_token_seconds"],
+        SERVER_TPOT_S: ["simulated_time_per_output_token_seconds"],
+    },
+}
+SCRAPE_TIMEOUT = 2
+
+SAMPLE_PATTERN = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)")
+LABEL_PATTERN = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def get_metrics_url(base_url: str) -> str:
+    """Get the metrics endpoint of an OpenAI compatible base url, for example http://localhost:8080/v1 -> http://localhost:8080/metrics."""
+    return f"{base_url.rstrip('/').removesuffix('/v1')}/metrics"
+
+
+def bucket_column(name: str, le: float) -> str:
+    return f"{name}{BUCKET_SEPARATOR}{le}"
+
+
+def parse_metrics(lines: Iterable[str], names: set[str]) -> Iterator[tuple[str, dict[str, str], float]]:
+    """
+    Parse the Prometheus text format line by line, yielding the (name, labels, value) samples of the wanted metrics.
+    The labels of the other metrics are never parsed, a scrape of a few thousand series stays cheap.
+
+    Args:
+        lines (Iterable[str]): The lines of the exposition, for example streamed from the response
+        names (set[str]): The metric names to keep, histograms are matched by their base name
+    """
+    for line in lines:
+        if not line or line.startswith("#"):
+            continue
+        match = SAMPLE_PATTERN.match(line)
+        if match is None:
+            continue
+        name, labels, value = match.groups()
+        base_name = name.removesuffix("_bucket")
+        if name not in names and base_name not in names:
+            continue
+        try:
+            parsed_value = float(value)
+        except ValueError:
+            continue
+        yield name, dict(LABEL_PATTERN.findall(labels or "")), parsed_value
+
+
+def histogram_quantile(q: float, buckets: list[tuple[float, float]]) -> Optional[float]:
+    """
+    Estimate the q-th percentile (0-100) of a histogram from its cumulative buckets, interpolating
+    linearly inside the bucket, like the Prometheus histogram_quantile function.
+
+    Args:
+        q (float): The percentile, for example 95
+        buckets (list[tuple[float, float]]): The (upper bound, cumulative count) of each bucket, with the +Inf bucket
+
+    Returns:
+        float: The estimate, None if the histogram is empty
+    """
+    buckets = sorted(buckets)
+    if not buckets or buckets[-1][1] <= 0:
+        return None
+    rank = q / 100 * buckets[-1][1]
+    lower_bound, lower_count = 0.0, 0.0
+    for upper_bound, count in buckets:
+        if count >= rank:
+            if math.isinf(upper_bound):
+                # Above the highest finite bucket, its bound is the best estimate
+                return lower_bound
+            if count == lower_count:
+                return upper_bound
+            return lower_bound + (upper_bound - lower_bound) * (rank - lower_count) / (count - lower_count)
+        lower_bound, lower_count = upper_bound, count
+    return lower_bound
+
+
+class PrometheusCollector(Collector):
+    """
+    Scrape the metrics endpoint of the backend instances, mapping the backend metrics to the server side metrics.
+    Gauges are summed over the instances, histograms are kept as cumulative bucket counters so they can be
+    differentiated over any window of the run.
+    """
+    name = "prometheus"
+
+    def __init__(self, backend_type: str, metrics_urls: list[str], session: Optional[requests.Session] = None):
+        self.metrics = PROMETHEUS_METRICS.get(backend_type, {})
+        self.metrics_urls = metrics_urls
+        self.session = session or requests.Session()
+        self._names = {name for names in self.metrics.values() for name in names}
+
+    def scrape(self, metrics_url: str) -> dict[str, float]:
+        """Scrape one instance, the metrics it does not expose are left out."""
+        try:
+            with self.session.get(metrics_url, timeout=SCRAPE_TIMEOUT, stream=True) as response:
+                response.raise_for_status()
+                # iter_lines only decodes with a known encoding, the exposition format is utf-8
+                response.encoding = response.encoding or "utf-8"
+                # Summed over the label sets, for example one series per model or engine
+                totals: dict[str, float] = {}
+                buckets: dict[tuple[str, float], float] = {}
+                for name, labels, value in parse_metrics(response.iter_lines(decode_unicode=True), self._names):
+                    if name.endswith("_bucket") and "le" in labels:
+                        key = (name.removesuffix("_bucket"), float(labels["le"]))
+                        buckets[key] = buckets.get(key, 0.0) + value
+                    else:
+                        totals[name] = totals.get(name, 0.0) + value
+        except (requests.exceptions.RequestException, ValueError):
+            return {}
+
+        values: dict[str, float] = {}
+        for metric, names in self.metrics.items():
+            if metric in SERVER_HISTOGRAMS:
+                name = next((name for name in names if any(key[0] == name for key in buckets)), None)
+                for (bucket_name, le), count in buckets.items():
+                    if bucket_name == name:
+                        values[bucket_column(metric, le)] = count
+            else:
+                name = next((name for name in names if name in totals), None)
+                if name is not None:
+                    values[metric] = totals[name]
+        return values
+
+    def sample(self) -> dict[str, float]:
+        values: dict[str, float] = {}
+        instances: dict[str, int] = {}
+        for metrics_url in self.metrics_urls:
+            for metric, value in self.scrape(metrics_url).items():
+                values[metric] = values.get(metric, 0.0) + value
+                instances[metric] = instances.get(metric, 0) + 1
+        for metric in MEAN_GAUGES & values.keys():
+            values[metric] /= instances[metric]
+        return values
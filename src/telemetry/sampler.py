@@ -0,0 +1,295 @@
+import bisect
+import math
+import threading
+import time
+from array import array
+from typing import Optional
+from loguru import logger
+from pydantic import BaseModel
+
+from telemetry.collectors import (
+    ACCELERATOR_MEMORY_BYTES,
+    ACCELERATOR_POWER_W,
+    ACCELERATOR_UTILIZATION,
+    CPU_ENERGY_J,
+    CPU_USAGE_USEC,
+    IO_READ_BYTES,
+    IO_WRITE_BYTES,
+    MEMORY_BYTES,
+    MEMORY_PEAK_BYTES,
+    Collector,
+)
+from telemetry.prometheus import (
+    BUCKET_SEPARATOR,
+    SERVER_KV_CACHE_UTILIZATION,
+    SERVER_QUEUE_TIME_S,
+    SERVER_RUNNING_REQUESTS,
+    SERVER_TPOT_S,
+    SERVER_TTFT_S,
+    SERVER_WAITING_REQUESTS,
+    histogram_quantile,
+)
+
+SAMPLE_INTERVAL = 1.0
+
+
+class TimeSeries:
+    """
+    Samples stored column by column in float arrays, with NaN for the metrics missing from a sample.
+    """
+
+    def __init__(self):
+        self.timestamps = array("d")
+        self.columns: dict[str, array] = {}
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def append(self, timestamp: float, values: dict[str, float]):
+        index = len(self.timestamps)
+        self.timestamps.append(timestamp)
+        for name, value in values.items():
+            if name not in self.columns:
+                self.columns[name] = array("d", [math.nan] * index)
+            self.columns[name].append(value)
+        for column in self.columns.values():
+            if len(column) == index:
+                column.append(math.nan)
+
+    def window(self, name: str, start: Optional[float] = None, end: Optional[float] = None) -> list[tuple[float, float]]:
+        """
+        Get the (timestamp, value) samples of a metric between start and end, without the missing ones.
+        """
+        column = self.columns.get(name)
+        if column is None:
+            return []
+        first = 0 if start is None else bisect.bisect_left(self.timestamps, start)
+        last = len(self.timestamps) if end is None else bisect.bisect_right(self.timestamps, end)
+        return [
+            (self.timestamps[index], column[index]) for index in range(first, last) if not math.isnan(column[index])
+        ]
+
+
+class ServerMetrics(BaseModel):
+    """
+    Server side view of a window, a batch smaller than the client concurrency points at a client bottleneck.
+    """
+    mean_running_requests: Optional[float] = None
+    max_running_requests: Optional[float] = None
+    mean_waiting_requests: Optional[float] = None
+    mean_kv_cache_utilization: Optional[float] = None
+    max_kv_cache_utilization: Optional[float] = None
+    # Estimated from the histogram buckets
+    queue_time_p50_s: Optional[float] = None
+    queue_time_p95_s: Optional[float] = None
+    ttft_p50_s: Optional[float] = None
+    ttft_p95_s: Optional[float] = None
+    tpot_p50_s: Optional[float] = None
+    tpot_p95_s: Optional[float] = None
+
+    def to_columns(self) -> dict:
+        return {f"server_{name}": value for name, value in self.model_dump().items()}
+
+
+class ServerMetricsPoint(BaseModel):
+    # Seconds since the start of the window
+    time_s: float
+    running_requests: Optional[float] = None
+    waiting_requests: Optional[float] = None
+    kv_cache_utilization: Optional[float] = None
+
+
+class TelemetrySummary(BaseModel):
+    duration_s: float
+    num_samples: int
+    peak_memory_bytes: Optional[float] = None
+    # Mean number of cpu cores busy in the container
+    mean_cpu_cores: Optional[float] = None
+    io_read_bytes: Optional[float] = None
+    io_write_bytes: Optional[float] = None
+    # Host wide, from RAPL
+    cpu_energy_joules: Optional[float] = None
+    # Integrated from the accelerator power draw
+    accelerator_energy_joules: Optional[float] = None
+    mean_accelerator_utilization: Optional[float] = None
+    peak_accelerator_memory_bytes: Optional[float] = None
+    # None if the backend does not expose Prometheus metrics
+    server: Optional[ServerMetrics] = None
+
+    @property
+    def energy_joules(self) -> Optional[float]:
+        energies = [energy for energy in (self.cpu_energy_joules, self.accelerator_energy_joules) if energy is not None]
+        return sum(energies) if energies else None
+
+
+def counter_delta(samples: list[tuple[float, float]]) -> Optional[float]:
+    """Get the increase of a cumulative counter over the samples."""
+    if len(samples) < 2:
+        return None
+    return samples[-1][1] - samples[0][1]
+
+
+def integrate(samples: list[tuple[float, float]]) -> Optional[float]:
+    """Integrate a gauge over time with the trapezoidal rule, for example power into energy."""
+    if len(samples) < 2:
+        return None
+    return sum(
+        (timestamp - previous_timestamp) * (value + previous_value) / 2
+        for (previous_timestamp, previous_value), (timestamp, value) in zip(samples, samples[1:])
+    )
+
+
+def window_histogram_quantiles(series: TimeSeries, name: str, start: Optional[float], end: Optional[float]) -> tuple[Optional[float], Optional[float]]:
+    """
+    Get the p50 and p95 of the observations a histogram got in a window, from the increase of its bucket counters.
+    """
+    prefix = f"{name}{BUCKET_SEPARATOR}"
+    buckets: list[tuple[float, float]] = []
+    for column in series.columns:
+        if column.startswith(prefix):
+            delta = counter_delta(series.window(column, start, end))
+            # A negative increase is a counter reset, the backend restarted
+            if delta is None or delta < 0:
+                return None, None
+            buckets.append((float(column[len(prefix):]), delta))
+    return histogram_quantile(50, buckets), histogram_quantile(95, buckets)
+
+
+def summarize_server_metrics(series: TimeSeries, start: Optional[float] = None, end: Optional[float] = None) -> Optional[ServerMetrics]:
+    running = [value for _, value in series.window(SERVER_RUNNING_REQUESTS, start, end)]
+    waiting = [value for _, value in series.window(SERVER_WAITING_REQUESTS, start, end)]
+    kv_cache = [value for _, value in series.window(SERVER_KV_CACHE_UTILIZATION, start, end)]
+    queue_time = window_histogram_quantiles(series, SERVER_QUEUE_TIME_S, start, end)
+    ttft = window_histogram_quantiles(series, SERVER_TTFT_S, start, end)
+    tpot = window_histogram_quantiles(series, SERVER_TPOT_S, start, end)
+    if not running and not waiting and not kv_cache and queue_time == ttft == tpot == (None, None):
+        return None
+    return ServerMetrics(
+        mean_running_requests=sum(running) / len(running) if running else None,
+        max_running_requests=max(running, default=None),
+        mean_waiting_requests=sum(waiting) / len(waiting) if waiting else None,
+        mean_kv_cache_utilization=sum(kv_cache) / len(kv_cache) if kv_cache else None,
+        max_kv_cache_utilization=max(kv_cache, default=None),
+        queue_time_p50_s=queue_time[0],
+        queue_time_p95_s=queue_time[1],
+        ttft_p50_s=ttft[0],
+        ttft_p95_s=ttft[1],
+        tpot_p50_s=tpot[0],
+        tpot_p95_s=tpot[1],
+    )
+
+
+class TelemetrySampler:
+    """
+    Sample the collectors on a background thread at a fixed interval while a benchmark runs.
+
+    Usage:
+        sampler = TelemetrySampler(collectors)
+        sampler.start()
+        ...
+        sampler.stop()
+        summary = sampler.summarize()
+    """
+
+    def __init__(self, collectors: list[Collector], interval: float = SAMPLE_INTERVAL):
+        self.collectors = collectors
+        self.interval = interval
+        self.series = TimeSeries()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sample(self):
+        """Take one sample of every collector, from the background thread or the caller."""
+        # The collectors keep state between samples, so one sample is taken at a time
+        with self._lock:
+            values: dict[str, float] = {}
+            for collector in self.collectors:
+                try:
+                    values.update(collector.sample())
+                except Exception as e:
+                    logger.debug(f"Telemetry collector {collector.name} failed: {str(e)}")
+            self.series.append(time.monotonic(), values)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self.sample()
+            self._stopped.wait(self.interval)
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling, taking a last sample so the counters cover the whole run."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.sample()
+
+    def summarize(self, start: Optional[float] = None, end: Optional[float] = None) -> TelemetrySummary:
+        """
+        Summarize the samples between two monotonic times, the whole run by default.
+        """
+        with self._lock:
+            series = self.series
+            memory = series.window(MEMORY_BYTES, start, end) + series.window(MEMORY_PEAK_BYTES, start, end)
+            cpu_usage = series.window(CPU_USAGE_USEC, start, end)
+            io_read = series.window(IO_READ_BYTES, start, end)
+            io_write = series.window(IO_WRITE_BYTES, start, end)
+            cpu_energy = series.window(CPU_ENERGY_J, start, end)
+            accelerator_power = series.window(ACCELERATOR_POWER_W, start, end)
+            accelerator_utilization = series.window(ACCELERATOR_UTILIZATION, start, end)
+            accelerator_memory = series.window(ACCELERATOR_MEMORY_BYTES, start, end)
+            first = 0 if start is None else bisect.bisect_left(series.timestamps, start)
+            last = len(series) if end is None else bisect.bisect_right(series.timestamps, end)
+            window_timestamps = series.timestamps[first:last]
+            server = summarize_server_metrics(series, start, end)
+
+        cpu_usage_delta = counter_delta(cpu_usage)
+        cpu_duration = cpu_usage[-1][0] - cpu_usage[0][0] if len(cpu_usage) >= 2 else 0
+        return TelemetrySummary(
+            duration_s=window_timestamps[-1] - window_timestamps[0] if len(window_timestamps) >= 2 else 0.0,
+            num_samples=len(window_timestamps),
+            peak_memory_bytes=max((value for _, value in memory), default=None),
+            mean_cpu_cores=cpu_usage_delta / 1e6 / cpu_duration if cpu_usage_delta is not None and cpu_duration > 0 else None,
+            io_read_bytes=counter_delta(io_read),
+            io_write_bytes=counter_delta(io_write),
+            cpu_energy_joules=counter_delta(cpu_energy),
+            accelerator_energy_joules=integrate(accelerator_power),
+            mean_accelerator_utilization=(
+                sum(value for _, value in accelerator_utilization) / len(accelerator_utilization)
+                if accelerator_utilization else None
+            ),
+            peak_accelerator_memory_bytes=max((value for _, value in accelerator_memory), default=None),
+            server=server,
+        )
+
+    def server_series(self, start: Optional[float] = None, end: Optional[float] = None) -> list[ServerMetricsPoint]:
+        """
+        Get the batch size, queue depth and KV cache utilization samples between two monotonic times.
+        """
+        with self._lock:
+            first = 0 if start is None else bisect.bisect_left(self.series.timestamps, start)
+            last = len(self.series) if end is None else bisect.bisect_right(self.series.timestamps, end)
+            columns = [self.series.columns.get(name) for name in (SERVER_RUNNING_REQUESTS, SERVER_WAITING_REQUESTS, SERVER_KV_CACHE_UTILIZATION)]
+            if all(column is None for column in columns):
+                return []
+            origin = self.series.timestamps[first] if first < last else 0.0
+            points = []
+            for index in range(first, last):
+                values = [
+                    column[index] if column is not None and not math.isnan(column[index]) else None for column in columns
+                ]
+                if any(value is not None for value in values):
+                    points.append(
+                        ServerMetricsPoint(
+                            time_s=self.series.timestamps[index] - origin,
+                            running_requests=values[0],
+                            waiting_requests=values[1],
+                            kv_cache_utilization=values[2],
+                        )
+                    )
+            return points
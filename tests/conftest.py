@@ -0,0 +1,29 @@
+import socket
+from typing import Callable, Optional
+
+import pytest
+
+from backend.simulated_backend import SimulatedBackend, SimulatedBackendConfig
+
+
+def get_free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def start_simulated_backend() -> Callable[[Optional[SimulatedBackendConfig]], SimulatedBackend]:
+    """Start simulated backends on free ports, stopped at the end of the test."""
+    backends: list[SimulatedBackend] = []
+
+    def start(config: Optional[SimulatedBackendConfig] = None) -> SimulatedBackend:
+        backend = SimulatedBackend(config, port=get_free_port())
+        backend.start()
+        backend.wait_ready()
+        backends.append(backend)
+        return backend
+
+    yield start
+    for backend in backends:
+        backend.stop()
@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from dataset.aggregates import LeaderboardQuery, build_aggregates, get_throughput_trends, publish_aggregates
+from dataset.result_publisher import LocalPublisher, publish_results
+
+NOW = datetime(2025, 1, 31, 12)
+
+
+def make_record(model_id: str, backend_type: str, days_ago: float = 0, throughput: float = 1000.0, working: bool = True, **columns) -> dict:
+    return {
+        "model_id": model_id,
+        "backend_type": backend_type,
+        "hardware_type": "cuda",
+        "machine": "BOX",
+        "benchmark_time": NOW - timedelta(days=days_ago),
+        "can_serve_single_request": working,
+        "max_output_tokens_per_second": throughput if working else None,
+        "ttft_p50_s": 0.1 if working else None,
+        **columns,
+    }
+
+
+@pytest.fixture
+def publisher(tmp_path) -> LocalPublisher:
+    publisher = LocalPublisher(str(tmp_path))
+    publish_results(
+        [
+            make_record("a", "vllm", days_ago=2, throughput=1000.0),
+            make_record("a", "vllm", days_ago=1, throughput=1000.0),
+            make_record("a", "vllm", throughput=800.0),
+            make_record("a", "tgi", throughput=900.0),
+            make_record("b", "vllm", days_ago=1),
+            make_record("b", "vllm", working=False),
+        ],
+        publisher,
+    )
+    return publisher
+
+
+def test_throughput_trend_compares_the_latest_run_with_the_earlier_ones():
+    history = pd.DataFrame(
+        [
+            make_record("a", "vllm", days_ago=60, throughput=100.0),
+            make_record("a", "vllm", days_ago=2, throughput=1000.0),
+            make_record("a", "vllm", days_ago=1, throughput=1000.0),
+            # A copy of a reused result, published again with the time of the run it reuses
+            make_record("a", "vllm", days_ago=1, throughput=1000.0),
+            make_record("a", "vllm", throughput=800.0),
+            make_record("b", "vllm", throughput=800.0),
+            # The same machine benchmarked on its cpu, a combination of its own
+            make_record("a", "vllm", days_ago=1, throughput=50.0, hardware_type="cpu"),
+            make_record("a", "vllm", throughput=60.0, hardware_type="cpu"),
+        ]
+    )
+
+    trends = get_throughput_trends(history)
+
+    assert trends[("a", "vllm", "cuda", "BOX")] == pytest.approx(-0.2)
+    assert trends[("a", "vllm", "cpu", "BOX")] == pytest.approx(0.2)
+    assert pd.isna(trends[("b", "vllm", "cuda", "BOX")])
+
+
+def test_summaries_are_built_from_the_latest_results(publisher):
+    aggregates = publish_aggregates(publisher)
+
+    hardware = aggregates["hardware"].set_index("hardware_type").loc["cuda"]
+    assert (hardware["combinations"], hardware["working"]) == (3, 2)
+    assert hardware["best_output_tokens_per_second"] == 900.0
+    model = aggregates["model"].set_index("model_id")
+    assert model.loc["a", "best_backend_type"] == "tgi"
+    assert model.loc["b", "working_backends"] == 0
+    assert sorted(path.split("/")[-1] for path in publisher.list_files("aggregates")) == [
+        "backend.parquet", "hardware.parquet", "latest.parquet", "model.parquet",
+    ]
+
+
+def test_no_results_give_empty_summaries():
+    assert all(df.empty for df in build_aggregates(pd.DataFrame()).values())
+
+
+def test_queries_read_the_summaries_once(publisher):
+    publish_aggregates(publisher)
+    query = LeaderboardQuery(publisher)
+
+    compatibility = query.compatibility("cuda")
+    assert compatibility.loc["a", "vllm"] and not compatibility.loc["b", "vllm"]
+    # b was never benchmarked with tgi
+    assert pd.isna(compatibility.loc["b", "tgi"])
+    assert list(query.results(model_id="a")["backend_type"]) == ["tgi", "vllm"]
+    assert len(query.backends("cuda")) == 2
+    assert query.models()["model_id"].tolist() == ["a", "b"]
+
+    # The answers are cached, new results are only seen after a refresh
+    publish_results([make_record("c", "vllm")], publisher)
+    publish_aggregates(publisher)
+    assert "c" not in query.models()["model_id"].tolist()
+    query.refresh()
+    assert "c" in query.models()["model_id"].tolist()
+
+
+def test_cached_answers_cannot_be_changed_by_the_caller(publisher):
+    publish_aggregates(publisher)
+    query = LeaderboardQuery(publisher)
+
+    hardware = query.hardware()
+    hardware.loc[0, "working"] = 100
+
+    assert query.hardware().loc[0, "working"] == 2
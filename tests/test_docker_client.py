@@ -0,0 +1,180 @@
+import http.client
+import json
+import socketserver
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from backend.docker_client import ConflictError, DockerClient, DockerError, NotFoundError, split_image
+from backend.docker_command import ContainerSpec, parse_docker_run
+
+
+class EngineHandler(BaseHTTPRequestHandler):
+    """A fake Docker Engine API: images must be pulled before a container can be created from them."""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def address_string(self) -> str:
+        return "unix"
+
+    def _send(self, status: int, body=None, raw: bytes = b"", content_type: str = "application/json"):
+        data = json.dumps(body).encode() if body is not None else raw
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def drop_connection(self) -> bool:
+        """Close the connection without answering while flaky failures are left, like a daemon restarting."""
+        if "/flaky" not in self.path or self.server.flaky_failures == 0:
+            return False
+        self.server.flaky_failures -= 1
+        self.close_connection = True
+        return True
+
+    def do_GET(self):
+        self.server.calls.append(("GET", self.path))
+        if self.drop_connection():
+            return
+        if "/flaky" in self.path:
+            return self._send(200, {"ok": True})
+        if "/idle-close" in self.path:
+            # Answered as a keep-alive connection, then closed like an idle connection the daemon drops
+            self._send(200, {"ok": True})
+            self.close_connection = True
+            return
+        if "/logs" in self.path:
+            frames = b"".join(struct.pack(">BxxxL", stream, len(text)) + text for stream, text in self.server.log_frames)
+            return self._send(200, raw=frames, content_type="application/vnd.docker.raw-stream")
+        self._send(404, {"message": "No such container"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        self.server.calls.append(("POST", self.path, body))
+        if self.drop_connection():
+            return
+        if "/containers/create" in self.path:
+            if body["Image"] not in self.server.images:
+                return self._send(404, {"message": "No such image"})
+            return self._send(201, {"Id": "container-id"})
+        if "/images/create" in self.path:
+            if "missing" in self.path:
+                return self._send(200, raw=b'{"status":"Pulling"}\n{"error":"manifest unknown"}\n')
+            self.server.images.add("org/image:1.0")
+            return self._send(200, raw=b'{"status":"Pulling"}\n{"status":"Downloaded"}\n')
+        if "/start" in self.path:
+            return self._send(409, {"message": "Container already started"})
+        if "/wait" in self.path:
+            return self._send(200, {"StatusCode": 137})
+        self._send(404, {"message": "Not found"})
+
+
+class EngineServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def engine(tmp_path):
+    server = EngineServer(str(tmp_path / "docker.sock"), EngineHandler)
+    server.calls = []
+    server.images = set()
+    server.log_frames = []
+    server.flaky_failures = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def docker_client(engine):
+    client = DockerClient(socket_path=engine.server_address)
+    yield client
+    client.close()
+
+
+def test_split_image():
+    assert split_image("vllm/vllm-openai:latest") == ("vllm/vllm-openai", "latest")
+    assert split_image("ghcr.io/org/image") == ("ghcr.io/org/image", "latest")
+    assert split_image("registry:5000/image") == ("registry:5000/image", "latest")
+    assert split_image("org/image@sha256:abc") == ("org/image", "sha256:abc")
+
+
+def test_parse_docker_run():
+    spec = parse_docker_run(
+        "docker run --rm --name bench -p 8080:80 -e HF_TOKEN=x -v /data:/data --gpus all --shm-size 1g "
+        "org/image:1.0 --model org/model --port 80"
+    )
+
+    assert (spec.image, spec.name, spec.command) == ("org/image:1.0", "bench", ["--model", "org/model", "--port", "80"])
+    body = spec.to_create_body()
+    assert body["HostConfig"]["PortBindings"] == {"80/tcp": [{"HostIp": "", "HostPort": "8080"}]}
+    assert body["HostConfig"]["DeviceRequests"][0]["Count"] == -1
+    assert body["HostConfig"]["ShmSize"] == 1024**3
+
+
+def test_create_container_pulls_a_missing_image(engine, docker_client):
+    container_id = docker_client.create_container(ContainerSpec(image="org/image:1.0", name="bench"))
+
+    assert container_id == "container-id"
+    paths = [call[1].split("?")[0] for call in engine.calls]
+    assert paths == ["/v1.41/containers/create", "/v1.41/images/create", "/v1.41/containers/create"]
+
+
+def test_pull_errors_are_raised(docker_client):
+    with pytest.raises(DockerError, match="manifest unknown"):
+        docker_client.pull_image("org/missing:1.0")
+
+
+def test_error_statuses_map_to_exceptions(docker_client):
+    with pytest.raises(NotFoundError):
+        docker_client.inspect_container("bench")
+    with pytest.raises(ConflictError):
+        docker_client.start_container("bench")
+
+
+def test_wait_returns_the_exit_code(docker_client):
+    assert docker_client.wait_container("bench") == 137
+
+
+def test_logs_are_demultiplexed_into_lines(engine, docker_client):
+    engine.log_frames = [(1, b"loading\nweig"), (2, b"warning\n"), (1, b"hts\nready")]
+
+    assert list(docker_client.logs("bench")) == [
+        ("stdout", "loading"),
+        ("stderr", "warning"),
+        ("stdout", "weights"),
+        ("stdout", "ready"),
+    ]
+
+
+def test_a_dropped_get_is_sent_again(engine, docker_client):
+    engine.flaky_failures = 1
+
+    assert docker_client._request("GET", "/flaky") == {"ok": True}
+    assert [call[1] for call in engine.calls] == ["/v1.41/flaky", "/v1.41/flaky"]
+
+
+def test_a_dropped_post_is_not_sent_twice(engine, docker_client):
+    engine.flaky_failures = 1
+
+    with pytest.raises(http.client.RemoteDisconnected):
+        docker_client._request("POST", "/flaky", body={})
+    assert [call[1] for call in engine.calls] == ["/v1.41/flaky"]
+
+
+def test_a_post_on_a_pooled_connection_closed_by_the_daemon_is_sent_on_a_new_one(engine, docker_client):
+    engine.images.add("org/image:1.0")
+    docker_client._request("GET", "/idle-close")
+    # Gives the daemon side time to close the pooled connection
+    time.sleep(0.2)
+
+    assert docker_client.create_container(ContainerSpec(image="org/image:1.0", name="bench")) == "container-id"
+    assert [call[1].split("?")[0] for call in engine.calls] == ["/v1.41/idle-close", "/v1.41/containers/create"]
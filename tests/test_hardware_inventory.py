@@ -0,0 +1,22 @@
+import os
+
+from hardware.hardware_inventory import read_accelerators
+
+
+def write_pci_device(root, address: str, vendor_id: str, device_id: str, pci_class: str, numa_node: str = "-1"):
+    device_dir = root / "sys/bus/pci/devices" / address
+    os.makedirs(device_dir)
+    for name, value in [("vendor", vendor_id), ("device", device_id), ("class", pci_class), ("numa_node", numa_node)]:
+        (device_dir / name).write_text(f"{value}\n")
+
+
+def test_read_accelerators_keeps_only_accelerators_of_known_vendors(tmp_path):
+    write_pci_device(tmp_path, "0000:01:00.0", "0x10de", "0x2330", "0x030200", "0")
+    write_pci_device(tmp_path, "0000:02:00.0", "0x1da3", "0x1020", "0x120000", "1")
+    # The console display controller of the board, and an Intel QuickAssist card
+    write_pci_device(tmp_path, "0000:03:00.0", "0x1a03", "0x2000", "0x030000")
+    write_pci_device(tmp_path, "0000:04:00.0", "0x8086", "0x4940", "0x0b4000")
+
+    accelerators = read_accelerators(str(tmp_path))
+
+    assert [(device.vendor, device.numa_node) for device in accelerators] == [("NVIDIA", 0), ("Habana", 1)]
@@ -0,0 +1,72 @@
+import threading
+
+from backend.docker_client import DockerError
+from backend.images import ImagePrefetcher, get_repo_digest
+
+
+class FakeDockerClient:
+    def __init__(self, missing: tuple[str, ...] = ()):
+        self.missing = missing
+        self.pulls: list[str] = []
+        self.resolved: list[str] = []
+        self._lock = threading.Lock()
+
+    def pull_image(self, image: str):
+        with self._lock:
+            self.pulls.append(image)
+        if image in self.missing:
+            raise DockerError(500, "manifest unknown")
+
+    def inspect_image(self, image: str) -> dict:
+        repository = image.rsplit(":", 1)[0]
+        return {"RepoDigests": [f"mirror/{repository}@sha256:mirror", f"{repository}@sha256:{repository.replace('/', '-')}"]}
+
+    def inspect_distribution(self, image: str) -> dict:
+        self.resolved.append(image)
+        if image in self.missing:
+            raise DockerError(404, "manifest unknown")
+        return {"Descriptor": {"digest": "sha256:registry"}}
+
+
+def test_get_repo_digest_prefers_the_image_repository():
+    image_info = {"RepoDigests": ["mirror/org/image@sha256:a", "org/image@sha256:b"]}
+
+    assert get_repo_digest(image_info, "org/image:1.0") == "org/image@sha256:b"
+    assert get_repo_digest(image_info, "other/image:1.0") == "mirror/org/image@sha256:a"
+    assert get_repo_digest({}, "org/image:1.0") is None
+
+
+def test_each_image_is_pulled_once_and_pinned():
+    docker_client = FakeDockerClient()
+    prefetcher = ImagePrefetcher(docker_client)
+    prefetcher.prefetch(["org/a:1.0", "org/b:1.0", "org/a:1.0"])
+
+    pulled = prefetcher.wait("org/b:1.0")
+    prefetcher.wait("org/a:1.0")
+    prefetcher.shutdown()
+
+    assert docker_client.pulls == ["org/a:1.0", "org/b:1.0"]
+    assert (pulled.pinned_image, pulled.digest, pulled.error) == ("org/b@sha256:org-b", "sha256:org-b", None)
+    assert pulled.pull_time_s is not None
+
+
+def test_failed_pull_is_returned_as_an_error():
+    prefetcher = ImagePrefetcher(FakeDockerClient(missing=("org/a:1.0",)))
+
+    pulled = prefetcher.wait("org/a:1.0")
+    prefetcher.shutdown()
+
+    assert pulled.error is not None and pulled.digest is None
+
+
+def test_resolve_digest_asks_the_registry_once_without_pulling():
+    docker_client = FakeDockerClient(missing=("org/missing:1.0",))
+    prefetcher = ImagePrefetcher(docker_client)
+
+    assert prefetcher.resolve_digest("org/a:1.0") == "sha256:registry"
+    assert prefetcher.resolve_digest("org/a:1.0") == "sha256:registry"
+    assert prefetcher.resolve_digest("org/missing:1.0") is None
+    prefetcher.shutdown()
+
+    assert docker_client.resolved == ["org/a:1.0", "org/missing:1.0"]
+    assert docker_client.pulls == []
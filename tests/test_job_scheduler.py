@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+
+import scheduler.job_scheduler as job_scheduler
+from backend.resources import PortAllocator, ResourceSlice
+from dataset.leaderboard_dataset import LeaderboardData
+from model.get_models import Model
+from scheduler.job_scheduler import JOB_ERROR, JobScheduler, create_jobs
+
+SLICES = [ResourceSlice(cpuset_cpus="0-3", threads=4), ResourceSlice(cpuset_cpus="4-7", threads=4)]
+
+
+def make_result(job, failure_reason=None) -> LeaderboardData:
+    return LeaderboardData(
+        model_id=job.model.hf_model_id,
+        backend_type=job.backend_type,
+        hardware_type=job.hardware_type,
+        machine="BOX",
+        can_serve_single_request=failure_reason is None,
+        failure_reason=failure_reason,
+        benchmark_time="2025-01-01T00:00:00",
+        docker_command=None,
+    )
+
+
+@pytest.fixture
+def scheduler(tmp_path, monkeypatch) -> JobScheduler:
+    monkeypatch.setattr(job_scheduler, "get_resource_slices", lambda hardware_type, workers: SLICES[:workers])
+    return JobScheduler("cpu", workers=2, log_dir=str(tmp_path / "logs"))
+
+
+@pytest.fixture
+def jobs() -> list:
+    models = [Model(name=f"m{index}", hf_model_id=f"org/m{index}", gguf_hf_model_id=f"org/m{index}-GGUF:Q4_K_M") for index in range(3)]
+    return create_jobs(models, ["vllm", "tgi"], "cpu")
+
+
+def test_ports_are_never_given_to_two_running_jobs():
+    allocator = PortAllocator()
+
+    ports = [allocator.allocate() for _ in range(20)]
+    assert len(set(ports)) == 20
+
+    allocator.release(ports[0])
+    assert ports[0] not in allocator._allocated
+    assert allocator._allocated == set(ports[1:])
+
+
+def test_each_running_job_has_a_slice_and_a_port_of_its_own(scheduler, jobs):
+    lock = threading.Lock()
+    running: dict[str, tuple] = {}
+    max_running = 0
+
+    def run_job(job):
+        nonlocal max_running
+        with lock:
+            assert job.resources.cpuset_cpus not in [cpus for cpus, _ in running.values()]
+            assert job.host_port not in [port for _, port in running.values()]
+            running[job.job_id] = (job.resources.cpuset_cpus, job.host_port)
+            max_running = max(max_running, len(running))
+        time.sleep(0.05)
+        with lock:
+            del running[job.job_id]
+        return make_result(job)
+
+    results = scheduler.run(jobs, run_job)
+
+    # Results in job order, both slices used at once, all of them back in the queue after the run
+    assert [(result.model_id, result.backend_type) for result in results] == [(job.model.hf_model_id, job.backend_type) for job in jobs]
+    assert max_running == 2
+    assert all(job.parallel_jobs == 2 for job in jobs)
+    assert scheduler._free_slices.qsize() == 2
+    assert scheduler.port_allocator._allocated == set()
+
+
+def test_a_job_which_raises_gets_a_failed_result_and_the_others_still_run(scheduler, jobs):
+    def run_job(job):
+        if job.job_id == jobs[1].job_id:
+            raise RuntimeError("docker daemon went away")
+        return make_result(job)
+
+    results = scheduler.run(jobs, run_job, on_error=lambda job, error: make_result(job, JOB_ERROR))
+
+    assert len(results) == len(jobs)
+    assert [result.failure_reason for result in results] == [None, JOB_ERROR, None, None, None, None]
+    # The slice and port of the failed job were released
+    assert scheduler._free_slices.qsize() == 2
+    assert scheduler.port_allocator._allocated == set()
+    # Without on_error the failed job has no result
+    assert len(scheduler.run(jobs, run_job)) == len(jobs) - 1
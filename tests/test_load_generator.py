@@ -0,0 +1,36 @@
+import asyncio
+
+from backend.simulated_backend import SimulatedBackendConfig
+from benchmark.load_generator import run_load
+from benchmark.stats import percentile
+
+
+def test_percentile_interpolates_between_values():
+    assert percentile([], 50) is None
+    assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.5
+    assert percentile([3.0, 1.0, 2.0], 100) == 3.0
+
+
+def test_run_load_sends_every_request_over_every_url(start_simulated_backend):
+    backends = [start_simulated_backend(), start_simulated_backend()]
+
+    result = asyncio.run(
+        run_load("simulated", 4, num_requests=10, base_url=[backend.base_url for backend in backends], max_tokens=8, stream=True)
+    )
+
+    assert (result.concurrency, result.num_requests, result.num_failed) == (4, 10, 0)
+    assert result.output_tokens == 80
+    assert result.p50_latency_s <= result.p95_latency_s
+    assert result.streaming is not None and result.streaming.ttft_p50_s is not None
+    # The virtual users are spread over the backend instances
+    served = [backend.engine.request_success_total for backend in backends]
+    assert sum(served) == 10 and all(served)
+
+
+def test_run_load_counts_failed_requests(start_simulated_backend):
+    backend = start_simulated_backend(SimulatedBackendConfig(failure_rate=1.0))
+
+    result = asyncio.run(run_load("simulated", 2, num_requests=4, base_url=backend.base_url, max_tokens=8))
+
+    assert (result.num_requests, result.num_failed, result.output_tokens) == (4, 4, 0)
+    assert result.mean_latency_s is None
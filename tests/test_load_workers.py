@@ -0,0 +1,56 @@
+import pytest
+
+from backend.simulated_backend import SimulatedBackendConfig
+from benchmark.load_generator import RequestResult
+from benchmark.load_workers import LoadWorkerPool, decode_request_result, encode_request_result
+
+
+def test_request_result_round_trips_through_the_encoding():
+    streamed = RequestResult(
+        success=True, latency_s=1.5, output_tokens=3, prompt_tokens=12, ttft_s=0.25, inter_token_latencies_s=[0.01, 0.02]
+    )
+    failed = RequestResult(success=False, latency_s=0.5, error="Connection refused: é")
+
+    assert decode_request_result(encode_request_result(streamed)) == streamed
+    assert decode_request_result(memoryview(encode_request_result(failed))) == failed
+
+
+def test_pool_merges_the_results_of_its_workers(start_simulated_backend):
+    backend = start_simulated_backend()
+
+    with LoadWorkerPool(2) as pool:
+        result = pool.run_load("simulated", 4, num_requests=10, base_url=backend.base_url, max_tokens=8, stream=True)
+
+    assert (result.load_workers, result.num_requests, result.num_failed) == (2, 10, 0)
+    assert result.output_tokens == 80
+    assert len(result.requests) == 10 and all(request.ttft_s is not None for request in result.requests)
+    assert result.started_at < result.ended_at
+    assert backend.engine.request_success_total == 10
+
+
+def test_failed_worker_fails_its_requests_and_the_pool_restarts(start_simulated_backend):
+    backend = start_simulated_backend()
+
+    with LoadWorkerPool(2) as pool:
+        pool.run_load("simulated", 2, num_requests=2, base_url=backend.base_url, max_tokens=4)
+        pool._processes[1].kill()
+        pool._processes[1].join()
+
+        failed_level = pool.run_load("simulated", 2, num_requests=6, base_url=backend.base_url, max_tokens=4)
+        # The surviving worker completed its half, the requests of the killed one are failed
+        assert (failed_level.num_requests, failed_level.num_failed) == (6, 3)
+        assert all(request.error == "load generator process exited" for request in failed_level.requests if not request.success)
+
+        next_level = pool.run_load("simulated", 2, num_requests=6, base_url=backend.base_url, max_tokens=4)
+        assert (next_level.num_requests, next_level.num_failed) == (6, 0)
+
+
+def test_a_level_past_its_timeout_stops_the_workers(start_simulated_backend):
+    backend = start_simulated_backend(SimulatedBackendConfig(step_s=0.05))
+
+    with LoadWorkerPool(2) as pool:
+        with pytest.raises(TimeoutError):
+            pool.run_load("simulated", 2, num_requests=200, base_url=backend.base_url, max_tokens=64, timeout=1)
+
+        next_level = pool.run_load("simulated", 2, num_requests=2, base_url=backend.base_url, max_tokens=4)
+        assert (next_level.num_requests, next_level.num_failed) == (2, 0)
@@ -0,0 +1,68 @@
+import gzip
+
+from backend.log_capture import LogCapture
+from backend.log_events import (
+    GATED_MODEL,
+    KV_CACHE_ALLOCATED,
+    OUT_OF_MEMORY,
+    SERVER_LISTENING,
+    WEIGHTS_LOADING,
+    classify_failure,
+    match_log_events,
+)
+
+
+def test_only_the_last_lines_are_kept_in_memory(tmp_path):
+    spill_path = str(tmp_path / "logs" / "container.log.gz")
+    capture = LogCapture("vllm", "bench", spill_path, max_lines=3)
+
+    for index in range(10):
+        capture.feed("stdout" if index % 2 else "stderr", f"line {index}\n")
+    capture.close()
+
+    assert capture.tail() == ["line 7", "line 8", "line 9"]
+    assert capture.tail(2) == ["line 8", "line 9"]
+    # Every line is in the spill file, with its stream
+    with gzip.open(spill_path, "rt") as f:
+        spilled = f.read().splitlines()
+    assert len(spilled) == 10
+    assert spilled[:2] == ["stderr: line 0", "stdout: line 1"]
+
+
+def test_a_second_run_appends_to_the_spill_file(tmp_path):
+    spill_path = str(tmp_path / "container.log.gz")
+    for run in range(2):
+        capture = LogCapture(None, "bench", spill_path)
+        capture.feed("stdout", f"run {run}")
+        capture.close()
+
+    with gzip.open(spill_path, "rt") as f:
+        assert f.read().splitlines() == ["stdout: run 0", "stdout: run 1"]
+
+
+def test_startup_events_and_the_kv_cache_size_are_parsed():
+    capture = LogCapture("vllm", "bench")
+
+    capture.feed("stdout", "INFO Starting to load model org/model...")
+    events = capture.feed("stdout", "INFO KV cache size: 1,234,560 tokens")
+    capture.feed("stdout", "INFO: Uvicorn running on http://0.0.0.0:8000")
+    # A later value does not replace the first one
+    capture.feed("stdout", "INFO KV cache size: 99 tokens")
+
+    assert [event.name for event in events] == [KV_CACHE_ALLOCATED]
+    assert {WEIGHTS_LOADING, KV_CACHE_ALLOCATED, SERVER_LISTENING} <= capture.events
+    assert capture.kv_cache_tokens == 1234560
+    assert capture.failure is None
+
+
+def test_failures_are_classified_by_priority():
+    capture = LogCapture("tgi", "bench")
+
+    capture.feed("stderr", "huggingface_hub.errors.GatedRepoError: 401 Client Error")
+    assert capture.failure == GATED_MODEL
+    capture.feed("stderr", "torch.OutOfMemoryError: CUDA out of memory. Tried to allocate 2.00 GiB")
+
+    assert capture.failure == OUT_OF_MEMORY
+    assert classify_failure(set()) is None
+    # Unknown backends still get their failures classified
+    assert [event.name for event in match_log_events("unknown", "std::bad_alloc: failed to allocate")] == [OUT_OF_MEMORY]
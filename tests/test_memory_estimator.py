@@ -0,0 +1,127 @@
+import pytest
+from transformers import LlamaConfig
+
+import model.memory_estimator as memory_estimator
+from model.get_models import Model
+from model.memory_estimator import (
+    MAX_BATCH_SEQUENCES,
+    MIN_KV_CACHE_TOKENS,
+    PREFILL_TOKENS,
+    RUNTIME_OVERHEAD_BYTES,
+    estimate_memory,
+    get_available_memory,
+    get_gguf_quantization,
+)
+
+HIDDEN_SIZE = 64
+INTERMEDIATE_SIZE = 128
+NUM_LAYERS = 2
+NUM_HEADS = 4
+VOCAB_SIZE = 128
+
+
+def make_config(num_kv_heads: int = NUM_HEADS, dtype: str = "bfloat16") -> LlamaConfig:
+    return LlamaConfig(
+        hidden_size=HIDDEN_SIZE,
+        intermediate_size=INTERMEDIATE_SIZE,
+        num_attention_heads=NUM_HEADS,
+        num_key_value_heads=num_kv_heads,
+        num_hidden_layers=NUM_LAYERS,
+        vocab_size=VOCAB_SIZE,
+        max_position_embeddings=2048,
+        dtype=dtype,
+    )
+
+
+def count_parameters(num_kv_heads: int) -> int:
+    """Parameters of the Llama layout counted by hand: embeddings, attention, MLP, norms and the untied head."""
+    kv_size = num_kv_heads * HIDDEN_SIZE // NUM_HEADS
+    attention = 2 * HIDDEN_SIZE * HIDDEN_SIZE + 2 * kv_size * HIDDEN_SIZE
+    mlp = 3 * HIDDEN_SIZE * INTERMEDIATE_SIZE
+    layer = attention + mlp + 2 * HIDDEN_SIZE
+    return 2 * VOCAB_SIZE * HIDDEN_SIZE + NUM_LAYERS * layer + HIDDEN_SIZE
+
+
+@pytest.fixture
+def configs(monkeypatch) -> dict:
+    """The configs of the models by id, loaded instead of the hub ones."""
+    configs = {
+        "org/dense": make_config(),
+        "org/gqa": make_config(num_kv_heads=1),
+        "org/fp32": make_config(dtype="float32"),
+    }
+    monkeypatch.setattr(memory_estimator, "load_config", lambda model_id: configs[model_id])
+    memory_estimator.get_parameter_layout.cache_clear()
+    yield configs
+    memory_estimator.get_parameter_layout.cache_clear()
+
+
+def make_model(hf_model_id: str, quantization: str = "Q4_K_M") -> Model:
+    return Model(name=hf_model_id, hf_model_id=hf_model_id, gguf_hf_model_id=f"{hf_model_id}-GGUF:{quantization}")
+
+
+@pytest.mark.parametrize("model_id, num_kv_heads", [("org/dense", NUM_HEADS), ("org/gqa", 1)])
+def test_dense_and_gqa_estimates(configs, model_id, num_kv_heads):
+    estimate = estimate_memory(make_model(model_id), "vllm", "cuda")
+
+    head_dim = HIDDEN_SIZE // NUM_HEADS
+    assert estimate.parameter_bytes == count_parameters(num_kv_heads) * 2
+    # A key and a value per layer and KV head, GQA shares them between the query heads
+    assert estimate.kv_cache_bytes_per_token == 2 * NUM_LAYERS * num_kv_heads * head_dim * 2
+    assert estimate.activation_bytes == (
+        PREFILL_TOKENS * (4 * HIDDEN_SIZE + 2 * INTERMEDIATE_SIZE) * 2 + MAX_BATCH_SEQUENCES * VOCAB_SIZE * 4
+    )
+    # The KV cache holds one request, the whole 2048 tokens context when it is shorter than MIN_KV_CACHE_TOKENS
+    kv_cache_tokens = min(2048, MIN_KV_CACHE_TOKENS)
+    assert estimate.required_bytes == (
+        estimate.parameter_bytes + estimate.kv_cache_bytes_per_token * kv_cache_tokens + estimate.activation_bytes + RUNTIME_OVERHEAD_BYTES
+    )
+
+
+def test_the_checkpoint_dtype_sets_the_bytes_per_value(configs):
+    bf16 = estimate_memory(make_model("org/dense"), "vllm", "cuda")
+    fp32 = estimate_memory(make_model("org/fp32"), "vllm", "cuda")
+
+    assert fp32.parameter_bytes == 2 * bf16.parameter_bytes
+    assert fp32.kv_cache_bytes_per_token == 2 * bf16.kv_cache_bytes_per_token
+
+
+def test_llama_cpp_weights_take_the_size_of_their_quantization(configs):
+    q4 = estimate_memory(make_model("org/fp32", "Q4_K_M"), "llama_cpp", "cuda")
+    q8 = estimate_memory(make_model("org/fp32", "q8_0"), "llama_cpp", "cuda")
+    bf16 = estimate_memory(make_model("org/dense"), "vllm", "cuda")
+
+    assert q4.parameter_bytes == int(count_parameters(NUM_HEADS) * 4.85 / 8)
+    assert q8.parameter_bytes == int(count_parameters(NUM_HEADS) * 8.5 / 8)
+    # llama.cpp keeps its KV cache in f16 whatever the checkpoint dtype
+    assert q4.kv_cache_bytes_per_token == bf16.kv_cache_bytes_per_token
+    assert estimate_memory(make_model("org/fp32", "IQ1_S"), "llama_cpp", "cuda") is None
+    assert get_gguf_quantization("org/model-GGUF") is None
+
+
+def test_a_model_fits_or_is_predicted_out_of_memory(configs, monkeypatch):
+    required_bytes = estimate_memory(make_model("org/dense"), "vllm", "cuda").required_bytes
+
+    monkeypatch.setattr(memory_estimator, "get_available_memory", lambda *args: required_bytes)
+    fits = estimate_memory(make_model("org/dense"), "vllm", "cuda")
+    monkeypatch.setattr(memory_estimator, "get_available_memory", lambda *args: required_bytes - 1)
+    too_large = estimate_memory(make_model("org/dense"), "vllm", "cuda")
+
+    assert not fits.oom_predicted
+    assert too_large.oom_predicted and too_large.to_columns()["oom_predicted"]
+
+
+def test_unknown_memory_and_models_give_no_prediction(configs, monkeypatch):
+    monkeypatch.setattr(memory_estimator, "get_available_memory", lambda *args: None)
+
+    assert not estimate_memory(make_model("org/dense"), "vllm", "cuda").oom_predicted
+    assert estimate_memory(make_model("org/missing"), "vllm", "cuda") is None
+    assert estimate_memory(make_model("org/dense"), "simulated", "cpu") is None
+
+
+def test_only_sharding_backends_use_every_device(monkeypatch):
+    monkeypatch.setattr(memory_estimator, "get_device_memory_bytes", lambda hardware_type: [100, 100, 100, 100])
+
+    assert get_available_memory("cuda", "vllm") == int(100 * memory_estimator.MEMORY_UTILIZATION)
+    assert get_available_memory("cuda", "tgi") == int(400 * memory_estimator.MEMORY_UTILIZATION)
+    assert get_available_memory("cuda", "tgi", device_ids=["2", "3"]) == int(200 * memory_estimator.MEMORY_UTILIZATION)
@@ -0,0 +1,111 @@
+import os
+
+import pytest
+
+import backend.run_backend as run_backend
+from backend.docker_command import parse_docker_run
+from model.model_cache import LocalHub, ModelCache
+
+WEIGHTS_BYTES = 1000
+
+
+@pytest.fixture
+def hub(tmp_path) -> LocalHub:
+    """A local hub with three models, each with WEIGHTS_BYTES of safetensors weights and a .bin checkpoint."""
+    for name in ["a", "b", "c"]:
+        repo_dir = tmp_path / "hub" / "org" / name
+        os.makedirs(repo_dir)
+        (repo_dir / "config.json").write_text("{}")
+        (repo_dir / "model.safetensors").write_bytes(b"\0" * (WEIGHTS_BYTES - 2))
+        (repo_dir / "pytorch_model.bin").write_bytes(b"\0" * 10 * WEIGHTS_BYTES)
+    return LocalHub(str(tmp_path / "hub"))
+
+
+def cached_files(cache: ModelCache, model_id: str) -> list[str]:
+    snapshot_dir = os.path.join(cache._repo_path(model_id), "snapshots", "local")
+    return sorted(os.listdir(snapshot_dir)) if os.path.isdir(snapshot_dir) else []
+
+
+def test_only_the_weights_and_configs_are_downloaded(tmp_path, hub):
+    cache = ModelCache(str(tmp_path / "cache"), snapshot_fn=hub.snapshot_download)
+    cache.plan(["org/a"])
+
+    cached_model = cache.wait("org/a")
+    cache.release("org/a")
+    cache.shutdown()
+
+    assert not cached_model.hit and cached_model.error is None
+    assert cached_model.size_bytes == WEIGHTS_BYTES
+    assert cached_files(cache, "org/a") == ["config.json", "model.safetensors"]
+
+
+def test_a_later_run_hits_the_cache(tmp_path, hub):
+    cache = ModelCache(str(tmp_path / "cache"), snapshot_fn=hub.snapshot_download)
+    cache.plan(["org/a"])
+    cache.wait("org/a")
+    cache.release("org/a")
+    cache.shutdown()
+
+    cache = ModelCache(str(tmp_path / "cache"), snapshot_fn=hub.snapshot_download)
+    cache.plan(["org/a"])
+    cached_model = cache.wait("org/a")
+    cache.shutdown()
+
+    assert cached_model.hit and cached_model.size_bytes == WEIGHTS_BYTES
+
+
+def test_models_no_longer_planned_are_evicted_first(tmp_path, hub):
+    cache = ModelCache(str(tmp_path / "cache"), budget_bytes=2 * WEIGHTS_BYTES + WEIGHTS_BYTES // 2, snapshot_fn=hub.snapshot_download)
+    expected_sizes = {model_id: WEIGHTS_BYTES for model_id in ["org/a", "org/b", "org/c"]}
+    cache.plan(["org/a", "org/b", "org/c"], expected_sizes)
+
+    for model_id in ["org/a", "org/b", "org/c"]:
+        cache.wait(model_id)
+        cache.release(model_id)
+    cache.shutdown()
+
+    assert cached_files(cache, "org/a") == []
+    assert cached_files(cache, "org/b") and cached_files(cache, "org/c")
+    assert cache.size_bytes <= cache.budget_bytes
+
+
+def test_the_model_in_use_is_never_evicted(tmp_path, hub):
+    cache = ModelCache(str(tmp_path / "cache"), budget_bytes=WEIGHTS_BYTES, snapshot_fn=hub.snapshot_download, prefetch_ahead=0)
+    cache.plan(["org/a", "org/b"], {"org/a": WEIGHTS_BYTES, "org/b": WEIGHTS_BYTES})
+
+    cache.wait("org/a")
+    # Only one model fits, the cache goes over its budget rather than evict the model of a running job
+    cached_model = cache.wait("org/b")
+    cache.shutdown()
+
+    assert cached_files(cache, "org/a")
+    assert cached_model.size_bytes == WEIGHTS_BYTES
+    assert cache.size_bytes == 2 * WEIGHTS_BYTES
+
+
+def test_a_failed_download_is_reported(tmp_path, hub):
+    cache = ModelCache(str(tmp_path / "cache"), snapshot_fn=hub.snapshot_download)
+    cache.plan(["org/missing"])
+
+    cached_model = cache.wait("org/missing")
+    cache.shutdown()
+
+    assert not cached_model.hit and "not found" in cached_model.error
+
+
+@pytest.mark.parametrize("backend_type, container_hub_cache", [("tgi", "/data"), ("vllm", "/root/.cache/huggingface/hub")])
+def test_the_backend_containers_find_the_cached_snapshots(tmp_path, hub, monkeypatch, backend_type, container_hub_cache):
+    cache = ModelCache(str(tmp_path / "cache"), snapshot_fn=hub.snapshot_download)
+    cache.plan(["org/a"])
+    cache.wait("org/a")
+    cache.shutdown()
+    monkeypatch.setattr(run_backend, "MODEL_CACHE_DIR", cache.cache_dir)
+
+    spec = parse_docker_run(run_backend.render_docker_command("org/a", backend_type, "cpu"))
+
+    # The hub cache of the container, where the backend looks up the model, is the directory of the model cache
+    mounts = dict(bind.split(":")[:2] for bind in spec.binds)
+    host_repo_path = cache._repo_path("org/a")
+    assert os.path.isdir(host_repo_path)
+    assert mounts[cache.cache_dir] == container_hub_cache
+    assert os.path.relpath(host_repo_path, cache.cache_dir) == "models--org--a"
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from backend.simulated_backend import SimulatedBackendConfig
+from benchmark import open_loop
+from benchmark.open_loop import get_arrival_times, run_open_loop, run_rate_sweep
+
+
+def test_constant_arrivals_are_evenly_spaced():
+    assert get_arrival_times(4.0, 4, "constant") == [0.0, 0.25, 0.5, 0.75]
+
+
+def test_poisson_arrivals_are_seeded_and_average_the_rate():
+    arrival_times = get_arrival_times(10.0, 2000, "poisson", seed=1)
+
+    assert arrival_times == get_arrival_times(10.0, 2000, "poisson", seed=1)
+    assert arrival_times != get_arrival_times(10.0, 2000, "poisson", seed=2)
+    assert arrival_times == sorted(arrival_times)
+    assert arrival_times[-1] / len(arrival_times) == pytest.approx(0.1, rel=0.1)
+
+
+def test_arrivals_reject_invalid_arguments():
+    with pytest.raises(ValueError):
+        get_arrival_times(0.0, 4)
+    with pytest.raises(ValueError):
+        get_arrival_times(1.0, 4, "bursty")
+
+
+def test_open_loop_sends_on_schedule_over_every_url(start_simulated_backend):
+    backends = [start_simulated_backend(), start_simulated_backend()]
+
+    point = asyncio.run(
+        run_open_loop(
+            "simulated",
+            20.0,
+            num_requests=10,
+            arrival_process="constant",
+            base_url=[backend.base_url for backend in backends],
+            max_tokens=4,
+        )
+    )
+
+    assert (point.num_requests, point.num_failed) == (10, 0)
+    assert point.keeping_up
+    assert point.ttft_p50_s is not None and point.ttft_p50_s <= point.latency_p50_s
+    # The last request is sent 0.45s after the first one
+    assert point.duration_s >= 0.45
+    assert [backend.engine.request_success_total for backend in backends] == [5, 5]
+
+
+def test_rate_sweep_stops_at_the_first_rate_the_server_cannot_keep_up_with(start_simulated_backend, monkeypatch):
+    monkeypatch.setattr(open_loop, "DURATION_PER_RATE", 0.5)
+    backend = start_simulated_backend(SimulatedBackendConfig(failure_rate=1.0))
+
+    result = run_rate_sweep("simulated", [40.0, 20.0], base_url=backend.base_url, max_tokens=4)
+
+    # Rates run in increasing order and every request failed at the first one
+    assert [point.request_rate for point in result.points] == [20.0]
+    assert result.points[0].num_failed == open_loop.MIN_REQUESTS_PER_RATE
+    assert result.saturation_request_rate == 20.0
+
+
+def test_rate_sweep_runs_every_rate_when_the_server_keeps_up(start_simulated_backend, monkeypatch):
+    monkeypatch.setattr(open_loop, "DURATION_PER_RATE", 0.5)
+    backend = start_simulated_backend()
+
+    result = run_rate_sweep("simulated", [20.0, 40.0], arrival_process="constant", base_url=backend.base_url, max_tokens=4)
+
+    assert [point.num_requests for point in result.points] == [10, 20]
+    assert all(point.keeping_up for point in result.points)
+    assert result.saturation_request_rate is None
@@ -0,0 +1,74 @@
+from typing import Optional
+
+import scheduler.preflight as preflight
+from model.get_models import Model
+from model.memory_estimator import MemoryEstimate
+from scheduler.job_scheduler import BenchmarkJob
+from scheduler.preflight import order_jobs, preflight_jobs
+
+GB = 1024**3
+
+
+def make_estimate(required_gb: float, available_gb: Optional[float] = 80) -> MemoryEstimate:
+    return MemoryEstimate(
+        parameter_bytes=int(required_gb * GB),
+        kv_cache_bytes_per_token=0,
+        activation_bytes=0,
+        required_bytes=int(required_gb * GB),
+        available_bytes=None if available_gb is None else int(available_gb * GB),
+    )
+
+
+def make_job(model_name: str, backend_type: str = "vllm", estimate: Optional[MemoryEstimate] = None) -> BenchmarkJob:
+    return BenchmarkJob(
+        job_id=f"{model_name}-{backend_type}",
+        model=Model(name=model_name, hf_model_id=f"org/{model_name}", gguf_hf_model_id=f"org/{model_name}-GGUF:Q4_K_M"),
+        backend_type=backend_type,
+        hardware_type="cuda",
+        container_name=f"{model_name}-{backend_type}",
+        memory_estimate=estimate,
+    )
+
+
+def test_jobs_run_largest_model_first_with_their_backends_together():
+    jobs = [
+        make_job("small", "vllm", make_estimate(10)),
+        make_job("unknown", "vllm"),
+        make_job("large", "vllm", make_estimate(60)),
+        make_job("small", "tgi", make_estimate(12)),
+        make_job("large", "llama_cpp", make_estimate(20)),
+    ]
+
+    # A model is as large as its largest estimate, the jobs without an estimate run last
+    assert [job.job_id for job in order_jobs(jobs)] == [
+        "large-vllm",
+        "large-llama_cpp",
+        "small-vllm",
+        "small-tgi",
+        "unknown-vllm",
+    ]
+
+
+def test_jobs_predicted_out_of_memory_are_set_aside(monkeypatch):
+    estimates = {
+        "fits": make_estimate(40),
+        "too_large": make_estimate(120),
+        "unknown_hardware": make_estimate(500, available_gb=None),
+        "unknown_model": None,
+    }
+    monkeypatch.setattr(preflight, "estimate_memory", lambda model, *args: estimates[model.name])
+    jobs = [make_job(name) for name in estimates]
+
+    runnable, oom_predicted = preflight_jobs(jobs)
+
+    assert [job.model.name for job in runnable] == ["unknown_hardware", "fits", "unknown_model"]
+    assert [job.model.name for job in oom_predicted] == ["too_large"]
+    assert oom_predicted[0].memory_estimate.oom_predicted
+
+
+def test_jobs_predicted_out_of_memory_can_still_run(monkeypatch):
+    monkeypatch.setattr(preflight, "estimate_memory", lambda model, *args: make_estimate(120))
+
+    runnable, oom_predicted = preflight_jobs([make_job("too_large")], run_oom_predicted=True)
+
+    assert [job.model.name for job in runnable] == ["too_large"] and oom_predicted == []
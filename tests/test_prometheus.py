@@ -0,0 +1,95 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from telemetry.prometheus import (
+    SERVER_KV_CACHE_UTILIZATION,
+    SERVER_RUNNING_REQUESTS,
+    SERVER_TTFT_S,
+    SERVER_WAITING_REQUESTS,
+    PrometheusCollector,
+    bucket_column,
+    get_metrics_url,
+    histogram_quantile,
+    parse_metrics,
+)
+
+VLLM_METRICS = """# HELP vllm:num_requests_running Number of requests in model execution batches.
+# TYPE vllm:num_requests_running gauge
+vllm:num_requests_running{engine="0",model_name="org/model"} 3.0
+vllm:num_requests_running{engine="1",model_name="org/model"} 2.0
+vllm:num_requests_waiting{engine="0",model_name="org/model"} 1.0
+vllm:gpu_cache_usage_perc{engine="0",model_name="org/model"} 0.5
+vllm:time_to_first_token_seconds_bucket{engine="0",le="0.1",model_name="org/model"} 4.0
+vllm:time_to_first_token_seconds_bucket{engine="0",le="+Inf",model_name="org/model"} 5.0
+vllm:time_to_first_token_seconds_count{engine="0",model_name="org/model"} 5.0
+vllm:prompt_tokens_total{engine="0",model_name="org/model"} 1234.0
+"""
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        body = self.server.metrics.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def metrics_servers():
+    servers = []
+    for kv_cache_usage in ["0.5", "0.25"]:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), MetricsHandler)
+        server.metrics = VLLM_METRICS.replace("} 0.5", f"}} {kv_cache_usage}")
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    yield [f"http://127.0.0.1:{server.server_address[1]}/metrics" for server in servers]
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_get_metrics_url():
+    assert get_metrics_url("http://localhost:8080/v1") == "http://localhost:8080/metrics"
+    assert get_metrics_url("http://localhost:8080/v1/") == "http://localhost:8080/metrics"
+
+
+def test_parse_metrics_keeps_only_the_wanted_metrics():
+    samples = list(parse_metrics(VLLM_METRICS.splitlines(), {"vllm:num_requests_waiting", "vllm:time_to_first_token_seconds"}))
+
+    assert samples[0] == ("vllm:num_requests_waiting", {"engine": "0", "model_name": "org/model"}, 1.0)
+    assert [name for name, _, _ in samples[1:]] == ["vllm:time_to_first_token_seconds_bucket"] * 2
+
+
+def test_histogram_quantile_interpolates_inside_the_bucket():
+    buckets = [(0.1, 50.0), (0.2, 100.0), (float("inf"), 100.0)]
+
+    assert histogram_quantile(50, buckets) == pytest.approx(0.1)
+    assert histogram_quantile(75, buckets) == pytest.approx(0.15)
+    assert histogram_quantile(50, [(float("inf"), 0.0)]) is None
+    # Above the highest finite bucket
+    assert histogram_quantile(99, [(0.1, 1.0), (float("inf"), 10.0)]) == 0.1
+
+
+def test_collector_sums_the_instances_and_averages_the_kv_cache(metrics_servers):
+    values = PrometheusCollector("vllm", metrics_servers).sample()
+
+    assert values[SERVER_RUNNING_REQUESTS] == 10.0
+    assert values[SERVER_WAITING_REQUESTS] == 2.0
+    # Older vLLM versions only expose the gpu cache usage
+    assert values[SERVER_KV_CACHE_UTILIZATION] == pytest.approx(0.375)
+    assert values[bucket_column(SERVER_TTFT_S, 0.1)] == 8.0
+    assert values[bucket_column(SERVER_TTFT_S, float("inf"))] == 10.0
+
+
+def test_unreachable_instances_are_left_out(metrics_servers):
+    values = PrometheusCollector("vllm", metrics_servers[:1] + ["http://127.0.0.1:1/metrics"]).sample()
+
+    assert values[SERVER_RUNNING_REQUESTS] == 5.0
+    assert values[SERVER_KV_CACHE_UTILIZATION] == 0.5
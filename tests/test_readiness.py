@@ -0,0 +1,87 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+import pytest
+
+from backend.docker_client import DockerError
+from backend.readiness import ReadinessWatcher
+
+
+class HealthHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        healthy = time.monotonic() >= self.server.healthy_at
+        self.send_response(200 if healthy else 503)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+@pytest.fixture
+def health_server():
+    """A health endpoint answering 503 until `healthy_at` (time.monotonic()), 200 afterwards."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), HealthHandler)
+    server.healthy_at = float("inf")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def get_health_url(server: ThreadingHTTPServer) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}/health"
+
+
+class FakeDockerClient:
+    """Answers the container wait after `exit_after_s` with `exit_code`, or fails it with `error`."""
+
+    def __init__(self, exit_after_s: float = 60, exit_code: int = 0, error: Optional[Exception] = None):
+        self.exit_after_s = exit_after_s
+        self.exit_code = exit_code
+        self.error = error
+
+    def wait_container(self, container: str) -> int:
+        if self.error is not None:
+            raise self.error
+        time.sleep(self.exit_after_s)
+        return self.exit_code
+
+
+def test_ready_as_soon_as_healthy(health_server):
+    health_server.healthy_at = time.monotonic() + 0.3
+    watcher = ReadinessWatcher("backend", get_health_url(health_server), FakeDockerClient(), max_interval=0.1)
+
+    result = watcher.wait(timeout=10)
+
+    assert result.ready and result.reason == "healthy"
+    assert 0.3 <= result.time_to_ready_s < 2
+
+
+def test_exited_container_stops_the_wait(health_server):
+    watcher = ReadinessWatcher("backend", get_health_url(health_server), FakeDockerClient(exit_after_s=0.2, exit_code=137))
+
+    started = time.monotonic()
+    result = watcher.wait(timeout=30)
+
+    assert not result.ready
+    assert (result.reason, result.exit_code) == ("container_exited", 137)
+    assert time.monotonic() - started < 5
+
+
+def test_failed_container_wait_keeps_polling_the_health_endpoint(health_server):
+    health_server.healthy_at = time.monotonic() + 0.5
+    docker_client = FakeDockerClient(error=DockerError(500, "wait failed"))
+    watcher = ReadinessWatcher("backend", get_health_url(health_server), docker_client, max_interval=0.1)
+
+    assert watcher.wait(timeout=10).reason == "healthy"
+
+
+def test_timeout_without_exit_or_health(health_server):
+    watcher = ReadinessWatcher("backend", get_health_url(health_server), FakeDockerClient(error=OSError("no socket")), max_interval=0.1)
+
+    result = watcher.wait(timeout=0.5)
+
+    assert not result.ready and result.reason == "timeout"
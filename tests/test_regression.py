@@ -0,0 +1,109 @@
+import json
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+from typer.testing import CliRunner
+
+from dataset.regression import detect_regressions, format_report
+from dataset.result_publisher import LocalPublisher, publish_results
+from regressions import app
+
+START = datetime(2025, 1, 1)
+# Run to run noise of the baseline, within a percent of the median
+NOISE = [1.0, 1.01, 0.99, 1.005, 0.995, 1.0, 1.01, 0.99, 1.0]
+
+
+def make_history(latest: dict[str, dict]) -> pd.DataFrame:
+    """Daily runs of three working combinations, the last run of each taking the columns given in `latest`."""
+    records = []
+    for model_id in ["a", "b", "c"]:
+        for day, noise in enumerate(NOISE):
+            records.append(
+                {
+                    "model_id": model_id,
+                    "backend_type": "vllm",
+                    "hardware_type": "cuda",
+                    "machine": "BOX",
+                    "benchmark_time": START + timedelta(days=day),
+                    "can_serve_single_request": True,
+                    "failure_reason": None,
+                    "max_output_tokens_per_second": 1000.0 * noise,
+                    "ttft_p50_s": 0.1 * noise,
+                }
+            )
+        records[-1].update(latest.get(model_id, {}))
+    return pd.DataFrame(records)
+
+
+def test_a_stable_history_passes():
+    report = detect_regressions(make_history({}))
+
+    assert report.combinations == 3
+    assert not report.failed
+    assert report.verdict()["verdict"] == "pass"
+
+
+def test_a_throughput_drop_beyond_the_noise_is_flagged():
+    report = detect_regressions(make_history({"a": {"max_output_tokens_per_second": 700.0}, "b": {"ttft_p50_s": 0.104}}))
+
+    assert [(regression.model_id, regression.metric) for regression in report.regressions] == [("a", "max_output_tokens_per_second")]
+    assert report.regressions[0].relative_change == pytest.approx(-0.3)
+    assert report.failed
+
+
+def test_a_combination_which_stopped_working_is_flagged():
+    report = detect_regressions(
+        make_history({"c": {"can_serve_single_request": False, "failure_reason": "request_failed", "max_output_tokens_per_second": None}})
+    )
+
+    assert [(flip.model_id, flip.broke, flip.failure_reason) for flip in report.broken] == [("c", True, "request_failed")]
+    assert "c with vllm on BOX (cuda): stopped working (request_failed)" in format_report(report)
+
+
+def test_out_of_memory_is_reported_apart_from_the_broken_combinations():
+    report = detect_regressions(
+        make_history(
+            {
+                "b": {"can_serve_single_request": False, "failure_reason": "oom_predicted", "max_output_tokens_per_second": None},
+                "c": {"can_serve_single_request": False, "failure_reason": "out_of_memory", "max_output_tokens_per_second": None},
+            }
+        )
+    )
+
+    assert report.broken == []
+    assert [flip.model_id for flip in report.out_of_memory] == ["b", "c"]
+    assert report.verdict() == {"verdict": "pass", "combinations": 3, "regressions": 0, "broken": 0, "out_of_memory": 2, "fixed": 0}
+    assert "b with vllm on BOX (cuda): does not fit in memory (oom_predicted)" in format_report(report)
+
+
+def test_hardware_types_of_a_machine_are_separate_combinations():
+    history = make_history({})
+    # The cpu runs of the same machine at the same times are ten times slower, with a drop in their latest run
+    cpu_history = make_history({"a": {"max_output_tokens_per_second": 700.0}}).assign(
+        hardware_type="cpu", max_output_tokens_per_second=lambda df: df["max_output_tokens_per_second"] / 10
+    )
+
+    report = detect_regressions(pd.concat([history, cpu_history]))
+
+    assert report.combinations == 6
+    assert [(regression.model_id, regression.hardware_type) for regression in report.regressions] == [("a", "cpu")]
+
+
+def test_reused_copies_do_not_count_as_baseline_runs():
+    history = make_history({"a": {"max_output_tokens_per_second": 700.0}})
+    # The first two runs reused over and over, they alone would make a baseline
+    reused = pd.concat([history[(history["model_id"] == "a")].iloc[:2]] * 5)
+    only_reused = pd.concat([reused, history[history["model_id"] == "a"].tail(1)])
+
+    assert detect_regressions(only_reused).regressions == []
+
+
+def test_cli_exits_with_an_error_on_a_regression(tmp_path):
+    publish_results(make_history({"a": {"max_output_tokens_per_second": 700.0}}).to_dict("records"), LocalPublisher(str(tmp_path / "dataset")))
+    output = tmp_path / "verdict.json"
+
+    result = CliRunner().invoke(app, ["--publish-dir", str(tmp_path / "dataset"), "--output", str(output)])
+
+    assert result.exit_code == 1
+    assert json.loads(output.read_text())["regressions"] == 1
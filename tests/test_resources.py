@@ -0,0 +1,32 @@
+from backend.docker_command import ContainerSpec
+from backend.resources import ResourceSlice, apply_resource_slice, format_cpuset, get_client_cpus, split_evenly
+
+
+def test_format_cpuset():
+    assert format_cpuset([5, 0, 1, 2, 7, 8]) == "0-2,5,7-8"
+    assert format_cpuset([]) == ""
+
+
+def test_split_evenly():
+    assert split_evenly(list(range(5)), 2) == [[0, 1, 2], [3, 4]]
+
+
+def test_client_cpus_are_kept_at_the_end_of_the_cpus():
+    assert get_client_cpus([0]) == []
+    assert get_client_cpus(list(range(4))) == [3]
+    assert get_client_cpus(list(range(64))) == [60, 61, 62, 63]
+    assert len(get_client_cpus(list(range(512)))) == 8
+
+
+def test_thread_variables_are_only_set_for_cpu_backends():
+    resources = ResourceSlice(cpuset_cpus="0-7", cpuset_mems="0", threads=8, device_ids=["1"])
+
+    cpu_spec = ContainerSpec(image="org/image", env=["OMP_NUM_THREADS=1"])
+    apply_resource_slice(cpu_spec, resources, "cpu", "vllm")
+    cuda_spec = ContainerSpec(image="org/image", device_requests=[{"Driver": "", "Capabilities": [["gpu"]], "Count": -1}])
+    apply_resource_slice(cuda_spec, resources, "cuda", "vllm")
+
+    assert cpu_spec.env == ["OMP_NUM_THREADS=8", "VLLM_CPU_OMP_THREADS_BIND=0-7"]
+    assert cuda_spec.env == []
+    assert (cuda_spec.cpuset_cpus, cuda_spec.device_requests[0]["DeviceIDs"]) == ("0-7", ["1"])
+    assert "Count" not in cuda_spec.device_requests[0]
@@ -0,0 +1,65 @@
+from datetime import datetime
+
+from backend.backend_types import SIMULATED_BACKEND
+from dataset import result_cache
+from dataset.leaderboard_dataset import LeaderboardData, upload_data_to_hub
+from dataset.result_cache import ResultCache, get_fingerprint
+from dataset.result_publisher import LocalPublisher, read_results
+
+OPTIONS = {"concurrency_levels": [1, 8]}
+
+
+def make_result(model_id: str = "org/model", can_serve_single_request: bool = True, **columns) -> LeaderboardData:
+    return LeaderboardData(
+        model_id=model_id,
+        backend_type=SIMULATED_BACKEND,
+        hardware_type="cpu",
+        machine="BOX",
+        can_serve_single_request=can_serve_single_request,
+        docker_command=None,
+        benchmark_time=datetime(2025, 1, 31, 12),
+        **columns,
+    )
+
+
+def test_fingerprint_changes_with_what_the_result_depends_on():
+    fingerprint = get_fingerprint("org/model", SIMULATED_BACKEND, "cpu", None, False, OPTIONS)
+
+    assert fingerprint.key == get_fingerprint("org/model", SIMULATED_BACKEND, "cpu", None, False, OPTIONS).key
+    assert fingerprint.key != get_fingerprint("org/other", SIMULATED_BACKEND, "cpu", None, False, OPTIONS).key
+    assert fingerprint.key != get_fingerprint("org/model", SIMULATED_BACKEND, "cpu", None, True, OPTIONS).key
+    assert fingerprint.key != get_fingerprint("org/model", SIMULATED_BACKEND, "cpu", None, False, {"concurrency_levels": [1]}).key
+
+
+def test_jobs_with_an_unresolved_part_are_not_fingerprinted(monkeypatch):
+    monkeypatch.setattr(result_cache, "get_model_revision", lambda model_id: "revision")
+
+    assert get_fingerprint("org/model", "vllm", "cuda", None, False, OPTIONS) is None
+
+
+def test_cached_results_are_reused_until_they_expire(tmp_path):
+    fingerprint = get_fingerprint("org/model", SIMULATED_BACKEND, "cpu", None, False, OPTIONS)
+    cache = ResultCache(str(tmp_path))
+    assert cache.get(fingerprint) is None
+
+    cache.put(fingerprint, make_result(max_output_tokens_per_second=100.0))
+
+    assert cache.get(fingerprint).max_output_tokens_per_second == 100.0
+    assert ResultCache(str(tmp_path), ttl_s=0).get(fingerprint) is None
+
+
+def test_failed_results_are_not_cached(tmp_path):
+    fingerprint = get_fingerprint("org/model", SIMULATED_BACKEND, "cpu", None, False, OPTIONS)
+    cache = ResultCache(str(tmp_path))
+
+    cache.put(fingerprint, make_result(can_serve_single_request=False))
+
+    assert cache.get(fingerprint) is None
+
+
+def test_reused_results_are_not_published_again(tmp_path):
+    publisher = LocalPublisher(str(tmp_path))
+
+    upload_data_to_hub([make_result("org/a"), make_result("org/b", reused_result=True)], publisher)
+
+    assert list(read_results(publisher)["model_id"]) == ["org/a"]
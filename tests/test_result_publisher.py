@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from dataset.result_publisher import (
+    LocalPublisher,
+    get_latest_view,
+    parse_partition,
+    publish_results,
+    read_latest_results,
+    read_results,
+)
+
+NOW = datetime(2025, 1, 31, 12)
+
+
+def make_record(model_id: str, machine: str = "BOX", hardware_type: str = "cuda", days_ago: float = 0, **columns) -> dict:
+    return {
+        "model_id": model_id,
+        "backend_type": "vllm",
+        "hardware_type": hardware_type,
+        "machine": machine,
+        "benchmark_time": NOW - timedelta(days=days_ago),
+        "can_serve_single_request": True,
+        **columns,
+    }
+
+
+def test_each_partition_gets_its_own_shard(tmp_path):
+    publisher = LocalPublisher(str(tmp_path))
+
+    paths = publish_results(
+        [make_record("a"), make_record("b"), make_record("a", days_ago=1), make_record("a", machine="OTHER", hardware_type="cpu")],
+        publisher,
+        run_id="run",
+    )
+
+    assert paths == [
+        "shards/hardware_type=cuda/machine=BOX/date=2025-01-31/run.parquet",
+        "shards/hardware_type=cuda/machine=BOX/date=2025-01-30/run.parquet",
+        "shards/hardware_type=cpu/machine=OTHER/date=2025-01-31/run.parquet",
+    ]
+    assert parse_partition(paths[0]) == {"hardware_type": "cuda", "machine": "BOX", "date": "2025-01-31"}
+    assert len(publisher.read_parquet(paths[0])) == 2
+
+
+def test_runs_never_rewrite_each_other(tmp_path):
+    publisher = LocalPublisher(str(tmp_path))
+
+    publish_results([make_record("a")], publisher)
+    publish_results([make_record("a", days_ago=-0.01)], publisher)
+
+    assert len(publisher.list_files("shards")) == 2
+    assert len(read_results(publisher)) == 2
+
+
+def test_results_of_an_unknown_machine_are_not_published(tmp_path):
+    publisher = LocalPublisher(str(tmp_path))
+
+    assert publish_results([make_record("a", machine="unknown")], publisher) == []
+    assert publish_results([], publisher) == []
+    assert read_results(publisher).empty
+
+
+def test_read_results_only_reads_the_matching_partitions(tmp_path):
+    publisher = LocalPublisher(str(tmp_path))
+    publish_results(
+        [make_record("a"), make_record("a", days_ago=10), make_record("a", machine="OTHER", hardware_type="cpu")], publisher
+    )
+
+    assert len(read_results(publisher, hardware_type="cuda")) == 2
+    assert len(read_results(publisher, machine="OTHER")) == 1
+    assert len(read_results(publisher, hardware_type="cuda", since="2025-01-31")) == 1
+
+
+def test_latest_view_keeps_the_most_recent_result_of_each_combination(tmp_path):
+    publisher = LocalPublisher(str(tmp_path))
+    publish_results(
+        [
+            make_record("a", days_ago=2, can_serve_single_request=True),
+            make_record("a", days_ago=1, can_serve_single_request=False),
+            make_record("b", days_ago=3),
+            make_record("a", machine="OTHER"),
+        ],
+        publisher,
+    )
+
+    latest = read_latest_results(publisher)
+
+    assert list(zip(latest["model_id"], latest["machine"])) == [("a", "BOX"), ("a", "OTHER"), ("b", "BOX")]
+    assert not latest.loc[0, "can_serve_single_request"]
+    assert get_latest_view(pd.DataFrame()).empty
@@ -0,0 +1,79 @@
+import os
+from datetime import datetime
+
+from dataset.leaderboard_dataset import LeaderboardData
+from dataset.results_journal import ResultsJournal, get_result_key
+
+
+def make_result(model_id: str, can_serve_single_request: bool = True) -> LeaderboardData:
+    return LeaderboardData(
+        model_id=model_id,
+        backend_type="vllm",
+        hardware_type="cuda",
+        machine="BOX",
+        can_serve_single_request=can_serve_single_request,
+        docker_command=None,
+        benchmark_time=datetime(2025, 1, 31, 12),
+    )
+
+
+def test_results_are_read_back_by_combination(tmp_path):
+    journal = ResultsJournal.create(str(tmp_path))
+    journal.append(make_result("a", can_serve_single_request=False))
+    journal.append(make_result("b"))
+    # A combination benchmarked again keeps its last result
+    journal.append(make_result("a"))
+
+    results = ResultsJournal(journal.path).load()
+
+    assert list(results) == [get_result_key("a", "vllm", "cuda"), get_result_key("b", "vllm", "cuda")]
+    assert results[get_result_key("a", "vllm", "cuda")].can_serve_single_request
+
+
+def test_a_truncated_last_line_is_ignored_and_not_appended_to(tmp_path):
+    journal = ResultsJournal.create(str(tmp_path))
+    journal.append(make_result("a"))
+    # Interrupted in the middle of writing the next result
+    with open(journal.path, "a") as f:
+        f.write('{"result": {"model_id": "b", "backend_')
+
+    resumed = ResultsJournal.open_latest(str(tmp_path))
+    assert list(resumed.load()) == [get_result_key("a", "vllm", "cuda")]
+
+    resumed.append(make_result("c"))
+    assert list(resumed.load()) == [get_result_key("a", "vllm", "cuda"), get_result_key("c", "vllm", "cuda")]
+
+
+def test_results_of_another_schema_are_skipped(tmp_path):
+    journal = ResultsJournal.create(str(tmp_path))
+    with open(journal.path, "a") as f:
+        f.write('{"result": {"model_id": "a"}}\n')
+    journal.append(make_result("b"))
+
+    assert list(journal.load()) == [get_result_key("b", "vllm", "cuda")]
+
+
+def test_only_an_incomplete_run_is_resumed(tmp_path):
+    assert ResultsJournal.open_latest(str(tmp_path / "missing")) is None
+
+    older = ResultsJournal(os.path.join(tmp_path, "20250130T120000.jsonl"))
+    older.append(make_result("a"))
+    newer = ResultsJournal(os.path.join(tmp_path, "20250131T120000.jsonl"))
+    newer.append(make_result("b"))
+    assert ResultsJournal.open_latest(str(tmp_path)).path == newer.path
+
+    newer.mark_complete()
+    assert newer.is_complete()
+    assert ResultsJournal.open_latest(str(tmp_path)) is None
+
+
+def test_an_old_crashed_run_is_not_resumed_after_a_complete_run(tmp_path):
+    crashed = ResultsJournal(os.path.join(tmp_path, "20250130T120000.jsonl"))
+    crashed.append(make_result("a"))
+    complete = ResultsJournal(os.path.join(tmp_path, "20250131T120000.jsonl"))
+    complete.append(make_result("b"))
+    complete.mark_complete()
+
+    # The complete run superseded the crashed one, whose results must not be mixed into a new run
+    assert not crashed.is_complete()
+    assert ResultsJournal.open_latest(str(tmp_path)) is None
@@ -0,0 +1,35 @@
+import socket
+
+import pytest
+
+from backend.run_backend import PORT_IN_USE, BackendRunner
+from backend.simulated_backend import SimulatedBackendConfig, count_prompt_tokens
+from benchmark.load_generator import QUESTION, run_concurrency_sweep
+from model.get_models import Model
+
+# Staggered arrivals mix prefills into the decode steps, the measured throughput is slightly below the cost model
+THROUGHPUT_TOLERANCE = 0.15
+OUTPUT_TOKENS = 32
+
+
+def test_concurrency_sweep_matches_the_cost_model(start_simulated_backend):
+    # Slow steps, so the client overhead is small next to the modelled step time
+    simulated_backend = start_simulated_backend(SimulatedBackendConfig(step_s=0.02, output_tokens=OUTPUT_TOKENS))
+    results = run_concurrency_sweep(simulated_backend.served_model_name, [1, 8], simulated_backend.base_url)
+
+    prompt_tokens = count_prompt_tokens([{"content": QUESTION}])
+    for result in results:
+        assert result.num_failed == 0
+        expected = simulated_backend.config.expected_output_tokens_per_second(result.concurrency, prompt_tokens, OUTPUT_TOKENS)
+        assert result.output_tokens_per_second == pytest.approx(expected, rel=THROUGHPUT_TOLERANCE)
+
+
+def test_simulated_backend_on_a_taken_port_fails_with_a_reason():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        sock.listen()
+        runner = BackendRunner(host_port=sock.getsockname()[1])
+        started, _ = runner._run_simulated(Model(name="simulated", hf_model_id="org/model", gguf_hf_model_id="org/model-gguf"))
+
+    assert not started
+    assert runner.failure_reason == PORT_IN_USE
@@ -0,0 +1,106 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import benchmark.slo_search as slo_search
+from benchmark.load_generator import ConcurrencyResult, StreamingMetrics
+from benchmark.slo_search import LatencySLO, find_max_goodput
+
+SLO = LatencySLO(ttft_p95_s=0.5, itl_p95_s=None)
+
+
+def make_result(concurrency: int, ttft_p95_s: float) -> ConcurrencyResult:
+    return ConcurrencyResult(
+        concurrency=concurrency,
+        num_requests=concurrency,
+        num_failed=0,
+        duration_s=1.0,
+        mean_latency_s=1.0,
+        p50_latency_s=1.0,
+        p95_latency_s=1.0,
+        output_tokens=100 * concurrency,
+        requests_per_second=float(concurrency),
+        output_tokens_per_second=100.0 * concurrency,
+        streaming=StreamingMetrics(ttft_p95_s=ttft_p95_s),
+    )
+
+
+@pytest.fixture
+def stub_load(monkeypatch) -> SimpleNamespace:
+    """Replace the load with a backend meeting the SLO up to `capacity` concurrent requests, recording the `probed` levels."""
+    probed: list[int] = []
+
+    async def run_load(model_id, concurrency, **kwargs):
+        probed.append(concurrency)
+        return make_result(concurrency, 0.1 if concurrency <= stub.capacity else 1.0)
+
+    stub = SimpleNamespace(capacity=0, probed=probed)
+    monkeypatch.setattr(slo_search, "run_load", run_load)
+    return stub
+
+
+def test_search_converges_on_the_highest_passing_concurrency(stub_load):
+    stub_load.capacity = 37
+
+    result = find_max_goodput("model", SLO, max_concurrency=512)
+
+    # Doubled up to 64, then bisected within the relative tolerance of the best passing level
+    assert stub_load.probed[:7] == [1, 2, 4, 8, 16, 32, 64]
+    assert 37 - int(37 * slo_search.SEARCH_RELATIVE_TOLERANCE) <= result.goodput_concurrency <= 37
+    assert result.goodput_output_tokens_per_second == 100.0 * result.goodput_concurrency
+    assert [probe.concurrency for probe in result.probes] == sorted(stub_load.probed)
+    assert all(probe.slo_met == (probe.concurrency <= 37) for probe in result.probes)
+
+
+def test_search_stops_at_the_max_concurrency_when_every_probe_passes(stub_load):
+    stub_load.capacity = 10_000
+
+    result = find_max_goodput("model", SLO, max_concurrency=100)
+
+    assert stub_load.probed == [1, 2, 4, 8, 16, 32, 64]
+    assert result.goodput_concurrency == 64
+
+
+def test_no_goodput_when_a_single_request_misses_the_slo(stub_load):
+    result = find_max_goodput("model", SLO)
+
+    assert stub_load.probed == [1]
+    assert result.goodput_concurrency is None and result.goodput_output_tokens_per_second is None
+    assert [probe.slo_met for probe in result.probes] == [False]
+
+
+def test_no_probe_starts_once_the_budget_is_spent(stub_load, monkeypatch):
+    stub_load.capacity = 10_000
+    # Every probe takes 100s of a fake clock
+    clock = SimpleNamespace(now=0.0)
+    monkeypatch.setattr(slo_search, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    run_load = slo_search.run_load
+
+    async def slow_run_load(model_id, concurrency, **kwargs):
+        clock.now += 100
+        return await run_load(model_id, concurrency, **kwargs)
+
+    monkeypatch.setattr(slo_search, "run_load", slow_run_load)
+
+    result = find_max_goodput("model", SLO, time_budget_s=250)
+
+    assert stub_load.probed == [1, 2, 4]
+    assert result.goodput_concurrency == 4
+
+
+def test_a_probe_running_past_the_budget_is_stopped(monkeypatch):
+    async def run_load(model_id, concurrency, **kwargs):
+        # The second probe would run far past the budget
+        await asyncio.sleep(0 if concurrency == 1 else 60)
+        return make_result(concurrency, 0.1)
+
+    monkeypatch.setattr(slo_search, "run_load", run_load)
+    start = time.monotonic()
+
+    result = find_max_goodput("model", SLO, time_budget_s=1)
+
+    assert time.monotonic() - start < 10
+    assert result.goodput_concurrency == 1
+    assert [probe.concurrency for probe in result.probes] == [1]
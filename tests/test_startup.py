@@ -0,0 +1,109 @@
+import pytest
+
+from backend.docker_client import DockerError, NotFoundError
+from backend.log_events import WARMUP_DONE, WARMUP_STARTED, WEIGHTS_LOADED, WEIGHTS_LOADING
+from benchmark.startup import (
+    IMAGE_PULL_FAILED,
+    StartupBenchmarkResult,
+    StartupTrial,
+    get_startup_phases,
+    remove_image,
+    run_startup_benchmark,
+)
+from model.get_models import Model
+
+
+class FakeDockerClient:
+    """Docker client whose image calls raise the given errors."""
+
+    def __init__(self, inspect_error=None, remove_error=None, pull_error=None):
+        self.inspect_error = inspect_error
+        self.remove_error = remove_error
+        self.pull_error = pull_error
+        self.removed: list[str] = []
+
+    def inspect_image(self, image: str) -> dict:
+        if self.inspect_error is not None:
+            raise self.inspect_error
+        return {"Id": f"sha256:{image}"}
+
+    def remove_image(self, image_id: str, force: bool = False):
+        if self.remove_error is not None:
+            raise self.remove_error
+        self.removed.append(image_id)
+
+    def pull_image(self, image: str):
+        if self.pull_error is not None:
+            raise self.pull_error
+
+
+def test_startup_phases_from_every_milestone():
+    startup_times = {
+        "create": 0.0,
+        "created": 0.5,
+        "started": 1.0,
+        "first_log": 1.5,
+        WEIGHTS_LOADING: 2.0,
+        WEIGHTS_LOADED: 10.0,
+        WARMUP_STARTED: 11.0,
+        WARMUP_DONE: 14.0,
+        "healthy": 15.0,
+    }
+
+    assert get_startup_phases(startup_times) == {
+        "create_s": 0.5,
+        "process_start_s": 0.5,
+        "weight_load_s": 8.0,
+        "warmup_s": 3.0,
+        "healthy_s": 14.0,
+    }
+
+
+def test_startup_phases_fall_back_to_the_previous_milestone():
+    # The backend logged neither the start of the weight loading nor of the warmup
+    startup_times = {"started": 1.0, "first_log": 1.5, WEIGHTS_LOADED: 10.0, WARMUP_DONE: 14.0, "healthy": 15.0}
+
+    phases = get_startup_phases(startup_times)
+
+    assert (phases["weight_load_s"], phases["warmup_s"]) == (8.5, 4.0)
+    assert phases["create_s"] is None
+
+
+def test_startup_columns_average_the_successful_trials_of_each_kind():
+    result = StartupBenchmarkResult(
+        trials=[
+            StartupTrial(cold=True, success=True, pull_s=20.0, total_s=60.0),
+            StartupTrial(cold=True, success=False, failure_reason="out_of_memory", pull_s=100.0),
+            StartupTrial(cold=False, success=True, pull_s=0.0, total_s=10.0),
+            StartupTrial(cold=False, success=True, pull_s=0.0, total_s=14.0),
+        ]
+    )
+
+    columns = result.to_columns()
+
+    assert columns["cold_start_pull_s_mean"] == 20.0
+    # A single trial has no sample variance
+    assert columns["cold_start_pull_s_var"] is None
+    assert (columns["warm_start_total_s_mean"], columns["warm_start_total_s_var"]) == (12.0, 8.0)
+    assert columns["warm_start_weight_load_s_mean"] is None
+
+
+def test_remove_image():
+    docker_client = FakeDockerClient()
+    assert remove_image(docker_client, "vllm")
+    assert docker_client.removed == ["sha256:vllm"]
+
+    # A missing image is already removed
+    assert remove_image(FakeDockerClient(inspect_error=NotFoundError(404, "no such image")), "vllm")
+    assert not remove_image(FakeDockerClient(remove_error=DockerError(409, "image is in use")), "vllm")
+
+
+@pytest.mark.parametrize("pull_error", [DockerError(500, "manifest unknown"), ConnectionRefusedError()])
+def test_warm_starts_fail_when_the_image_cannot_be_pulled(pull_error):
+    docker_client = FakeDockerClient(inspect_error=NotFoundError(404, "no such image"), pull_error=pull_error)
+    model = Model(name="m", hf_model_id="org/m", gguf_hf_model_id="org/m-GGUF:Q4_K_M")
+
+    result = run_startup_benchmark(model, "vllm", "cpu", "vllm", cold_trials=0, warm_trials=2, docker_client=docker_client)
+
+    assert [trial.failure_reason for trial in result.trials] == [IMAGE_PULL_FAILED, IMAGE_PULL_FAILED]
+    assert not any(trial.success for trial in result.trials)
@@ -0,0 +1,161 @@
+import os
+import time
+
+import pytest
+
+from telemetry.collectors import (
+    CPU_ENERGY_J,
+    CPU_USAGE_USEC,
+    IO_READ_BYTES,
+    IO_WRITE_BYTES,
+    MEMORY_BYTES,
+    MEMORY_PEAK_BYTES,
+    CgroupCollector,
+    Collector,
+    RaplCollector,
+    create_collectors,
+)
+from telemetry.sampler import TelemetrySampler
+
+
+def write_files(directory, files: dict[str, str]):
+    os.makedirs(directory, exist_ok=True)
+    for name, content in files.items():
+        (directory / name).write_text(content)
+
+
+def write_rapl_zone(root, zone: str, energy_uj: int, max_energy_range_uj: int = 1_000_000):
+    write_files(
+        root / "sys/class/powercap" / zone,
+        {"energy_uj": f"{energy_uj}\n", "max_energy_range_uj": f"{max_energy_range_uj}\n"},
+    )
+
+
+class ListCollector(Collector):
+    """Replays a list of samples."""
+    name = "list"
+
+    def __init__(self, samples: list[dict[str, float]]):
+        self.samples = list(samples)
+
+    def sample(self) -> dict[str, float]:
+        return self.samples.pop(0) if self.samples else {}
+
+
+def test_collector_needs_a_sample_method():
+    with pytest.raises(TypeError):
+        Collector()
+
+
+def test_cgroup_collector_reads_the_container_cgroup(tmp_path):
+    write_files(
+        tmp_path / "sys/fs/cgroup/system.slice/docker-abc.scope",
+        {
+            "cpu.stat": "usage_usec 2500000\nuser_usec 2000000\n",
+            "memory.current": "1048576\n",
+            "memory.peak": "2097152\n",
+            "io.stat": "8:0 rbytes=1024 wbytes=512 rios=1 wios=1\n8:16 rbytes=1024 wbytes=0 rios=1 wios=0\n",
+        },
+    )
+    container_ids = []
+    collector = CgroupCollector(lambda: container_ids, str(tmp_path))
+
+    assert collector.sample() == {}
+    container_ids.append("abc")
+    assert collector.sample() == {
+        CPU_USAGE_USEC: 2500000,
+        MEMORY_BYTES: 1048576,
+        MEMORY_PEAK_BYTES: 2097152,
+        IO_READ_BYTES: 2048,
+        IO_WRITE_BYTES: 512,
+    }
+
+
+def test_cgroup_collector_sums_the_instance_containers(tmp_path):
+    write_files(
+        tmp_path / "sys/fs/cgroup/system.slice/docker-abc.scope",
+        {"cpu.stat": "usage_usec 1000\n", "memory.current": "100\n", "io.stat": "8:0 rbytes=10 wbytes=1\n"},
+    )
+    # The second instance runs with the cgroupfs driver layout, its cgroup appears after its id is known
+    container_ids = ["abc", "def"]
+    collector = CgroupCollector(lambda: container_ids, str(tmp_path))
+
+    assert collector.sample() == {CPU_USAGE_USEC: 1000, MEMORY_BYTES: 100, IO_READ_BYTES: 10, IO_WRITE_BYTES: 1}
+    write_files(
+        tmp_path / "sys/fs/cgroup/docker/def",
+        {"cpu.stat": "usage_usec 3000\n", "memory.current": "300\n", "io.stat": "8:0 rbytes=30 wbytes=3\n"},
+    )
+    assert collector.sample() == {CPU_USAGE_USEC: 4000, MEMORY_BYTES: 400, IO_READ_BYTES: 40, IO_WRITE_BYTES: 4}
+
+
+def test_rapl_collector_sums_the_packages_across_wrap_arounds(tmp_path):
+    write_rapl_zone(tmp_path, "intel-rapl:0", 900_000)
+    write_rapl_zone(tmp_path, "intel-rapl:1", 100_000)
+    # A sub zone of the first package, already counted in it
+    write_rapl_zone(tmp_path, "intel-rapl:0:0", 500_000)
+    collector = RaplCollector(str(tmp_path))
+
+    assert collector.sample() == {CPU_ENERGY_J: 0.0}
+    # The first package counter wrapped around its range
+    write_rapl_zone(tmp_path, "intel-rapl:0", 100_000)
+    write_rapl_zone(tmp_path, "intel-rapl:1", 300_000)
+    write_rapl_zone(tmp_path, "intel-rapl:0:0", 900_000)
+    assert collector.sample()[CPU_ENERGY_J] == pytest.approx(0.2 + 0.2)
+
+
+def test_host_energy_is_not_measured_when_the_host_is_shared(tmp_path):
+    write_rapl_zone(tmp_path, "intel-rapl:0", 0)
+
+    collectors = create_collectors(lambda: [], "cpu", root=str(tmp_path))
+    shared_collectors = create_collectors(lambda: [], "cpu", root=str(tmp_path), shared_host=True)
+
+    assert [collector.name for collector in collectors] == ["cgroup", "rapl"]
+    assert [collector.name for collector in shared_collectors] == ["cgroup"]
+
+
+def test_sampler_summarizes_counters_and_gauges():
+    sampler = TelemetrySampler(
+        [
+            ListCollector([{CPU_ENERGY_J: 10.0, MEMORY_BYTES: 100.0}, {CPU_ENERGY_J: 25.0, MEMORY_BYTES: 300.0}, {CPU_ENERGY_J: 40.0}]),
+        ]
+    )
+    for _ in range(3):
+        sampler.sample()
+
+    summary = sampler.summarize()
+
+    assert summary.num_samples == 3
+    assert summary.cpu_energy_joules == 30.0
+    assert summary.peak_memory_bytes == 300.0
+    assert summary.energy_joules == 30.0
+
+
+class SlowCounterCollector(Collector):
+    """A counter which takes a while to read and fails if it is read from two threads at once."""
+    name = "slow"
+
+    def __init__(self):
+        self.reading = False
+        self.value = 0.0
+
+    def sample(self) -> dict[str, float]:
+        assert not self.reading, "sampled concurrently"
+        self.reading = True
+        time.sleep(0.005)
+        self.value += 1.0
+        self.reading = False
+        return {CPU_ENERGY_J: self.value}
+
+
+def test_sampler_takes_one_sample_at_a_time():
+    collector = SlowCounterCollector()
+    sampler = TelemetrySampler([collector], interval=0.001)
+    sampler.start()
+    for _ in range(20):
+        sampler.sample()
+    sampler.stop()
+
+    # A concurrent read fails the collector, leaving a sample without the counter
+    values = sampler.series.window(CPU_ENERGY_J)
+    assert len(values) == sampler.summarize().num_samples
+    assert [value for _, value in values] == sorted(value for _, value in values)
@@ -0,0 +1,105 @@
+import functools
+import json
+import os
+
+import pytest
+import torch
+from safetensors import safe_open
+from transformers import LlamaConfig
+
+import model.weights as weights
+from model.weights import download_no_weights_model, get_tensor_size, get_tensor_specs, shard_tensors, write_sparse_safetensors
+
+
+def make_config() -> LlamaConfig:
+    return LlamaConfig(
+        hidden_size=64,
+        intermediate_size=128,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        num_hidden_layers=3,
+        vocab_size=256,
+        dtype="bfloat16",
+    )
+
+
+@pytest.fixture
+def no_weights_dir(tmp_path, monkeypatch) -> str:
+    """Create the no weights checkpoints in a temporary directory, from a local config instead of the hub."""
+    monkeypatch.setattr(weights, "NO_WEIGHTS_CACHE_DIR", str(tmp_path / "no_weights"))
+
+    def snapshot_download(model_id, allow_patterns, local_dir):
+        make_config().save_pretrained(local_dir)
+
+    monkeypatch.setattr(weights, "snapshot_download", snapshot_download)
+    # Small shards, so the tiny model is split like a large one
+    monkeypatch.setattr(weights, "shard_tensors", functools.partial(shard_tensors, max_shard_size=64 * 1024))
+    return str(tmp_path / "no_weights")
+
+
+def test_shards_stay_under_the_limit_in_checkpoint_order():
+    tensors = [("a", [10], torch.float32), ("b", [10], torch.float32), ("c", [30], torch.float32), ("d", [5], torch.bfloat16)]
+
+    shards = shard_tensors(tensors, max_shard_size=80)
+
+    assert [[name for name, _, _ in shard] for shard in shards] == [["a", "b"], ["c"], ["d"]]
+    # A tensor larger than the limit gets a shard of its own
+    assert [[name for name, _, _ in shard] for shard in shard_tensors(tensors, max_shard_size=10)] == [["a"], ["b"], ["c"], ["d"]]
+
+
+def test_sparse_safetensors_has_the_real_layout_and_size(tmp_path):
+    tensors = [("weight", [3, 5], torch.bfloat16), ("bias", [7], torch.float32), ("mask", [2], torch.bool)]
+    path = str(tmp_path / "model.safetensors")
+
+    write_sparse_safetensors(path, tensors)
+
+    with open(path, "rb") as f:
+        header_size = int.from_bytes(f.read(8), "little")
+    assert header_size % 8 == 0
+    assert os.path.getsize(path) == 8 + header_size + sum(get_tensor_size(shape, dtype) for _, shape, dtype in tensors)
+    with safe_open(path, framework="pt") as f:
+        loaded = {name: f.get_tensor(name) for name in f.keys()}
+    for name, shape, dtype in tensors:
+        assert loaded[name].dtype == dtype and list(loaded[name].shape) == shape
+        assert not loaded[name].any()
+
+
+def test_no_weights_checkpoint_matches_the_config(no_weights_dir):
+    model_path = download_no_weights_model("org/model")
+
+    tensors = get_tensor_specs(make_config())
+    with open(os.path.join(model_path, "model.safetensors.index.json")) as f:
+        index = json.load(f)
+    shard_names = sorted(set(index["weight_map"].values()))
+
+    assert len(shard_names) > 1
+    assert shard_names == [f"model-{number:05d}-of-{len(shard_names):05d}.safetensors" for number in range(1, len(shard_names) + 1)]
+    assert index["weight_map"].keys() == {name for name, _, _ in tensors}
+    assert index["metadata"]["total_size"] == sum(get_tensor_size(shape, dtype) for _, shape, dtype in tensors)
+    # Every tensor is in the shard the index points to, with the shape and dtype of the config
+    specs = {name: (shape, dtype) for name, shape, dtype in tensors}
+    for shard_name in shard_names:
+        with safe_open(os.path.join(model_path, shard_name), framework="pt") as f:
+            for name in f.keys():
+                assert index["weight_map"][name] == shard_name
+                tensor = f.get_slice(name)
+                assert (tensor.get_shape(), tensor.get_dtype()) == (specs[name][0], weights.SAFETENSORS_DTYPES[specs[name][1]])
+
+
+def test_a_complete_checkpoint_is_reused(no_weights_dir, monkeypatch):
+    model_path = download_no_weights_model("org/model")
+    monkeypatch.setattr(weights, "get_tensor_specs", lambda config: pytest.fail("the checkpoint was created again"))
+
+    assert download_no_weights_model("org/model") == model_path
+
+
+def test_quantized_models_are_refused(no_weights_dir, monkeypatch):
+    def snapshot_download(model_id, allow_patterns, local_dir):
+        config = make_config()
+        config.quantization_config = {"quant_method": "fp8"}
+        config.save_pretrained(local_dir)
+
+    monkeypatch.setattr(weights, "snapshot_download", snapshot_download)
+
+    with pytest.raises(ValueError, match="quantized"):
+        download_no_weights_model("org/quantized")
@@ -0,0 +1,53 @@
+import itertools
+
+import pytest
+from tokenizers import Tokenizer, models, pre_tokenizers, trainers, decoders
+from transformers import PreTrainedTokenizerFast
+
+import benchmark.workload as workload
+from benchmark.workload import WORDS, generate_prompt, run_workload_matrix
+
+# Prefix caches reuse whole blocks of tokens, 16 in vLLM
+PREFIX_BLOCK_TOKENS = 16
+
+
+@pytest.fixture(scope="module")
+def tokenizer():
+    # A small byte level BPE, so decoding and re-encoding merges tokens like the real tokenizers do
+    bpe = Tokenizer(models.BPE())
+    bpe.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    bpe.decoder = decoders.ByteLevel()
+    trainer = trainers.BpeTrainer(vocab_size=400, initial_alphabet=pre_tokenizers.ByteLevel.alphabet())
+    bpe.train_from_iterator([" ".join(WORDS)] * 10 + [" ".join(str(number) for number in range(1000))], trainer)
+    return PreTrainedTokenizerFast(tokenizer_object=bpe)
+
+
+@pytest.mark.parametrize("num_tokens", [1, 7, 128, 1024])
+def test_prompt_has_the_exact_number_of_tokens(tokenizer, num_tokens):
+    for seed in range(20):
+        prompt = generate_prompt(tokenizer, num_tokens, seed)
+        assert len(tokenizer.encode(prompt, add_special_tokens=False)) == num_tokens
+
+
+def test_workload_matrix_never_repeats_a_prompt_prefix(tokenizer, monkeypatch, start_simulated_backend):
+    backend = start_simulated_backend()
+    monkeypatch.setattr(workload.AutoTokenizer, "from_pretrained", lambda model_id: tokenizer)
+    monkeypatch.setattr(workload, "get_max_context_length", lambda model_id: None)
+    sent_prompts = []
+    run_load = workload.run_load
+
+    async def recording_run_load(*args, prompts, **kwargs):
+        sent_prompts.extend(prompts)
+        return await run_load(*args, prompts=prompts, **kwargs)
+
+    monkeypatch.setattr(workload, "run_load", recording_run_load)
+
+    results = run_workload_matrix(
+        "model", "simulated", "vllm", input_lengths=[32, 64], output_lengths=[4, 8], base_url=backend.base_url, requests_per_cell=3
+    )
+
+    assert len(results) == 4 and all(cell.num_failed == 0 for cell in results)
+    assert len(sent_prompts) == 12
+    prefixes = [tuple(tokenizer.encode(prompt, add_special_tokens=False)[:PREFIX_BLOCK_TOKENS]) for prompt in sent_prompts]
+    for first, second in itertools.combinations(prefixes, 2):
+        assert first != second